@@ -7,103 +7,168 @@
 # The script sets all column widths to 28.
 # The script formats the header row with a white text and dark blue background.
 # The script formats the data rows with a zebra striping pattern.
+# Large .xlsx files are streamed chunk by chunk (see STREAMING_MODE).
+# Output goes through a constant-memory writer (see excel_writers.OUTPUT_ENGINE).
 
 
-import pandas as pd
 from datetime import datetime
+import numpy as np
 import tkinter as tk
 from tkinter import filedialog, simpledialog
 import os
+from itertools import chain
 
-# -------- FILE SELECTION DIALOG --------
-root = tk.Tk()
-root.withdraw()  # Hide the root window
-file_path = filedialog.askopenfilename(
-    title="Select Excel file",
-    filetypes=[("Excel files", "*.xlsx *.xls")]
-)
-
-if not file_path:
-    print("No file selected. Exiting.")
-    exit()
+from compact_dtypes import compact_frame, contains_lower
+from excel_stream import iter_frame_chunks, should_stream
+from excel_writers import make_writer, output_extension
+from input_cache import iter_chunks_cached, read_excel_cached
+from run_report import finish_run, record, stage, start_run, timed_iter
 
 # -------- CONFIG --------
 email_column = "Primary Email"
 office_column = "Office"
-
-# -------- READ EXCEL --------
-df = pd.read_excel(file_path)
-df.columns = df.columns.str.strip()  # remove spaces
-
-# Convert columns to lowercase for case-insensitive matching
-lower_cols = {col.lower(): col for col in df.columns}
-
-# -------- VALIDATE COLUMNS (case-insensitive) --------
-missing_cols = [col for col in [email_column.lower(), office_column.lower()] if col not in lower_cols]
-if missing_cols:
-    print(f"Error: Missing required column(s): {', '.join(missing_cols)}")
-    exit()
-
-# Map actual column names
-email_col_actual = lower_cols[email_column.lower()]
-office_col_actual = lower_cols[office_column.lower()]
-email_match = simpledialog.askstring("Primary Email Key", "Enter the email match")
-office_match = simpledialog.askstring("Office Key", "Enter the office match")
-
-# -------- FILTER (case-insensitive) --------
-filtered_df = df[
-    df[email_col_actual].astype(str).str.lower().str.contains(email_match, na=False) |
-    df[office_col_actual].astype(str).str.lower().str.contains(office_match, na=False)
-]
-
-# -------- WRITE TO NEW FILE --------
-base, ext = os.path.splitext(file_path)
-timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-new_file_path = f"{base}_filtered_{timestamp}{ext}"
-
-
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font, PatternFill
-
-with pd.ExcelWriter(new_file_path, engine="openpyxl") as writer:
-    # Write both sheets
-    df.to_excel(writer, sheet_name="Original Data", index=False)
-    filtered_df.to_excel(writer, sheet_name="Filtered " + office_match, index=False)
-
-    # Access workbook and worksheets
-    wb = writer.book
-    ws1 = writer.sheets["Original Data"]
-    ws2 = writer.sheets["Filtered " + office_match]
-
-    # Define header style
-    header_font = Font(bold=True, color="FFFFFF")  # white text
-    header_fill = PatternFill("solid", fgColor="156082")  # dark blue background
-    stripe1 = PatternFill("solid", fgColor="C0E6F5")         # even data rows
-    stripe2 = PatternFill("solid", fgColor="FFFFFF")         # odd data rows
-
-    # Apply header style to both sheets
-    for ws in [ws1, ws2]:
-        # Hide columns A–C
-        for col in ["A", "B", "C"]:
-            ws.column_dimensions[col].hidden = True
-
-        # Set all column widths to 28 
-    
-        for col_idx in range(1, ws.max_column + 1):
-            col_letter = get_column_letter(col_idx)
-            ws.column_dimensions[col_letter].width = 28
-
-        # Format header row (row 1)
-        for cell in ws[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-
-        # Zebra striping for data rows (rows 2 .. max_row)
-        # Even-numbered rows -> #C0E6F5, odd-numbered rows -> #FFFFFF
-        for r in range(2, ws.max_row + 1):
-            fill = stripe1 if (r % 2 == 0) else stripe2
-            for c in range(1, ws.max_column + 1):
-                ws.cell(row=r, column=c).fill = fill
-
-print(f"✅ Original and filtered data written to new file: {new_file_path}")
-
+STREAMING_MODE = "auto"  # True = always stream input/output, False = never, "auto" = large .xlsx only
+
+
+def build_mask(df, email_col_actual, office_col_actual, email_match, office_match):
+    """Boolean array: rows whose email or office contains the match (case-insensitive)."""
+    return (
+        contains_lower(df[email_col_actual], email_match) |
+        contains_lower(df[office_col_actual], office_match)
+    )
+
+
+def resolve_columns(columns):
+    """
+    Map the configured columns to actual names (case-insensitive).
+    Raises ValueError listing the missing required column(s).
+    """
+    # Convert columns to lowercase for case-insensitive matching
+    lower_cols = {col.lower(): col for col in columns}
+
+    # -------- VALIDATE COLUMNS (case-insensitive) --------
+    missing_cols = [col for col in [email_column.lower(), office_column.lower()] if col not in lower_cols]
+    if missing_cols:
+        raise ValueError(f"Missing required column(s): {', '.join(missing_cols)}")
+
+    # Map actual column names
+    return lower_cols[email_column.lower()], lower_cols[office_column.lower()]
+
+
+def write_output(chunks, new_file_path, columns, email_col_actual, office_col_actual,
+                 email_match, office_match):
+    """
+    Write the original and filtered sheets chunk by chunk through the output writer.
+    Both sheets are written from one row buffer per chunk (no filtered copy).
+    """
+    writer = make_writer(new_file_path)
+    filtered_name = "Filtered " + office_match
+    for name in ["Original Data", filtered_name]:
+        writer.add_sheet(name, columns, hidden_columns=["A", "B", "C"])
+
+    for chunk in timed_iter(chunks, "read"):
+        with stage("row buffer"):
+            rows = writer.buffer(chunk)
+        with stage("write: Original Data"):
+            writer.append_rows("Original Data", rows)
+        with stage("filter"):
+            mask = build_mask(chunk, email_col_actual, office_col_actual, email_match, office_match)
+        with stage(f"write: {filtered_name}"):
+            writer.append_rows(filtered_name, rows, np.flatnonzero(mask))
+        del rows
+    with stage("save"):
+        writer.save()
+    record(rows_by_sheet={name: n - 1 for name, n in writer.rows_written.items()})
+
+
+def read_input(file_path):
+    """
+    Read the input workbook; returns (df, chunks).
+    Streaming mode reads the first chunk here (enough to validate the columns);
+    the rest is read while writing.
+    Both paths go through the parsed-input cache (see input_cache.py); a frame
+    read whole is then converted to compact dtypes (see compact_dtypes.py) and
+    handed out in STREAM_CHUNK_ROWS slices.
+    """
+    if should_stream(file_path, STREAMING_MODE):
+        chunks = iter_chunks_cached(file_path)
+        df = next(chunks)
+        return df, chain([df], chunks)
+    df = read_excel_cached(file_path)  # columns come back stripped
+    with stage("compact dtypes"):
+        df = compact_frame(df)
+    return df, iter_frame_chunks(df)
+
+
+def output_path_for(file_path, output_dir=None):
+    """
+    <input name>_filtered_<timestamp><ext>, next to the input or in output_dir.
+    ext is .xlsx for CSV/Parquet inputs, and empty (a folder) for the parquet/csv output engines.
+    """
+    base, ext = os.path.splitext(file_path)
+    ext = output_extension(ext)
+    if output_dir:
+        base = os.path.join(output_dir, os.path.basename(base))
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+    return f"{base}_filtered_{timestamp}{ext}"
+
+
+def process_file(file_path, email_match, office_match, output_dir=None):
+    """
+    Headless run over one workbook (no dialogs); used by benchmark.py.
+    Returns {"input", "output", "report"}.
+    """
+    start_run("FilterExcel", input=file_path)
+    with stage("read"):
+        df, chunks = read_input(file_path)
+    email_col_actual, office_col_actual = resolve_columns(df.columns)
+    new_file_path = output_path_for(file_path, output_dir)
+    write_output(chunks, new_file_path, list(df.columns), email_col_actual, office_col_actual,
+                 email_match, office_match)
+    report_path = finish_run(new_file_path)
+    return {"input": file_path, "output": new_file_path, "report": report_path}
+
+
+def main(file_path=None):
+    """GUI entry point; file_path skips the file dialog (see fast_start.py)."""
+    # -------- FILE SELECTION DIALOG --------
+    root = tk.Tk()
+    root.withdraw()  # Hide the root window
+    if file_path is None:
+        file_path = filedialog.askopenfilename(
+            title="Select Excel file",
+            filetypes=[("Excel files", "*.xlsx *.xls"), ("CSV / Parquet", "*.csv *.parquet")]
+        )
+
+    if not file_path:
+        print("No file selected. Exiting.")
+        exit()
+
+    new_file_path = output_path_for(file_path)
+
+    # -------- READ EXCEL --------
+    start_run("FilterExcel", input=file_path)
+    with stage("read"):
+        df, chunks = read_input(file_path)
+
+    try:
+        email_col_actual, office_col_actual = resolve_columns(df.columns)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit()
+    email_match = simpledialog.askstring("Primary Email Key", "Enter the email match")
+    office_match = simpledialog.askstring("Office Key", "Enter the office match")
+
+    # -------- FILTER (case-insensitive) + WRITE TO NEW FILE --------
+    # Header style, widths, hidden columns A–C and zebra striping on both sheets
+    write_output(chunks, new_file_path, list(df.columns), email_col_actual, office_col_actual,
+                 email_match, office_match)
+    report_path = finish_run(new_file_path)
+
+    print(f"✅ Original and filtered data written to new file: {new_file_path}")
+    if report_path:
+        print(f"⏱️ Run report: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,39 @@
 # FilterExcel_multi.py
 # This script filters an Excel file based on a primary email and office match.
-# Email and Office key/value pairs are input by the user.
+# Email and Office key/value pairs are input by the user, or loaded from a JSON/YAML
+# rule file (see filter_rules.py) so large rule sets need no typing.
 # User can add multiple filters.
 # The script writes the original data and filtered data to new Excel files.
 # The script styles the Excel files with a dark blue header and zebra striping.
 # The script also highlights duplicate rows in the filtered sheets.
 # The script also creates a remainder sheet for rows that do not match any filter.
+# Large .xlsx files are streamed chunk by chunk (see STREAMING_MODE).
+# Output goes through a constant-memory writer (see excel_writers.OUTPUT_ENGINE).
 
-import pandas as pd
 from datetime import datetime
 import tkinter as tk
 from tkinter import filedialog, simpledialog, messagebox
 import os
 import re
+from itertools import chain
+
+from compact_dtypes import compact_frame
+from excel_stream import iter_frame_chunks, should_stream
+from excel_writers import make_writer, output_extension
+from filter_matcher import compile_filters, membership_matrix, partition_rows
+from filter_rules import load_rules
+from input_cache import iter_chunks_cached, read_excel_cached
+from run_report import finish_run, record, stage, start_run, timed_iter
+
+# -------- CONFIG: REQUIRED COLUMNS (matched case-insensitively) --------
+EMAIL_COLUMN = "Primary Email"
+OFFICE_COLUMN = "Office"
+
+# -------- CONFIG: STREAMING --------
+STREAMING_MODE = "auto"  # True = always stream input/output, False = never, "auto" = large .xlsx only
+
+# -------- CONFIG: FILTER RULE FILE --------
+RULES_FILE = None  # JSON/YAML rule file (see filter_rules.example.json); set to skip the filter prompts
 
 def sanitize_sheet_name(name: str) -> str:
     """
@@ -33,95 +54,147 @@ def sanitize_sheet_name(name: str) -> str:
     # Truncate to 31 chars
     return name[:31] if name else ""
 
-def style_worksheet(ws):
-    from openpyxl.utils import get_column_letter
-    from openpyxl.styles import Font, PatternFill
-
-    # Define styles
-    header_font = Font(bold=True, color="FFFFFF")  # white text
-    header_fill = PatternFill("solid", fgColor="156082")  # dark blue background
-    stripe1 = PatternFill("solid", fgColor="C0E6F5")  # even rows
-    stripe2 = PatternFill("solid", fgColor="FFFFFF")  # odd rows
-
-    # Hide columns A–C
-    #for col in ["A", "B", "C"]:
-     #   ws.column_dimensions[col].hidden = True
-
-    # Set all column widths to 28
-    for col_idx in range(1, ws.max_column + 1):
-        col_letter = get_column_letter(col_idx)
-        ws.column_dimensions[col_letter].width = 28
-
-    # Header formatting
-    if ws.max_row >= 1:
-        for cell in ws[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-
-    # Zebra striping for data rows (rows 2..max_row)
-    for r in range(2, ws.max_row + 1):
-        fill = stripe1 if (r % 2 == 0) else stripe2
-        for c in range(1, ws.max_column + 1):
-            ws.cell(row=r, column=c).fill = fill
-
-def main():
-    # -------- FILE SELECTION DIALOG --------
-    root = tk.Tk()
-    root.withdraw()  # Hide the root window
-    file_path = filedialog.askopenfilename(
-        title="Select Excel file",
-        filetypes=[("Excel files", "*.xlsx *.xls")]
-    )
+def filter_sheet_names(filters, used_sheet_names):
+    """Determine a user-friendly, valid, and unique sheet name per filter (in order)."""
+    names = []
+    for idx, (email_match, office_match) in enumerate(filters, start=1):
+        base_name = f"Filtered {sanitize_sheet_name(office_match) or sanitize_sheet_name(email_match) or f'Filter {idx}'}"
+        sheet_name = base_name
+        suffix = 2
+        while sheet_name in used_sheet_names or not sheet_name:
+            sheet_name = f"{base_name} ({suffix})"
+            suffix += 1
+        used_sheet_names.add(sheet_name)
+        names.append(sheet_name)
+    return names
 
-    if not file_path:
-        print("No file selected. Exiting.")
-        return
+def compile_pairs(filters):
+    """
+    Compile (email_match, office_match) pairs into one matcher, one sheet per pair
+    named by filter_sheet_names (case-insensitive substring match, OR logic).
+    """
+    sheet_names = filter_sheet_names(filters, {"Original Data"})
+    return compile_filters({name: [{"email": email_match, "office": office_match}]
+                            for name, (email_match, office_match) in zip(sheet_names, filters)})
 
-    # -------- CONFIG --------
-    email_column = "Primary Email"
-    office_column = "Office"
+def unique_sheet_names(labels, used_sheet_names):
+    """Valid, unique sheet name per rule file label (in order)."""
+    names = []
+    for label in labels:
+        base_name = sanitize_sheet_name(label) or "Filtered"
+        sheet_name = base_name
+        suffix = 2
+        while sheet_name in used_sheet_names:
+            sheet_name = f"{base_name} ({suffix})"
+            suffix += 1
+        used_sheet_names.add(sheet_name)
+        names.append(sheet_name)
+    return names
 
-    # -------- READ EXCEL --------
-    try:
-        df = pd.read_excel(file_path)
-    except Exception as e:
-        messagebox.showerror("Read Error", f"Failed to read Excel file:\n{e}")
-        return
+def write_output(chunks, new_file_path, columns, compiled, email_col_actual, office_col_actual):
+    """
+    Route each input chunk to the original and filter sheets through the output writer.
+    compiled: CompiledFilters from compile_pairs() or a rule file.
+    Each chunk is matched against every filter in one pass and converted to a row
+    buffer once; filter sheets take their rows from it by position.
+    """
+    writer = make_writer(new_file_path)
+    writer.add_sheet("Original Data", columns)
+    sheet_names = unique_sheet_names(compiled.labels, {"Original Data"})
+    for sheet_name in sheet_names:
+        writer.add_sheet(sheet_name, columns)
 
-    # Normalize columns
-    df.columns = df.columns.str.strip()
-    lower_cols = {col.lower(): col for col in df.columns}
+    for chunk in timed_iter(chunks, "read"):
+        with stage("match"):
+            positions, _ = partition_rows(membership_matrix(chunk, compiled, email_col_actual, office_col_actual))
+        with stage("row buffer"):
+            rows = writer.buffer(chunk)
+        with stage("write: Original Data"):
+            writer.append_rows("Original Data", rows)
+        for sheet_name, sheet_rows in zip(sheet_names, positions):
+            with stage(f"write: {sheet_name}"):
+                writer.append_rows(sheet_name, rows, sheet_rows)
+        del rows
+    with stage("save"):
+        writer.save()
+    record(rows_by_sheet={name: n - 1 for name, n in writer.rows_written.items()})
 
-    # -------- VALIDATE COLUMNS (case-insensitive) --------
-    missing_cols = [col for col in [email_column.lower(), office_column.lower()] if col not in lower_cols]
+def read_input(file_path):
+    """
+    Read the input workbook.
+    Returns (df, chunks): df is the whole frame, or only the first chunk in
+    streaming mode (enough to validate the columns); chunks yields the data
+    for write_output.
+    Both paths go through the parsed-input cache (see input_cache.py); a frame
+    read whole is then converted to compact dtypes (see compact_dtypes.py) and
+    handed out in STREAM_CHUNK_ROWS slices.
+    """
+    # Streaming mode reads the first chunk here; the rest is read while writing
+    if should_stream(file_path, STREAMING_MODE):
+        chunks = iter_chunks_cached(file_path)
+        df = next(chunks)
+        return df, chain([df], chunks)
+
+    # Columns come back stripped
+    df = read_excel_cached(file_path)
+    with stage("compact dtypes"):
+        df = compact_frame(df)
+    return df, iter_frame_chunks(df)
+
+def resolve_columns(columns):
+    """
+    Map EMAIL_COLUMN / OFFICE_COLUMN to the actual column names (case-insensitive).
+    Raises ValueError listing the missing required column(s).
+    """
+    lower_cols = {col.lower(): col for col in columns}
+    missing_cols = [col for col in [EMAIL_COLUMN.lower(), OFFICE_COLUMN.lower()] if col not in lower_cols]
     if missing_cols:
-        messagebox.showerror("Missing Columns",
-                             f"Error: Missing required column(s): {', '.join(missing_cols)}")
-        return
+        raise ValueError(f"Missing required column(s): {', '.join(missing_cols)}")
+    return lower_cols[EMAIL_COLUMN.lower()], lower_cols[OFFICE_COLUMN.lower()]
+
+def output_path_for(file_path, output_dir=None):
+    """
+    <input name>_filtered_<timestamp><ext>, next to the input or in output_dir.
+    ext is .xlsx for CSV/Parquet inputs, and empty (a folder) for the parquet/csv output engines.
+    """
+    base, ext = os.path.splitext(file_path)
+    ext = output_extension(ext)
+    if output_dir:
+        base = os.path.join(output_dir, os.path.basename(base))
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+    return f"{base}_filtered_{timestamp}{ext}"
 
-    # Map actual column names
-    email_col_actual = lower_cols[email_column.lower()]
-    office_col_actual = lower_cols[office_column.lower()]
+def process_file(file_path, filters=None, output_dir=None, rules_file=None):
+    """
+    Headless run over one workbook (no dialogs); used by batch_filter.py.
+    filters: list of (email_match, office_match) pairs, or rules_file: a JSON/YAML
+    rule file (see filter_rules.py).
+    Raises on rule file, read, validation or write errors.
+    Returns {"input", "output", "report", "filters"}.
+    """
+    start_run("FilterExcel_multi", input=file_path)
+    with stage("load filters"):
+        compiled = load_rules(rules_file) if rules_file else compile_pairs(filters)
+    with stage("read"):
+        df, chunks = read_input(file_path)
+    email_col_actual, office_col_actual = resolve_columns(df.columns)
+    new_file_path = output_path_for(file_path, output_dir)
+    write_output(chunks, new_file_path, list(df.columns), compiled, email_col_actual, office_col_actual)
+    report_path = finish_run(new_file_path, filters=len(compiled.labels))
+    return {"input": file_path, "output": new_file_path, "report": report_path,
+            "filters": len(compiled.labels)}
 
-    # -------- COLLECT MULTIPLE FILTERS --------
+def ask_filters():
+    """Prompt for email/office pairs until the user stops; returns the list (empty if cancelled)."""
     filters = []
     while True:
         email_match = simpledialog.askstring("Primary Email Key", "Enter the email match (required):")
         if email_match is None:  # user cancelled
-            # If no filters yet, cancel whole run
-            if not filters:
-                print("No filters entered. Exiting.")
-                return
-            else:
-                break
+            break
 
         office_match = simpledialog.askstring("Office Key", "Enter the office match (required):")
         if office_match is None:
-            if not filters:
-                print("No filters entered. Exiting.")
-                return
-            else:
-                break
+            break
 
         email_match = (email_match or "").strip()
         office_match = (office_match or "").strip()
@@ -137,48 +210,76 @@ def main():
                                    "Would you like to add another filter?\n\nYes = add another\nNo = continue")
         if not more:
             break
+    return filters
+
+def main(file_path=None):
+    """GUI entry point; file_path skips the file dialog (see fast_start.py)."""
+    # -------- FILE SELECTION DIALOG --------
+    root = tk.Tk()
+    root.withdraw()  # Hide the root window
+    if file_path is None:
+        file_path = filedialog.askopenfilename(
+            title="Select Excel file",
+            filetypes=[("Excel files", "*.xlsx *.xls"), ("CSV / Parquet", "*.csv *.parquet")]
+        )
+
+    if not file_path:
+        print("No file selected. Exiting.")
+        return
+
+    # -------- READ EXCEL --------
+    start_run("FilterExcel_multi", input=file_path)
+    try:
+        with stage("read"):
+            df, chunks = read_input(file_path)
+    except Exception as e:
+        messagebox.showerror("Read Error", f"Failed to read Excel file:\n{e}")
+        return
+
+    # -------- VALIDATE COLUMNS (case-insensitive) --------
+    try:
+        email_col_actual, office_col_actual = resolve_columns(df.columns)
+    except ValueError as e:
+        messagebox.showerror("Missing Columns", f"Error: {e}")
+        return
+
+    # -------- LOAD OR COLLECT FILTERS --------
+    rules_file = RULES_FILE
+    if not rules_file and messagebox.askyesno(
+            "Filter Rule File?",
+            "Load filters from a rule file (JSON/YAML)?\n\nYes = choose a file\nNo = enter filters one by one"):
+        rules_file = filedialog.askopenfilename(
+            title="Select filter rule file",
+            filetypes=[("Filter rules", "*.json *.yaml *.yml")]
+        )
+        if not rules_file:
+            print("No rule file selected. Exiting.")
+            return
+
+    if rules_file:
+        try:
+            with stage("load filters"):
+                compiled = load_rules(rules_file)
+        except ValueError as e:
+            messagebox.showerror("Rule File Error", f"Failed to load filter rules:\n{e}")
+            return
+    else:
+        filters = ask_filters()
+        if not filters:
+            print("No filters entered. Exiting.")
+            return
+        compiled = compile_pairs(filters)
 
     # -------- PROCESS FILTERS AND WRITE OUTPUT --------
-    base, ext = os.path.splitext(file_path)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-    new_file_path = f"{base}_filtered_{timestamp}{ext}"
+    new_file_path = output_path_for(file_path)
+    n_filters = len(compiled.labels)
 
     try:
-        with pd.ExcelWriter(new_file_path, engine="openpyxl") as writer:
-            # Original sheet
-            df.to_excel(writer, sheet_name="Original Data", index=False)
-
-            used_sheet_names = {"Original Data"}
-            # For each filter pair, compute filtered DF and write to its own sheet
-            for idx, (email_match, office_match) in enumerate(filters, start=1):
-                # Build filter (case-insensitive; OR logic)
-                mask = pd.Series(False, index=df.index)
-
-                if email_match:
-                    mask = mask | df[email_col_actual].astype(str).str.lower().str.contains(email_match.lower(), na=False)
-                if office_match:
-                    mask = mask | df[office_col_actual].astype(str).str.lower().str.contains(office_match.lower(), na=False)
-
-                filtered_df = df[mask].copy()
-
-                # Determine a user-friendly, valid, and unique sheet name
-                base_name = f"Filtered {sanitize_sheet_name(office_match) or sanitize_sheet_name(email_match) or f'Filter {idx}'}"
-                sheet_name = base_name
-                suffix = 2
-                while sheet_name in used_sheet_names or not sheet_name:
-                    sheet_name = f"{base_name} ({suffix})"
-                    suffix += 1
-                used_sheet_names.add(sheet_name)
-
-                filtered_df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-            # Apply styling to all sheets
-            wb = writer.book
-            for sheet_name in used_sheet_names:
-                ws = wb[sheet_name]
-                style_worksheet(ws)
-
-        print(f"✅ Original and {len(filters)} filtered sheet(s) written to new file:\n{new_file_path}")
+        write_output(chunks, new_file_path, list(df.columns), compiled, email_col_actual, office_col_actual)
+        report_path = finish_run(new_file_path, filters=n_filters)
+        print(f"✅ Original and {n_filters} filtered sheet(s) written to new file:\n{new_file_path}")
+        if report_path:
+            print(f"⏱️ Run report: {report_path}")
     except Exception as e:
         messagebox.showerror("Write Error", f"Failed to write Excel file:\n{e}")
 
@@ -1,11 +1,15 @@
 # FilterExcel_multiBU.py
 # This script filters an Excel file based on a primary email and office match.
-# Email and Office key/value pairs are hard-coded in the script.
+# Email and Office key/value pairs come from a JSON/YAML rule file (see RULES_FILE),
+# or from FILTER_DEFINITIONS hard-coded in the script when there is none.
 # The script writes the original data and filtered data to new Excel files.
 # The script styles the Excel files with a dark blue header and zebra striping.
 # The script also highlights duplicate rows in the filtered sheets.
 # The script also creates a remainder sheet for rows that do not match any filter.
+# Large .xlsx files are streamed chunk by chunk (see STREAMING_MODE).
+# Output goes through a constant-memory writer (see excel_writers.OUTPUT_ENGINE).
 
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import tkinter as tk
@@ -16,10 +20,25 @@ import re
 import unicodedata
 import string
 
+from collections import Counter, defaultdict
+
+from compact_dtypes import compact_frame
+from excel_stream import iter_frame_chunks, should_stream
+from excel_writers import make_writer, output_extension
+from filter_matcher import compile_filters, membership_matrix, partition_rows
+from filter_rules import find_rules_file, load_rules
+from fuzzy_dupes import cluster_keys
+from incremental import Manifest, diff_rows, find_previous, fingerprint, key_hashes, plan_reuse, row_hashes
+from input_cache import iter_chunks_cached, read_excel_cached
+from run_report import finish_run, record, stage, start_run, timed_iter
+
 # --- Duplicate detection config ---
 NAME_COLUMNS = ["Name"]  # first existing (case-insensitive) will be used
 IGNORE_PUNCTUATION = True
 STRIP_DIACRITICS = True
+FUZZY_DUPLICATES = False        # also treat near-identical names as duplicates (see fuzzy_dupes.py)
+CROSS_SHEET_DUPLICATES = False  # count a name across ALL filter sheets, not just within one sheet
+DUPLICATE_CLUSTER_SHEET_NAME = "Duplicate Clusters"  # written when either option above is on
 
 def normalize_name(value: str) -> str:
     """
@@ -58,14 +77,113 @@ def normalize_name(value: str) -> str:
 
     return s
 
+# Raw name -> normalize_name() result, shared by every sheet, chunk and pass of a run
+_normalized_name_cache = {}
+
+_ASCII_WHITESPACE = "".join(ch for ch in map(chr, range(128)) if ch.isspace())
+
+def _char_class(chars) -> str:
+    """Regex character class matching exactly these characters."""
+    return "[" + "".join(re.escape(ch) for ch in sorted(chars)) + "]"
+
+def _collapse_whitespace(text: pd.Series, whitespace) -> pd.Series:
+    """" ".join(value.split()) per value; whitespace: every whitespace character that occurs."""
+    return text.str.replace(_char_class(whitespace) + "+", " ", regex=True).str.strip(" ")
+
+def _normalize_texts(values: list) -> list:
+    """
+    normalize_name over a list of str, as a few whole-column passes.
+    - The unicodedata steps only run on non-ASCII values (ASCII text is already
+      normalized) and stay per value: pandas' .str.normalize loops over values too
+    - Whitespace, diacritics and punctuation are removed with regexes over exactly
+      the characters normalize_name drops (str.split() whitespace, category Mn,
+      string.punctuation), which the Arrow string dtype runs in C
+    """
+    def nfd(text):
+        return unicodedata.normalize("NFD", text) if STRIP_DIACRITICS else text
+
+    # NFKC + lowercase (+ NFD, ready for the diacritics step)
+    is_ascii = [value.isascii() for value in values]
+    texts = [value.lower() if plain else nfd(unicodedata.normalize("NFKC", value).lower())
+             for value, plain in zip(values, is_ascii)]
+    # Every non-ASCII character that occurs (later steps only drop or recompose them)
+    chars = set("".join(text for text, plain in zip(texts, is_ascii) if not plain))
+    whitespace = set(_ASCII_WHITESPACE) | {ch for ch in chars if ch.isspace()}
+    marks = {ch for ch in chars if unicodedata.category(ch) == "Mn"}
+
+    text = pd.Series(texts, dtype="str")
+    if not IGNORE_PUNCTUATION:
+        # Collapsed before the diacritics are dropped, as in normalize_name; with
+        # IGNORE_PUNCTUATION once at the end (nothing in between adds or drops whitespace)
+        text = _collapse_whitespace(text, whitespace)
+
+    if STRIP_DIACRITICS:
+        if marks:
+            text = text.str.replace(_char_class(marks), "", regex=True)
+        text = pd.Series([value if plain else unicodedata.normalize("NFKC", value)
+                          for value, plain in zip(text.tolist(), is_ascii)], dtype="str")
+
+    if IGNORE_PUNCTUATION:
+        text = _collapse_whitespace(text.str.replace(_char_class(string.punctuation), "", regex=True), whitespace)
+    return text.tolist()
+
+def normalize_names(names: pd.Series) -> pd.Series:
+    """
+    Vectorized normalize_name over a Series of names.
+    - Rows are factorized so each distinct raw value is looked at once per call
+    - Distinct values are normalized once per run via _normalized_name_cache, new
+      ones with whole-column string operations (_normalize_texts)
+    - Keys are identical to calling normalize_name on every row
+    """
+    codes, uniques = pd.factorize(names, use_na_sentinel=False)
+    uniques = np.asarray(uniques, dtype=object)
+    cache = _normalized_name_cache
+    keys = np.array([cache.get(raw) if isinstance(raw, str) else normalize_name(raw) for raw in uniques],
+                    dtype=object)
+    new = np.flatnonzero(pd.isna(keys))
+    if len(new):
+        keys[new] = _normalize_texts(uniques[new].tolist())
+        cache.update(zip(uniques[new], keys[new]))
+    return pd.Series(keys[codes], index=names.index)
+
+
+# -------- CONFIG: REQUIRED COLUMNS (matched case-insensitively) --------
+EMAIL_COLUMN = "Email"
+OFFICE_COLUMN = "BU Code"
 
 # -------- CONFIG: EXTRA "REMAINDER" OUTPUT --------
 CREATE_REMAINDER_SHEET = True
 REMAINDER_SHEET_NAME = "Remaining (Unmatched)"
 
+# -------- CONFIG: STREAMING --------
+# True = always stream input/output in chunks, False = never, "auto" = large .xlsx only.
+# Streaming reads the input twice (names first, for duplicate counts) but keeps
+# memory flat regardless of row count.
+STREAMING_MODE = "auto"
+
+# -------- CONFIG: FILTER RULE FILE --------
+# JSON/YAML file shaped like FILTER_DEFINITIONS below (see filter_rules.example.json).
+# None = use filter_rules.json / .yaml / .yml next to this script (or the .exe) if
+# present, otherwise the hard-coded FILTER_DEFINITIONS.
+RULES_FILE = os.environ.get("FILTEREXCEL_RULES") or None
+
+# -------- CONFIG: INCREMENTAL RE-RUNS --------
+# True = store row hashes next to each output and, on the next run, re-use the
+# leading rows of every sheet that are unchanged since the previous output in the
+# same folder (see incremental.py). Needs the xlsxwriter output engine.
+INCREMENTAL = os.environ.get("FILTEREXCEL_INCREMENTAL") == "1"
+# Column identifying a row across runs (e.g. "ID"), so edited rows are reported
+# as changed rather than removed + added. None = compare whole rows only.
+INCREMENTAL_KEY_COLUMN = None
+
 # -------- HARD-CODED FILTER DEFINITIONS --------
 # Each key becomes an output sheet; each value is a list of (email/office) pairs.
 # A row is included in a sheet if it matches ANY pair in that sheet (OR across pairs).
+# "email" / "office" are substring matches ("105" also matches "1050"). For exact
+# matches use any of these keys instead (one value or a list):
+#   {"office_exact": "105"}                 BU code is exactly 105
+#   {"email_domain": "gil-bar.com"}         everything after the @
+#   {"email_local": "jsmith"}               everything before the @
 FILTER_DEFINITIONS = {
     # EXAMPLES — edit freely:
     "GBI": [
@@ -125,197 +243,387 @@ def sanitize_sheet_name(name: str) -> str:
     name = name.strip("'")
     return name[:31] if name else ""
 
-def style_worksheet(ws):
-    from openpyxl.utils import get_column_letter
-    from openpyxl.styles import Font, PatternFill
-
-    header_font = Font(bold=True, color="FFFFFF")          # white text
-    header_fill = PatternFill("solid", fgColor="156082")   # dark blue background
-    stripe1 = PatternFill("solid", fgColor="C0E6F5")       # even rows
-    stripe2 = PatternFill("solid", fgColor="FFFFFF")       # odd rows
-
-    # Hide columns A–C
-    #for col in ["A", "B", "C"]:
-     #   ws.column_dimensions[col].hidden = True
-
-    # Set all column widths to 28
-    for col_idx in range(1, ws.max_column + 1):
-        col_letter = get_column_letter(col_idx)
-        ws.column_dimensions[col_letter].width = 28
-
-    # Header formatting
-    if ws.max_row >= 1:
-        for cell in ws[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-
-    # Zebra striping for data rows (rows 2..max_row)
-    for r in range(2, ws.max_row + 1):
-        fill = stripe1 if (r % 2 == 0) else stripe2
-        for c in range(1, ws.max_column + 1):
-            ws.cell(row=r, column=c).fill = fill
-
-def main():
+def unique_sheet_name(base_name: str, used_sheet_names: set) -> str:
+    """Append " (2)", " (3)", ... until the name is non-empty and unused; records it as used."""
+    sheet_name = base_name
+    suffix = 2
+    while not sheet_name or sheet_name in used_sheet_names:
+        sheet_name = f"{base_name} ({suffix})"
+        suffix += 1
+    used_sheet_names.add(sheet_name)
+    return sheet_name
+
+def find_name_column(columns):
+    """First column from NAME_COLUMNS present in columns (case-insensitive), else None."""
+    lower_cols = {c.lower(): c for c in columns}
+    for candidate in NAME_COLUMNS:
+        actual = lower_cols.get(candidate.lower())
+        if actual:
+            return actual
+    return None
+
+def resolve_duplicate_counts(key_counts, row_counts, sheet_names):
+    """
+    Turn per-sheet normalized-name counts into the counts used for highlighting.
+    row_counts counts each input row once, however many filter sheets it lands on.
+    - FUZZY_DUPLICATES: near-identical names are merged into one cluster, keyed by
+      its canonical name
+    - CROSS_SHEET_DUPLICATES: every sheet is checked against workbook-wide counts
+      of distinct input rows, so a row on two sheets is not a duplicate of itself
+    Returns (canonical, highlight_counts, clusters_df):
+    - canonical: {name key: cluster key}; keys not in it are their own cluster
+    - highlight_counts: per sheet {cluster key: row count}
+    - clusters_df: clusters only found by the options above (several spellings or
+      several sheets), for the report sheet
+    """
+    canonical = {}
+    if FUZZY_DUPLICATES:
+        all_counts = Counter()
+        for counts in key_counts:
+            all_counts.update(counts)
+        canonical = cluster_keys(all_counts)
+
+    def merge(counts):
+        merged = Counter()
+        for key, n in counts.items():
+            merged[canonical.get(key, key)] += n
+        return merged
+
+    cluster_counts = [merge(counts) for counts in key_counts]
+    total = merge(row_counts)
+
+    if CROSS_SHEET_DUPLICATES:
+        highlight_counts = [total] * len(cluster_counts)
+    else:
+        highlight_counts = cluster_counts
+
+    report = []
+    if FUZZY_DUPLICATES or CROSS_SHEET_DUPLICATES:
+        variants = defaultdict(set)
+        for counts in key_counts:
+            for key in counts:
+                variants[canonical.get(key, key)].add(key)
+        for head, names in variants.items():
+            if not head:
+                continue
+            sheets = [sheet_names[i] for i, counts in enumerate(cluster_counts) if counts[head]]
+            rows = total[head]
+            spellings = FUZZY_DUPLICATES and len(names) > 1
+            spans_sheets = CROSS_SHEET_DUPLICATES and len(sheets) > 1
+            if rows > 1 and (spellings or spans_sheets):
+                report.append({"Cluster": head, "Names": " | ".join(sorted(names)),
+                               "Sheets": ", ".join(sheets), "Rows": rows})
+    clusters_df = pd.DataFrame(report, columns=["Cluster", "Names", "Sheets", "Rows"])
+    return canonical, highlight_counts, clusters_df
+
+def load_filters(rules_file=None):
+    """
+    Compiled filters for this run: rules_file, else RULES_FILE, else a
+    filter_rules.json/.yaml next to the script, else FILTER_DEFINITIONS.
+    Raises filter_rules.RuleFileError if the rule file is unreadable or invalid.
+    """
+    rules_file = rules_file or RULES_FILE or find_rules_file()
+    with stage("load filters"):
+        if rules_file:
+            record(rules_file=rules_file)
+            return load_rules(rules_file)
+        return compile_filters(FILTER_DEFINITIONS)
+
+def find_key_column(columns):
+    """INCREMENTAL_KEY_COLUMN as spelled in columns (case-insensitive), else None."""
+    if not INCREMENTAL_KEY_COLUMN:
+        return None
+    lower_cols = {str(c).lower(): c for c in columns}
+    return lower_cols.get(INCREMENTAL_KEY_COLUMN.lower())
+
+def plan_incremental(writer, new_file_path, columns, sheet_hashes, keys):
+    """
+    Compare this run's row hashes with the best previous output in the same folder
+    and tell the writer which leading rows it can re-use from it.
+    Returns (fingerprint, summary) where summary has added/removed/changed row
+    counts against the previous output (None on a first run) and rows re-used per sheet.
+    """
+    fp = fingerprint(columns, writer.engine_version)
+    summary = {"previous": None, "reused_rows": {}}
+    previous = find_previous(os.path.dirname(os.path.abspath(new_file_path)), fp, sheet_hashes["Original Data"])
+    if previous is None:
+        return fp, summary
+
+    summary["previous"] = previous.output_path
+    summary.update(diff_rows(previous.sheets["Original Data"], sheet_hashes["Original Data"],
+                             previous.keys, keys))
+    if writer.supports_reuse:
+        for name, n in plan_reuse(previous, sheet_hashes).items():
+            writer.reuse_rows(name, previous.output_path, n)
+            summary["reused_rows"][name] = n
+    return fp, summary
+
+def write_output(chunk_source, new_file_path, email_col_actual, office_col_actual, compiled, incremental=False):
+    """
+    Filter, deduplicate and write the output workbook.
+    chunk_source() returns an iterable of DataFrame chunks: the whole frame as one
+    chunk when it was read into memory, or fresh streamed chunks for large files.
+    - Pass 1 counts normalized names per filter sheet (duplicates can span chunks),
+      then optionally merges fuzzy / cross-sheet clusters (resolve_duplicate_counts)
+    - Pass 2 partitions each chunk into row positions per sheet (plus the
+      remainder) and writes those rows from one shared row buffer, highlighting
+      duplicate rows as they are written; no per-sheet DataFrame is built
+    - incremental: pass 1 also hashes every row per output sheet; leading rows
+      unchanged since the previous output are re-used from it (plan_incremental)
+      and a manifest is stored for the next run
+    compiled: CompiledFilters from load_filters().
+    Returns (duplicates, changes): {sheet name: duplicate row count} for the
+    summary message, and the plan_incremental() summary (None when not incremental).
+    """
+    n_sheets = len(compiled.labels)
+    _normalized_name_cache.clear()  # flags may have changed since the last run
+
+    used_sheet_names = {"Original Data"}
+    sheet_names = [unique_sheet_name(sanitize_sheet_name(label) or "Filtered", used_sheet_names)
+                   for label in compiled.labels]
+    remainder_name = None
+    if CREATE_REMAINDER_SHEET:
+        remainder_name = unique_sheet_name(sanitize_sheet_name(REMAINDER_SHEET_NAME) or "Remaining",
+                                           used_sheet_names)
+    output_sheets = ["Original Data"] + sheet_names + ([remainder_name] if remainder_name else [])
+
+    # ----- Pass 1: duplicate key counts per filter sheet (and row hashes) -----
+    key_counts = [Counter() for _ in range(n_sheets)]
+    row_counts = Counter()  # per input row, not per sheet
+    name_col_actual = None
+    columns = None
+    hash_parts = {name: [] for name in output_sheets}
+    key_parts = []
+    for chunk in timed_iter(chunk_source(), "pass 1: read"):
+        columns = list(chunk.columns)
+        name_col_actual = find_name_column(chunk.columns)
+        if not name_col_actual and not incremental:
+            break
+        with stage("pass 1: match"):
+            membership = membership_matrix(chunk, compiled, email_col_actual, office_col_actual)
+
+        if incremental:
+            with stage("pass 1: row hashes"):
+                hashes = row_hashes(chunk)
+                positions, remainder = partition_rows(membership)
+                hash_parts["Original Data"].append(hashes)
+                for sheet_name, sheet_rows in zip(sheet_names, positions):
+                    hash_parts[sheet_name].append(hashes[sheet_rows])
+                if remainder_name:
+                    hash_parts[remainder_name].append(hashes[remainder])
+                key_col = find_key_column(chunk.columns)
+                if key_col is not None:
+                    key_parts.append(key_hashes(chunk[key_col]))
+
+        if not name_col_actual:
+            continue
+        with stage("pass 1: normalize names"):
+            keys = normalize_names(chunk[name_col_actual].astype(str))
+        with stage("pass 1: count duplicates"):
+            for sheet_idx in range(n_sheets):
+                key_counts[sheet_idx].update(keys[membership[:, sheet_idx]].value_counts().to_dict())
+            row_counts.update(keys[membership.any(axis=1)].value_counts().to_dict())
+
+    with stage("resolve duplicates"):
+        canonical, highlight_counts, clusters_df = resolve_duplicate_counts(key_counts, row_counts, sheet_names)
+
+    # ----- Pass 2: route rows to sheets -----
+    writer = make_writer(new_file_path)
+    if columns is not None:
+        for name in output_sheets:
+            writer.add_sheet(name, columns)
+
+    changes = None
+    if incremental and columns is not None:
+        with stage("incremental: plan"):
+            sheet_hashes = {name: np.concatenate(parts) if parts else np.empty(0, np.uint64)
+                            for name, parts in hash_parts.items()}
+            keys_all = np.concatenate(key_parts) if key_parts else None
+            manifest_fp, changes = plan_incremental(writer, new_file_path, columns, sheet_hashes, keys_all)
+    del hash_parts, key_parts
+
+    duplicates_by_sheet = {}
+    for chunk in timed_iter(chunk_source(), "pass 2: read"):
+        with stage("pass 2: match"):
+            membership = membership_matrix(chunk, compiled, email_col_actual, office_col_actual)
+            positions, remainder = partition_rows(membership)
+        with stage("pass 2: normalize names"):
+            keys = normalize_names(chunk[name_col_actual].astype(str)) if name_col_actual else None
+            if keys is not None and canonical:
+                keys = keys.map(canonical).fillna(keys)
+
+        with stage("pass 2: row buffer"):
+            # Chunks made up entirely of re-used rows are only counted, never converted
+            needed = (writer.rows_needed("Original Data", len(chunk))
+                      or any(writer.rows_needed(name, len(p)) for name, p in zip(sheet_names, positions))
+                      or (remainder_name is not None and writer.rows_needed(remainder_name, len(remainder))))
+            rows = writer.buffer(chunk) if needed else [None] * len(chunk)
+        with stage("write: Original Data"):
+            writer.append_rows("Original Data", rows)
+        for sheet_idx, sheet_name in enumerate(sheet_names):
+            sheet_rows = positions[sheet_idx]
+            highlight = None
+            if keys is not None:
+                with stage(f"dedup: {sheet_name}"):
+                    # Flag duplicates (ignore blanks)
+                    sheet_keys = keys.take(sheet_rows)
+                    highlight = ((sheet_keys.map(highlight_counts[sheet_idx]) > 1) & (sheet_keys != "")).to_numpy()
+                if highlight.any():
+                    duplicates_by_sheet[sheet_name] = duplicates_by_sheet.get(sheet_name, 0) + int(highlight.sum())
+            with stage(f"write: {sheet_name}"):
+                writer.append_rows(sheet_name, rows, sheet_rows, highlight=highlight)
+
+        # Intentionally not doing duplicate highlighting on remainder sheet
+        if remainder_name:
+            with stage(f"write: {remainder_name}"):
+                writer.append_rows(remainder_name, rows, remainder)
+        del rows
+
+    # -------- DUPLICATE CLUSTER REPORT --------
+    if not clusters_df.empty:
+        cluster_sheet = unique_sheet_name(sanitize_sheet_name(DUPLICATE_CLUSTER_SHEET_NAME) or "Clusters",
+                                          used_sheet_names)
+        writer.add_sheet(cluster_sheet, list(clusters_df.columns))
+        writer.append(cluster_sheet, clusters_df.sort_values("Rows", ascending=False))
+
+    with stage("save"):
+        writer.save()
+
+    if changes is not None:
+        with stage("incremental: manifest"):
+            Manifest(new_file_path, manifest_fp, sheet_hashes, keys_all).save()
+        record(incremental=changes)
+
+    record(rows_by_sheet={name: n - 1 for name, n in writer.rows_written.items()},
+           duplicates_by_sheet=duplicates_by_sheet)
+    return duplicates_by_sheet, changes
+
+def read_input(file_path):
+    """
+    Read the input workbook.
+    Returns (df, chunk_source): df is the whole frame, or only the first chunk in
+    streaming mode (enough to validate the columns); chunk_source() yields the
+    data for write_output.
+    Both paths go through the parsed-input cache (see input_cache.py); a frame
+    read whole is then converted to compact dtypes (see compact_dtypes.py) and
+    handed out in STREAM_CHUNK_ROWS slices.
+    """
+    if should_stream(file_path, STREAMING_MODE):
+        df = next(iter_chunks_cached(file_path))
+        return df, lambda: iter_chunks_cached(file_path)
+
+    # Columns come back stripped
+    df = read_excel_cached(file_path)
+    with stage("compact dtypes"):
+        df = compact_frame(df)
+    return df, lambda: iter_frame_chunks(df)
+
+def resolve_columns(columns):
+    """
+    Map EMAIL_COLUMN / OFFICE_COLUMN to the actual column names (case-insensitive).
+    Raises ValueError listing the missing required column(s).
+    """
+    lower_cols = {col.lower(): col for col in columns}
+    required = [EMAIL_COLUMN.lower(), OFFICE_COLUMN.lower()]
+    missing_cols = [col for col in required if col not in lower_cols]
+    if missing_cols:
+        raise ValueError(f"Missing required column(s): {', '.join(missing_cols)}")
+    return lower_cols[EMAIL_COLUMN.lower()], lower_cols[OFFICE_COLUMN.lower()]
+
+def output_path_for(file_path, output_dir=None):
+    """
+    <input name>_filtered_<timestamp><ext>, next to the input or in output_dir.
+    ext is .xlsx for CSV/Parquet inputs, and empty (a folder) for the parquet/csv output engines.
+    """
+    base, ext = os.path.splitext(file_path)
+    ext = output_extension(ext)
+    if output_dir:
+        base = os.path.join(output_dir, os.path.basename(base))
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+    return f"{base}_filtered_{timestamp}{ext}"
+
+def summary_message(new_file_path, duplicates_by_sheet, n_filters, changes=None):
+    message = (
+        f"✅ Original, {n_filters} filtered sheet(s)"
+        f"{' + remainder' if CREATE_REMAINDER_SHEET else ''} written to:\n{new_file_path}\n"
+        f"🔍 Duplicate highlighting: " + (", ".join([f"{k}: {v} row(s)" for k, v in duplicates_by_sheet.items()]) if duplicates_by_sheet else "none")
+    )
+    if changes is not None:
+        if changes["previous"] is None:
+            message += "\n🔁 Incremental: no previous output to compare with (full run)"
+        else:
+            message += (f"\n🔁 Since {os.path.basename(changes['previous'])}: "
+                        f"{changes['added']} added, {changes['removed']} removed, {changes['changed']} changed; "
+                        f"{sum(changes['reused_rows'].values())} row(s) re-used")
+    return message
+
+def process_file(file_path, output_dir=None, rules_file=None, incremental=None):
+    """
+    Headless run over one workbook (no dialogs); used by batch_filter.py.
+    rules_file: rule file to use instead of the default lookup (see load_filters).
+    incremental: override INCREMENTAL for this run.
+    Raises on rule file, read, validation or write errors.
+    Returns {"input", "output", "report", "duplicates", "changes"}.
+    """
+    start_run("FilterExcel_multiBU", input=file_path)
+    compiled = load_filters(rules_file)
+    with stage("read"):
+        df, chunk_source = read_input(file_path)
+    email_col_actual, office_col_actual = resolve_columns(df.columns)
+    new_file_path = output_path_for(file_path, output_dir)
+    duplicates_by_sheet, changes = write_output(chunk_source, new_file_path, email_col_actual, office_col_actual,
+                                                compiled, INCREMENTAL if incremental is None else incremental)
+    report_path = finish_run(new_file_path)
+    return {"input": file_path, "output": new_file_path, "report": report_path,
+            "duplicates": duplicates_by_sheet, "changes": changes}
+
+def main(file_path=None):
+    """GUI entry point; file_path skips the file dialog (see fast_start.py)."""
     # -------- FILE SELECTION DIALOG --------
     root = tk.Tk()
     root.withdraw()
-    file_path = filedialog.askopenfilename(
-        title="Select Excel file",
-        filetypes=[("Excel files", "*.xlsx *.xls")]
-    )
+    if file_path is None:
+        file_path = filedialog.askopenfilename(
+            title="Select Excel file",
+            filetypes=[("Excel files", "*.xlsx *.xls"), ("CSV / Parquet", "*.csv *.parquet")]
+        )
     if not file_path:
         print("No file selected. Exiting.")
         return
 
-    # -------- CONFIG (required columns) --------
-    email_column = "Email"
-    office_column = "BU Code"
-    name_column = "Name"  # used for duplicate detection on filter sheets
+    # -------- LOAD FILTER RULES --------
+    start_run("FilterExcel_multiBU", input=file_path)
+    try:
+        compiled = load_filters()
+    except ValueError as e:
+        messagebox.showerror("Rule File Error", f"Failed to load filter rules:\n{e}")
+        return
 
     # -------- READ EXCEL --------
+    # Streaming mode only reads the first chunk here to validate the columns
     try:
-        df = pd.read_excel(file_path)
+        with stage("read"):
+            df, chunk_source = read_input(file_path)
     except Exception as e:
         messagebox.showerror("Read Error", f"Failed to read Excel file:\n{e}")
         return
 
-    # Normalize columns and map case-insensitively
-    df.columns = df.columns.str.strip()
-    lower_cols = {col.lower(): col for col in df.columns}
-
     # -------- VALIDATE COLUMNS (email + office required, name optional) --------
-    required = [email_column.lower(), office_column.lower()]
-    missing_cols = [col for col in required if col not in lower_cols]
-    if missing_cols:
-        messagebox.showerror("Missing Columns",
-                             f"Error: Missing required column(s): {', '.join(missing_cols)}")
+    try:
+        email_col_actual, office_col_actual = resolve_columns(df.columns)
+    except ValueError as e:
+        messagebox.showerror("Missing Columns", f"Error: {e}")
         return
 
-    email_col_actual = lower_cols[email_column.lower()]
-    office_col_actual = lower_cols[office_column.lower()]
-    name_col_exists = name_column.lower() in lower_cols
-    name_col_actual = lower_cols.get(name_column.lower(), None)
-
-    # -------- PROCESS FILTERS (HARD-CODED) --------
-    base, ext = os.path.splitext(file_path)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-    new_file_path = f"{base}_filtered_{timestamp}{ext}"
-
+    # -------- PROCESS FILTERS --------
+    new_file_path = output_path_for(file_path)
     try:
-        with pd.ExcelWriter(new_file_path, engine="openpyxl") as writer:
-            # Original sheet
-            df.to_excel(writer, sheet_name="Original Data", index=False)
-
-            used_sheet_names = {"Original Data"}
-
-            # Track rows matched by ANY filter across ALL sheets
-            global_matched_mask = pd.Series(False, index=df.index)
-
-            # Track duplicate rows (by Excel row number) per filter sheet
-            duplicates_by_sheet = {}
-
-            # Create filtered sheets per definition
-            for raw_sheet_label, pairs in FILTER_DEFINITIONS.items():
-                combined_mask = pd.Series(False, index=df.index)
-
-                if not isinstance(pairs, (list, tuple)):
-                    pairs = []
-
-                for pair in pairs:
-                    email_match = (pair.get("email") or "").strip()
-                    office_match = (pair.get("office") or "").strip()
-
-                    # Skip empty pair
-                    if not email_match and not office_match:
-                        continue
-
-                    pair_mask = pd.Series(False, index=df.index)
-                    if email_match:
-                        pair_mask = pair_mask | df[email_col_actual].astype(str).str.lower().str.contains(email_match.lower(), na=False)
-                    if office_match:
-                        pair_mask = pair_mask | df[office_col_actual].astype(str).str.lower().str.contains(office_match.lower(), na=False)
-
-                    combined_mask = combined_mask | pair_mask
-
-                # Update global union
-                global_matched_mask = global_matched_mask | combined_mask
-
-                filtered_df = df[combined_mask].copy()
-
-                # Determine safe + unique sheet name
-                base_name = sanitize_sheet_name(raw_sheet_label) or "Filtered"
-                sheet_name = base_name
-                suffix = 2
-                while not sheet_name or sheet_name in used_sheet_names:
-                    sheet_name = f"{base_name} ({suffix})"
-                    suffix += 1
-                used_sheet_names.add(sheet_name)
-
-                # Write (even if empty → headers only)
-                filtered_df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-                # ----- Duplicate detection by Name (case-insensitive, normalized) -----
-                # Only for filter sheets; skip if no name-like column or no rows.
-                if not filtered_df.empty:
-                    # Find an actual name column in this sheet (case-insensitive)
-                    f_lower_cols = {c.lower(): c for c in filtered_df.columns}
-                    name_candidate_actual = None
-                    for candidate in NAME_COLUMNS:
-                        actual = f_lower_cols.get(candidate.lower())
-                        if actual:
-                            name_candidate_actual = actual
-                            break
-
-                    if name_candidate_actual:
-                        # Build normalized keys
-                        name_series = filtered_df[name_candidate_actual].astype(str)
-                        key = name_series.apply(normalize_name)
-
-                        # Flag duplicates (ignore blanks)
-                        dup_mask = key.duplicated(keep=False) & (key != "")
-                        if dup_mask.any():
-                            # Convert to Excel row numbers (data starts at row 2)
-                            dup_rows_excel = (dup_mask[dup_mask].index.to_series().astype(int) + 2).tolist()
-                            duplicates_by_sheet[sheet_name] = dup_rows_excel
-
-
-            # -------- REMAINDER SHEET --------
-            if CREATE_REMAINDER_SHEET:
-                remainder_df = df[~global_matched_mask].copy()
-
-                base_name = sanitize_sheet_name(REMAINDER_SHEET_NAME) or "Remaining"
-                sheet_name = base_name
-                suffix = 2
-                while not sheet_name or sheet_name in used_sheet_names:
-                    sheet_name = f"{base_name} ({suffix})"
-                    suffix += 1
-                used_sheet_names.add(sheet_name)
-
-                remainder_df.to_excel(writer, sheet_name=sheet_name, index=False)
-                # Intentionally not doing duplicate highlighting on remainder sheet per request
-
-            # -------- STYLE ALL SHEETS --------
-            wb = writer.book
-            from openpyxl.styles import PatternFill
-            highlight_fill = PatternFill("solid", fgColor="FFFF00")
-
-            for name in used_sheet_names:
-                ws = wb[name]
-                style_worksheet(ws)
-
-                # After styling, apply duplicate highlighting for filter sheets only
-                if name in duplicates_by_sheet:
-                    for r in duplicates_by_sheet[name]:
-                        # Guard: ensure row exists
-                        if r <= ws.max_row:
-                            for c in range(1, ws.max_column + 1):
-                                ws.cell(row=r, column=c).fill = highlight_fill
-
-        print(
-            f"✅ Original, {len(FILTER_DEFINITIONS)} filtered sheet(s)"
-            f"{' + remainder' if CREATE_REMAINDER_SHEET else ''} written to:\n{new_file_path}\n"
-            f"🔍 Duplicate highlighting: " + (", ".join([f"{k}: {len(v)} row(s)" for k, v in duplicates_by_sheet.items()]) if duplicates_by_sheet else "none")
-        )
+        duplicates_by_sheet, changes = write_output(chunk_source, new_file_path, email_col_actual,
+                                                    office_col_actual, compiled, INCREMENTAL)
+        report_path = finish_run(new_file_path)
+        print(summary_message(new_file_path, duplicates_by_sheet, len(compiled.labels), changes))
+        if report_path:
+            print(f"⏱️ Run report: {report_path}")
     except Exception as e:
         messagebox.showerror("Write Error", f"Failed to write Excel file:\n{e}")
 
@@ -0,0 +1,201 @@
+# batch_filter.py
+# Headless batch runner for the FilterExcel scripts.
+# Processes many workbooks (files and/or folders) in parallel across CPU cores
+# with a process pool, without any dialogs. Prints one line per file and exits
+# with status 1 if any file failed.
+# With --output-dir, each output goes into the input's folder relative to the
+# inputs' common folder (so exports\a\x.xlsx and exports\b\x.xlsx don't overwrite each other).
+#
+# Default: FilterExcel_multiBU.py pipeline (its rule file, or hard-coded FILTER_DEFINITIONS).
+# With --rules FILE: FilterExcel_multiBU.py pipeline with that JSON/YAML rule file.
+# With --filter EMAIL:OFFICE (repeatable): FilterExcel_multi.py pipeline with those pairs.
+# With --incremental: re-use unchanged rows of earlier outputs (FilterExcel_multiBU.INCREMENTAL).
+# With --output-engine parquet|csv: one file per sheet instead of a styled workbook.
+# Inputs can be Excel workbooks, CSV or Parquet files.
+#
+# Examples:
+#   python batch_filter.py C:\exports\2025-09
+#   python batch_filter.py a.xlsx b.xlsx --workers 4 --output-dir out
+#   python batch_filter.py exports --recursive --filter mccoy:662 --filter :818
+#   python batch_filter.py exports --results results.json
+#   python batch_filter.py exports --rules client_rules.yaml
+#   python batch_filter.py exports --output-dir out --incremental
+#   python batch_filter.py exports\*.csv --output-engine parquet
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+INPUT_EXTENSIONS = (".xlsx", ".xlsm", ".xls", ".csv", ".parquet")
+
+
+def collect_inputs(paths, recursive=False):
+    """
+    Expand files and folders into a sorted list of input files.
+    Skips our own outputs (*_filtered_*, including per-sheet output folders) and Excel lock files (~$*).
+    """
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                for dirpath, dirnames, filenames in os.walk(path):
+                    dirnames[:] = [d for d in dirnames if "_filtered_" not in d]
+                    found.extend(os.path.join(dirpath, f) for f in filenames)
+            else:
+                found.extend(os.path.join(path, f) for f in os.listdir(path))
+        else:
+            found.append(path)
+
+    inputs = []
+    for path in found:
+        name = os.path.basename(path)
+        if not name.lower().endswith(INPUT_EXTENSIONS):
+            continue
+        if name.startswith("~$") or "_filtered_" in name:
+            continue
+        inputs.append(path)
+    return sorted(set(inputs))
+
+
+def parse_filter(text):
+    """'email:office' -> (email, office); either side may be empty but not both."""
+    email_match, _, office_match = text.partition(":")
+    email_match, office_match = email_match.strip(), office_match.strip()
+    if not email_match and not office_match:
+        raise argparse.ArgumentTypeError(f"empty filter: {text!r}")
+    return email_match, office_match
+
+
+def run_one(file_path, output_dir=None, filters=None, rules_file=None, incremental=None, output_engine=None):
+    """
+    Worker entry point: process one input file and report the outcome.
+    Never raises; errors come back as {"ok": False, "error": ...}.
+    """
+    started = time.perf_counter()
+    try:
+        if output_engine:
+            import excel_writers
+            excel_writers.OUTPUT_ENGINE = output_engine
+        if filters:
+            import FilterExcel_multi
+            result = FilterExcel_multi.process_file(file_path, filters, output_dir)
+        else:
+            import FilterExcel_multiBU
+            result = FilterExcel_multiBU.process_file(file_path, output_dir, rules_file, incremental)
+        result["ok"] = True
+    except Exception as e:
+        result = {"input": file_path, "ok": False, "error": f"{type(e).__name__}: {e}"}
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def output_dirs_for(inputs, output_dir):
+    """
+    {input: folder for its output}: output_dir plus the input's folder relative to
+    the common folder of all inputs (just output_dir when they share one folder).
+    """
+    folders = [os.path.dirname(os.path.abspath(path)) for path in inputs]
+    try:
+        root = os.path.commonpath(folders)
+    except ValueError:  # different drives: keep each input's folder below its drive
+        root = None
+    dirs = {}
+    for path, folder in zip(inputs, folders):
+        relative = os.path.relpath(folder, root) if root else os.path.splitdrive(folder)[1].lstrip("\\/")
+        dirs[path] = os.path.normpath(os.path.join(output_dir, relative))
+    return dirs
+
+
+def run_batch(inputs, workers=None, output_dir=None, filters=None, rules_file=None, incremental=None,
+              output_engine=None):
+    """
+    Process inputs across a process pool; returns results in input order.
+    A worker that dies (BrokenProcessPool) fails its file and any still queued, not the batch.
+    """
+    output_dirs = output_dirs_for(inputs, output_dir) if output_dir else dict.fromkeys(inputs)
+    for folder in set(output_dirs.values()) - {None}:
+        os.makedirs(folder, exist_ok=True)
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_one, path, output_dirs[path], filters, rules_file, incremental,
+                               output_engine): path for path in inputs}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                result = {"input": path, "ok": False, "seconds": None,
+                          "error": "BrokenProcessPool: a worker process died (out of memory?)"}
+            except Exception as e:
+                result = {"input": path, "ok": False, "seconds": None, "error": f"{type(e).__name__}: {e}"}
+            results[path] = result
+            status = "OK  " if result["ok"] else "FAIL"
+            detail = result["output"] if result["ok"] else result["error"]
+            seconds = f" ({result['seconds']}s)" if result["seconds"] is not None else ""
+            print(f"[{status}] {result['input']}{seconds} -> {detail}", flush=True)
+    return [results[path] for path in inputs]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Filter many Excel exports in parallel (no dialogs).")
+    parser.add_argument("paths", nargs="+", help="input workbooks and/or folders")
+    parser.add_argument("--recursive", action="store_true", help="also search subfolders")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: number of CPU cores)")
+    parser.add_argument("--output-dir", default=None, help="write outputs here instead of next to each input")
+    parser.add_argument("--filter", dest="filters", action="append", type=parse_filter, default=None,
+                        metavar="EMAIL:OFFICE",
+                        help="use FilterExcel_multi with this pair (repeatable) instead of FILTER_DEFINITIONS")
+    parser.add_argument("--rules", default=None, metavar="FILE",
+                        help="JSON/YAML filter rule file for the FilterExcel_multiBU pipeline")
+    parser.add_argument("--incremental", action="store_true", default=None,
+                        help="re-use rows unchanged since the previous output (FilterExcel_multiBU pipeline)")
+    parser.add_argument("--output-engine", default=None,
+                        choices=["auto", "xlsxwriter", "write_only", "openpyxl", "parquet", "csv"],
+                        help="output writer (default: excel_writers.OUTPUT_ENGINE); parquet/csv write "
+                             "a folder with one file per sheet")
+    parser.add_argument("--results", default=None, help="also write per-file results to this JSON file")
+    args = parser.parse_args(argv)
+    if args.filters and args.rules:
+        parser.error("use either --filter or --rules, not both")
+    if args.filters and args.incremental:
+        parser.error("--incremental only applies to the FilterExcel_multiBU pipeline, not --filter")
+
+    if args.rules:
+        # Validate and compile once up front; workers then load the cached matcher
+        from filter_rules import load_rules
+        try:
+            load_rules(args.rules)
+        except ValueError as e:
+            print(f"Invalid rule file: {e}")
+            return 1
+
+    inputs = collect_inputs(args.paths, args.recursive)
+    if not inputs:
+        print("No Excel files found.")
+        return 1
+
+    print(f"Processing {len(inputs)} file(s)...")
+    started = time.perf_counter()
+    results = run_batch(inputs, args.workers, args.output_dir, args.filters, args.rules, args.incremental,
+                        args.output_engine)
+    failed = [r for r in results if not r["ok"]]
+    print(f"Done in {time.perf_counter() - started:.1f}s: "
+          f"{len(results) - len(failed)} succeeded, {len(failed)} failed.")
+
+    if args.results:
+        with open(args.results, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # needed when packaged with PyInstaller on Windows
+    sys.exit(main())
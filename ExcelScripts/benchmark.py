@@ -0,0 +1,412 @@
+# benchmark.py
+# Benchmark harness for FilterExcel.py, FilterExcel_multi.py and FilterExcel_multiBU.py.
+# Workbooks are generated deterministically (same arguments + seed = same file),
+# so every performance change can be measured without real customer data.
+# - Columns shaped like our exports: Name, Email, BU Code (multiBU) and
+#   Primary Email, Office (FilterExcel / FilterExcel_multi)
+# - Names include diacritics and spelling variants; --dup-rate controls how many
+#   rows repeat an earlier name (possibly as "JOSÉ NÚÑEZ" / "Jose Nunez" / "jose  nunez.")
+# - Each run happens in a fresh process, so peak memory is per run, and the
+#   per-stage timings come from the scripts' run reports (see run_report.py)
+# - --save-baseline stores the results; later runs compare against them and exit
+#   with status 1 if any output changed or a run got slower than --tolerance
+#
+# Examples:
+#   python benchmark.py generate --rows 100000 --dup-rate 0.1 -o synthetic.xlsx
+#   python benchmark.py run --rows 10000 100000 --save-baseline
+#   python benchmark.py run --rows 10000 100000                  (compare with the baseline)
+#   python benchmark.py run --rows 2000000 --scripts FilterExcel_multiBU --streaming on
+#   python benchmark.py micro --rows 500000          (single steps against the code they replaced)
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import freeze_support, get_context
+
+import numpy as np
+import pandas as pd
+
+# -------- CONFIG --------
+SCRIPTS = ["FilterExcel", "FilterExcel_multi", "FilterExcel_multiBU"]
+DEFAULT_ROWS = [10_000, 100_000]
+DEFAULT_DUP_RATE = 0.1
+DEFAULT_SEED = 42
+DATA_DIR = os.path.join(tempfile.gettempdir(), "filterexcel_bench")
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+TOLERANCE = 0.15  # a run more than 15% slower than its baseline counts as a regression
+
+# Filters used for the scripts that normally ask for them in a dialog
+FILTEREXCEL_MATCH = ("mccoy", "662")
+MULTI_FILTERS = [("mccoy", "662"), ("gil-bar", "105"), ("", "818"), ("nevada", "")]
+
+# -------- CONFIG: GENERATOR --------
+# Domains / BU codes that hit FILTER_DEFINITIONS in FilterExcel_multiBU.py
+MATCH_DOMAINS = ["gil-bar.com", "mccoy.com", "apa-conn.com", "hcnye.org", "airtech.com", "gbs.net",
+                 "sjginns.com", "dmg.com", "dynamicfan.com", "jbarrow.com", "nevada.gov", "apav.com",
+                 "ambient-enterprises.com"]
+MATCH_CODES = ["105", "662", "818", "355", "405", "691", "815", "805", "820", "210", "670"]
+OTHER_DOMAINS = ["contoso.com", "fabrikam.net", "example.org", "northwind.com", "tailspin.io"]
+MATCH_RATE = 0.6    # share of rows with a matching email domain or BU code
+BLANK_RATE = 0.02   # share of rows with a blank BU Code / Name
+
+FIRST_NAMES = ["José", "Zoë", "Björn", "Łukasz", "François", "Jürgen", "Søren", "Ana", "Chloé", "Dmitrij",
+               "Ærin", "Noémie", "Ignacio", "Mía", "Siobhán", "Renée", "Oğuz", "Håkon", "John", "Mary",
+               "Ahmed", "Wei", "Priya", "Kwame", "Olga", "Sean", "Laura", "David", "Fatima", "Tomás"]
+SURNAME_SYLLABLES = ["nú", "ñez", "ber", "gó", "mez", "sch", "mül", "ler", "ow", "ski", "ström", "van",
+                     "der", "ber", "ge", "rös", "sler", "mac", "don", "ald", "o'", "bri", "en", "dí",
+                     "kan", "ça", "lé", "ko", "vá", "ček", "lund", "qvist", "ha", "yes", "li", "ang"]
+
+
+# -------- GENERATOR --------
+def _ascii(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+
+def _strip_marks(text: str) -> str:
+    """Drop accents only (José -> Jose, Søren stays), as people type names without them."""
+    return "".join(ch for ch in unicodedata.normalize("NFD", text) if unicodedata.category(ch) != "Mn")
+
+
+def _name_variants(names: pd.Series, kinds: np.ndarray) -> pd.Series:
+    """Spell names the way duplicates show up in exports; all normalize to the same key."""
+    out = names.copy()
+    out[kinds == 1] = names[kinds == 1].str.upper()
+    out[kinds == 2] = names[kinds == 2].map(_strip_marks)
+    out[kinds == 3] = names[kinds == 3].str.lower().str.replace(" ", "  ", regex=False) + "."
+    return out
+
+
+def generate_frame(rows: int, dup_rate: float = DEFAULT_DUP_RATE, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    """Deterministic synthetic export with `rows` rows; about dup_rate of them repeat an earlier name."""
+    rng = np.random.default_rng(seed)
+
+    # ----- Names: random base names, then duplicates copied from earlier rows -----
+    # "First Middle Last" from ~50M combinations, so accidental repeats stay rare
+    syll = np.array(SURNAME_SYLLABLES, dtype=object)
+    first = np.array(FIRST_NAMES, dtype=object)[rng.integers(0, len(FIRST_NAMES), rows)]
+
+    def surname():
+        parts = syll[rng.integers(0, len(syll), rows)] + syll[rng.integers(0, len(syll), rows)]
+        return pd.Series(parts).str.capitalize().to_numpy()
+
+    names = pd.Series(first + " " + surname() + " " + surname(), dtype=object)
+
+    is_dup = rng.random(rows) < dup_rate
+    is_dup[0] = False
+    dup_pos = np.flatnonzero(is_dup)
+    # Each duplicate copies a random earlier row (which may itself be a duplicate)
+    source = (rng.random(len(dup_pos)) * dup_pos).astype(np.int64)
+    for pos, src in zip(dup_pos, source):  # sequential so chains resolve to the original
+        names.iat[pos] = names.iat[src]
+    names[dup_pos] = _name_variants(names[dup_pos], rng.integers(0, 4, len(dup_pos))).to_numpy()
+
+    # ----- Email / BU Code -----
+    local = names.map(_ascii).str.lower().str.replace(r"[^a-z]+", ".", regex=True).str.strip(".")
+    matching = rng.random(rows) < MATCH_RATE
+    domains = np.where(matching,
+                       np.array(MATCH_DOMAINS, dtype=object)[rng.integers(0, len(MATCH_DOMAINS), rows)],
+                       np.array(OTHER_DOMAINS, dtype=object)[rng.integers(0, len(OTHER_DOMAINS), rows)])
+    emails = local + "@" + domains
+
+    other_codes = pd.Series(rng.integers(100, 1000, rows)).astype(str).to_numpy(dtype=object)
+    bu_codes = np.where(rng.random(rows) < MATCH_RATE,
+                        np.array(MATCH_CODES, dtype=object)[rng.integers(0, len(MATCH_CODES), rows)],
+                        other_codes)
+    bu_codes[rng.random(rows) < BLANK_RATE] = None
+    names[rng.random(rows) < BLANK_RATE] = None
+
+    return pd.DataFrame({
+        "ID": np.arange(1, rows + 1),
+        "Name": names.to_numpy(),
+        "Email": emails.to_numpy(),
+        "BU Code": bu_codes,
+        "Primary Email": emails.to_numpy(),
+        "Office": bu_codes,
+        "Amount": np.round(rng.gamma(2.0, 150.0, rows), 2),
+    })
+
+
+def generate_workbook(path: str, rows: int, dup_rate: float = DEFAULT_DUP_RATE, seed: int = DEFAULT_SEED):
+    """Write generate_frame(...) to path with the constant-memory output writer."""
+    from excel_writers import make_writer
+
+    df = generate_frame(rows, dup_rate, seed)
+    writer = make_writer(path)
+    writer.add_sheet("Sheet1", list(df.columns))
+    for start in range(0, len(df), 100_000):
+        writer.append("Sheet1", df.iloc[start:start + 100_000])
+    writer.save()
+    return path
+
+
+def synthetic_workbook(rows: int, dup_rate: float, seed: int, data_dir: str = DATA_DIR) -> str:
+    """Path of the generated workbook for these parameters, generating it on first use."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"synthetic_{rows}_{dup_rate:g}_{seed}.xlsx")
+    if not os.path.exists(path):
+        print(f"Generating {path} ...", flush=True)
+        tmp = f"{path}.{os.getpid()}.tmp.xlsx"
+        generate_workbook(tmp, rows, dup_rate, seed)
+        os.replace(tmp, path)
+    return path
+
+
+# -------- RUNNER --------
+def run_case(script, input_path, streaming="auto", cache="off"):
+    """
+    Worker entry point: run one script headlessly on input_path and return its
+    measurements. cache: "off" (parse every time), "cold" (empty cache) or "warm"
+    (a first untimed run fills the cache).
+    """
+    import importlib
+    import input_cache
+
+    module = importlib.import_module(script)
+    module.STREAMING_MODE = {"on": True, "off": False}.get(streaming, "auto")
+    work_dir = tempfile.mkdtemp(prefix="filterexcel_bench_")
+    input_cache.CACHE_ENABLED = cache != "off"
+    input_cache.CACHE_DIR = os.path.join(work_dir, "cache")
+
+    def run():
+        if script == "FilterExcel":
+            return module.process_file(input_path, *FILTEREXCEL_MATCH, output_dir=work_dir)
+        if script == "FilterExcel_multi":
+            return module.process_file(input_path, MULTI_FILTERS, work_dir)
+        return module.process_file(input_path, work_dir)
+
+    try:
+        if cache == "warm":
+            run()
+        result = run()
+        with open(result["report"], encoding="utf-8") as f:
+            report = json.load(f)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "wall_s": report["wall_s"],
+        "cpu_s": report["cpu_s"],
+        "peak_rss_mb": report["peak_rss_mb"],
+        "stages": {name: entry["wall_s"] for name, entry in report["stages"].items()},
+        "rows_by_sheet": report["info"].get("rows_by_sheet"),
+        "duplicates_by_sheet": report["info"].get("duplicates_by_sheet"),
+    }
+
+
+def case_id(script, rows, dup_rate, seed, streaming, cache):
+    return f"{script} rows={rows} dup={dup_rate:g} seed={seed} streaming={streaming} cache={cache}"
+
+
+def run_benchmarks(scripts, rows_list, dup_rate, seed, streaming, cache, repeat=1, data_dir=DATA_DIR):
+    """Run every script on every size; returns {case id: best-of-repeat measurements}."""
+    results = {}
+    for rows in rows_list:
+        input_path = synthetic_workbook(rows, dup_rate, seed, data_dir)
+        for script in scripts:
+            cid = case_id(script, rows, dup_rate, seed, streaming, cache)
+            best = None
+            for _ in range(repeat):
+                # Fresh process per run so peak memory is not inherited from earlier runs
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                    measured = pool.submit(run_case, script, input_path, streaming, cache).result()
+                if best is None or measured["wall_s"] < best["wall_s"]:
+                    best = measured
+            results[cid] = best
+            print(f"{cid}: {best['wall_s']:.2f}s, peak {best['peak_rss_mb']} MB", flush=True)
+    return results
+
+
+# -------- MICRO-BENCHMARKS --------
+# One hot step at a time, in-process, against the implementation it replaced.
+# Each case returns (old, new) callables; both must give the same result.
+def _micro_filter_match(df):
+    """FILTER_DEFINITIONS matching in FilterExcel_multiBU: per-pair str.contains vs filter_matcher."""
+    from FilterExcel_multiBU import FILTER_DEFINITIONS
+    from filter_matcher import compile_filters, membership_matrix
+
+    def old():
+        email = df["Email"].astype(str).str.lower()
+        office = df["BU Code"].astype(str).str.lower()
+        columns = []
+        for pairs in FILTER_DEFINITIONS.values():
+            mask = np.zeros(len(df), dtype=bool)
+            for pair in pairs:
+                if pair.get("email"):
+                    mask |= email.str.contains(str(pair["email"]).lower(), na=False).to_numpy()
+                if pair.get("office"):
+                    mask |= office.str.contains(str(pair["office"]).lower(), na=False).to_numpy()
+            columns.append(mask)
+        return np.column_stack(columns)
+
+    def new():
+        return membership_matrix(df, compile_filters(FILTER_DEFINITIONS), "Email", "BU Code")
+
+    return old, new
+
+
+def _micro_compact_match(df):
+    """Matching the in-memory path's chunks as read vs compact_frame first (categorical BU Code)."""
+    from compact_dtypes import compact_frame
+    from excel_stream import iter_frame_chunks
+    from FilterExcel_multiBU import FILTER_DEFINITIONS
+    from filter_matcher import compile_filters, membership_matrix
+
+    compiled = compile_filters(FILTER_DEFINITIONS)
+
+    def match(frame):
+        return np.vstack([membership_matrix(chunk, compiled, "Email", "BU Code")
+                          for chunk in iter_frame_chunks(frame)])
+
+    return (lambda: match(df)), (lambda: match(compact_frame(df)))
+
+
+def _micro_normalize_names(df):
+    """Duplicate keys for the Name column: normalize_name per row vs normalize_names (empty run cache)."""
+    import FilterExcel_multiBU
+
+    names = df["Name"].astype(str)
+
+    def new():
+        FilterExcel_multiBU._normalized_name_cache.clear()
+        return FilterExcel_multiBU.normalize_names(names).to_numpy()
+
+    return (lambda: names.apply(FilterExcel_multiBU.normalize_name).to_numpy()), new
+
+
+MICRO_CASES = {
+    "filter_match": _micro_filter_match,
+    "compact_match": _micro_compact_match,
+    "normalize_names": _micro_normalize_names,
+}
+
+
+def _best_time(func, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_micro(cases, rows, dup_rate, seed, repeat=3):
+    """Time each case's old and new step on generate_frame(rows); returns a list of problems."""
+    df = generate_frame(rows, dup_rate, seed)
+    problems = []
+    for name in cases:
+        old, new = MICRO_CASES[name](df)
+        old_s, old_result = _best_time(old, repeat)
+        new_s, new_result = _best_time(new, repeat)
+        print(f"{name} rows={rows}: old {old_s:.3f}s, new {new_s:.3f}s ({old_s / new_s:.1f}x)", flush=True)
+        if not np.array_equal(np.asarray(old_result), np.asarray(new_result)):
+            problems.append(f"{name}: new result differs from old")
+    return problems
+
+
+# -------- BASELINE --------
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Print each case against its baseline entry.
+    Returns the list of problems: changed outputs and runs slower than tolerance.
+    """
+    problems = []
+    for cid, current in results.items():
+        base = baseline.get(cid)
+        if base is None:
+            print(f"\n{cid}\n  no baseline entry")
+            continue
+        change = current["wall_s"] / base["wall_s"] - 1 if base["wall_s"] else 0.0
+        print(f"\n{cid}\n  wall {current['wall_s']:.2f}s vs {base['wall_s']:.2f}s ({change:+.0%}), "
+              f"peak {current['peak_rss_mb']} MB vs {base['peak_rss_mb']} MB")
+        for name, seconds in sorted(current["stages"].items(), key=lambda item: -item[1])[:8]:
+            before = base["stages"].get(name)
+            print(f"    {name:<40} {seconds:8.3f}s" + (f"  (was {before:.3f}s)" if before is not None else ""))
+
+        for key in ("rows_by_sheet", "duplicates_by_sheet"):
+            if current.get(key) != base.get(key):
+                problems.append(f"{cid}: {key} differs from baseline")
+        if change > tolerance:
+            problems.append(f"{cid}: {change:.0%} slower than baseline")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the FilterExcel scripts on synthetic workbooks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="write one synthetic workbook")
+    gen.add_argument("--rows", type=int, default=DEFAULT_ROWS[0])
+    gen.add_argument("--dup-rate", type=float, default=DEFAULT_DUP_RATE)
+    gen.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    gen.add_argument("-o", "--output", required=True)
+
+    run = commands.add_parser("run", help="time the scripts and compare with the baseline")
+    run.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    run.add_argument("--dup-rate", type=float, default=DEFAULT_DUP_RATE)
+    run.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    run.add_argument("--scripts", nargs="+", choices=SCRIPTS, default=SCRIPTS)
+    run.add_argument("--streaming", choices=["auto", "on", "off"], default="auto")
+    run.add_argument("--cache", choices=["off", "cold", "warm"], default="off",
+                     help="parsed-input cache: off (default), empty, or pre-filled by an untimed run")
+    run.add_argument("--repeat", type=int, default=1, help="runs per case; the fastest is kept")
+    run.add_argument("--data-dir", default=DATA_DIR, help="where generated workbooks are kept")
+    run.add_argument("--baseline", default=BASELINE_FILE)
+    run.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    run.add_argument("--tolerance", type=float, default=TOLERANCE)
+    run.add_argument("--results", default=None, help="also write the results to this JSON file")
+    micro = commands.add_parser("micro", help="time single steps in-process against the code they replaced")
+    micro.add_argument("--rows", type=int, default=500_000)
+    micro.add_argument("--dup-rate", type=float, default=DEFAULT_DUP_RATE)
+    micro.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    micro.add_argument("--cases", nargs="+", choices=sorted(MICRO_CASES), default=sorted(MICRO_CASES))
+    micro.add_argument("--repeat", type=int, default=3, help="runs per step; the fastest is kept")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        generate_workbook(args.output, args.rows, args.dup_rate, args.seed)
+        print(f"Wrote {args.rows} rows to {args.output}")
+        return 0
+
+    if args.command == "micro":
+        problems = run_micro(args.cases, args.rows, args.dup_rate, args.seed, args.repeat)
+        if problems:
+            print("\n" + "\n".join(f"❌ {p}" for p in problems))
+            return 1
+        return 0
+
+    results = run_benchmarks(args.scripts, args.rows, args.dup_rate, args.seed, args.streaming,
+                             args.cache, args.repeat, args.data_dir)
+    if args.results:
+        with open(args.results, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    problems = compare(results, baseline, args.tolerance)
+    if problems:
+        print("\n" + "\n".join(f"❌ {p}" for p in problems))
+        return 1
+    print("\n✅ No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    freeze_support()
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# build_exe.py
+# Build the FilterExcel executables with PyInstaller (pip install pyinstaller).
+# Every executable starts through fast_start.py, which shows the file dialog
+# before pandas & co. are loaded.
+#
+#   python build_exe.py                          # all scripts, one-dir (fastest start)
+#   python build_exe.py FilterExcel_multiBU      # just one
+#   python build_exe.py --onefile                # single .exe per script
+#   python build_exe.py --print                  # show the PyInstaller commands only
+# Output goes to dist\ (build files to build\) next to this script.
+#
+# One-dir (default): dist\<script>\<script>.exe plus its _internal folder. Nothing
+# is unpacked at launch, so it starts in a second or two; zip the folder to share it.
+# One-file: a single .exe that unpacks itself to a temp folder on EVERY launch
+# (the 10-20 s wait users see). Only use it when a single file is a must.
+
+import argparse
+import os
+import shutil
+import sys
+
+from fast_start import SCRIPTS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Big optional packages pandas can pull in that the scripts never use
+EXCLUDE_MODULES = ["matplotlib", "IPython", "scipy", "sqlalchemy", "pytest", "notebook", "jinja2"]
+
+# Loaded at runtime by name, so PyInstaller cannot see them from fast_start.py
+HIDDEN_IMPORTS = ["xlsxwriter", "pyarrow", "yaml", "ahocorasick"]
+
+# Copied next to the one-dir executables (rule files are looked up next to the .exe)
+EXTRA_FILES = ["filter_rules.example.json"]
+
+DIST_DIR = os.path.join(HERE, "dist")
+BUILD_DIR = os.path.join(HERE, "build")
+
+
+def pyinstaller_args(script: str, onefile: bool = False) -> list:
+    args = [
+        os.path.join(HERE, "fast_start.py"),
+        "--name", script,  # fast_start.pick_script() reads the exe name
+        "--noconsole",
+        "--noconfirm",
+        "--onefile" if onefile else "--onedir",
+        "--paths", HERE,
+        "--distpath", DIST_DIR,
+        "--workpath", BUILD_DIR,
+        "--specpath", BUILD_DIR,
+        "--hidden-import", script,
+    ]
+    for module in HIDDEN_IMPORTS:
+        args += ["--hidden-import", module]
+    for module in EXCLUDE_MODULES:
+        args += ["--exclude-module", module]
+    return args
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the FilterExcel executables with PyInstaller.")
+    parser.add_argument("scripts", nargs="*", metavar="SCRIPT",
+                        help=f"any of {', '.join(SCRIPTS)} (default: all)")
+    parser.add_argument("--onefile", action="store_true",
+                        help="single .exe (unpacks itself on every launch: slow start)")
+    parser.add_argument("--print", dest="print_only", action="store_true",
+                        help="print the PyInstaller commands instead of running them")
+    args = parser.parse_args(argv)
+    unknown = [s for s in args.scripts if s not in SCRIPTS]
+    if unknown:
+        parser.error(f"unknown script(s): {', '.join(unknown)}")
+
+    for script in args.scripts or SCRIPTS:
+        command = pyinstaller_args(script, args.onefile)
+        if args.print_only:
+            print("pyinstaller " + " ".join(f'"{a}"' if " " in a else a for a in command))
+            continue
+        import PyInstaller.__main__
+        PyInstaller.__main__.run(command)
+        if not args.onefile:
+            for name in EXTRA_FILES:
+                shutil.copy2(os.path.join(HERE, name), os.path.join(DIST_DIR, script, name))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
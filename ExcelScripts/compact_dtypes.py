@@ -0,0 +1,111 @@
+# compact_dtypes.py
+# Load-time dtype layer for the FilterExcel scripts.
+# Before pandas 3, pd.read_excel hands every text column back as Python objects
+# (one str object per cell), and low-cardinality codes like BU Code / Office
+# repeat the same few values on every row in any pandas version. compact_frame() converts the loaded frame once:
+# - columns with few distinct values (CATEGORY_MAX_RATIO) become categoricals:
+#   one small integer code per row plus each distinct value stored once
+# - remaining text columns (emails, names) become Arrow-backed strings
+# Only text columns are touched and cell values are unchanged, so every output
+# engine writes exactly the same data (and incremental.row_hashes stay the same).
+# The matching code works per distinct value (lowercase_codes). On a categorical
+# column it uses the category codes as they are, and lowercases the categories
+# once per frame, not once per chunk.
+# Streamed chunks are left as read: they are small, and compacting every chunk
+# separately would give each one its own categories.
+
+import numpy as np
+import pandas as pd
+
+# -------- CONFIG --------
+COMPACT_DTYPES = True
+CATEGORY_MAX_RATIO = 0.05   # distinct values / rows at or below which a column becomes categorical
+CATEGORY_MIN_ROWS = 1_000   # smaller frames are left as they are
+
+_lowered_categories = {}  # id(categories) -> (categories, lowered); chunks of one frame share them
+
+
+def _arrow_string_dtype():
+    """Arrow-backed string dtype, or None without pyarrow."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    return pd.StringDtype("pyarrow")
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    df with compact dtypes (see the module header); returns df itself when
+    COMPACT_DTYPES is off or the frame is too small to be worth it.
+    Only text columns are converted; numbers and dates are left as read.
+    """
+    if not COMPACT_DTYPES or len(df) < CATEGORY_MIN_ROWS:
+        return df
+
+    string_dtype = _arrow_string_dtype()
+    converted = {}
+    for i, dtype in enumerate(df.dtypes):
+        if isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if dtype != object and not isinstance(dtype, pd.StringDtype):
+            continue  # numbers, dates, booleans
+        column = df.iloc[:, i]
+        if dtype == object and pd.api.types.infer_dtype(column, skipna=True) != "string":
+            continue  # mixed types (e.g. numbers and text): leave them as read
+
+        limit = int(CATEGORY_MAX_RATIO * len(column))
+        # The leading rows can't have more distinct values than the whole column, so
+        # mostly unique columns (names, emails) are ruled out from a fifth of the rows
+        if column.iloc[:4 * limit + 1].nunique(dropna=True) <= limit and column.nunique(dropna=True) <= limit:
+            converted[i] = column.astype("category")
+        elif dtype == object and string_dtype is not None:
+            converted[i] = column.astype(string_dtype)
+
+    if not converted:
+        return df
+    df = df.copy(deep=False)
+    for i, column in converted.items():
+        df.isetitem(i, column)
+    return df
+
+
+def lowercase_codes(series: pd.Series):
+    """
+    The lowercase view of a column, per distinct value.
+    Returns (codes, lowered): codes[row] indexes lowered (a str Series), or is
+    -1 for missing values. Only distinct values are converted, so this costs one
+    hash pass over the rows plus work per distinct value. A categorical column
+    needs neither: its own codes are used, and its categories are lowercased on
+    the first call only.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.dtype.categories
+        cached = _lowered_categories.get(id(categories))
+        if cached is None or cached[0] is not categories:
+            if len(_lowered_categories) >= 16:
+                _lowered_categories.clear()
+            cached = _lowered_categories[id(categories)] = (categories, _lower(categories))
+        return series.cat.codes.to_numpy(), cached[1]
+    codes, uniques = pd.factorize(series)
+    return codes, _lower(uniques)
+
+
+def _lower(uniques) -> pd.Series:
+    if uniques.dtype != object and pd.api.types.is_string_dtype(uniques.dtype):
+        lowered = pd.Series(uniques)  # already text: stays in the str / Arrow dtype
+    else:
+        # Numbers, dates, mixed cells: str() of each value, as astype(str) on the rows
+        lowered = pd.Series(np.asarray(uniques, dtype=object), dtype=object)
+    return lowered.astype(str).str.lower()
+
+
+def contains_lower(series: pd.Series, pattern: str) -> np.ndarray:
+    """
+    Boolean mask: series.astype(str).str.lower().str.contains(pattern, regex=False, na=False),
+    evaluated once per distinct value. The pattern is a literal substring, as in filter_matcher.
+    """
+    codes, lowered = lowercase_codes(series)
+    hits = lowered.str.contains(pattern, regex=False, na=False).to_numpy(dtype=bool)
+    # Missing values (code -1) pick the extra False at the end
+    return np.append(hits, False)[codes]
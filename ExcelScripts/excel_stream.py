@@ -0,0 +1,155 @@
+# excel_stream.py
+# Streaming (bounded-memory) input and output for the FilterExcel scripts.
+# Input rows are read with openpyxl's read-only mode and handed out as fixed-size
+# DataFrame chunks, so the full sheet is never held in memory.
+# Chunks are parsed like pd.read_excel parses the whole sheet (numeric text to
+# numbers, "N/A" to NaN, ...), with the column types of the whole sheet.
+# Each chunk is then appended to its output sheets through a constant-memory
+# writer (see excel_writers.py), so peak memory stays flat with file size.
+
+import os
+
+import pandas as pd
+
+# -------- CONFIG --------
+STREAM_CHUNK_ROWS = 50_000      # rows per chunk handed to the filter step
+STREAM_THRESHOLD_MB = 25        # "auto" mode streams input files at least this big
+STREAM_WHOLE_SHEET_TYPES = True # read .xlsx twice so every chunk gets the column types of the whole sheet
+                                # (False: one read, types inferred per chunk as with pd.read_excel on that chunk)
+
+
+def should_stream(file_path: str, mode) -> bool:
+    """
+    Decide whether to use the streaming path for this file.
+    - mode True / False forces it on / off
+    - mode "auto" streams .xlsx/.xlsm/.csv/.parquet files of at least STREAM_THRESHOLD_MB
+    The streaming reader needs openpyxl, so legacy .xls files are never streamed.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext not in (".xlsx", ".xlsm", ".csv", ".parquet"):
+        return False
+    if mode == "auto":
+        return os.path.getsize(file_path) >= STREAM_THRESHOLD_MB * 1024 * 1024
+    return bool(mode)
+
+
+def _header_names(raw_header) -> list:
+    """
+    Build column names the way pd.read_excel does:
+    - Blank headers become "Unnamed: <position>"
+    - Repeated headers get ".1", ".2", ... suffixes
+    - Outer whitespace is stripped (the scripts always strip columns)
+    """
+    names = []
+    seen = {}
+    for idx, value in enumerate(raw_header):
+        name = f"Unnamed: {idx}" if value is None else str(value).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _row_chunks(file_path: str, chunk_size: int):
+    """
+    (columns, rows) of the first worksheet, up to chunk_size rows at a time.
+    At least one (possibly empty) list of rows is yielded.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        raw_header = next(rows, None) or ()
+        columns = _header_names(raw_header)
+        width = len(columns)
+
+        buffer = []
+        yielded = False
+        for row in rows:
+            # read-only rows can be ragged; pad/trim to the header width
+            if len(row) != width:
+                row = (tuple(row) + (None,) * width)[:width]
+            buffer.append(["" if value is None else value for value in row])  # blank cells, as pd.read_excel
+            if len(buffer) >= chunk_size:
+                yield columns, buffer
+                buffer = []
+                yielded = True
+
+        if buffer or not yielded:
+            yield columns, buffer
+    finally:
+        wb.close()
+
+
+def _parse_rows(rows: list, columns: list, dtypes=None) -> pd.DataFrame:
+    """Rows as a DataFrame, parsed by the same pandas TextParser pd.read_excel uses."""
+    from pandas.io.parsers import TextParser
+
+    if not rows:
+        return pd.DataFrame(rows, columns=columns)
+    return TextParser(rows, names=columns, dtype=dtypes).read()
+
+
+def _sheet_dtypes(file_path: str, chunk_size: int) -> dict:
+    """
+    {column: dtype} pd.read_excel infers for the whole sheet, for the columns a
+    chunk parsed on its own could get differently:
+    - Numbers in some chunks only, or blanks in some chunks only -> float64
+    - Text and numbers mixed -> str if every cell is text, else object
+    - Chunks that are entirely blank take the type of the rest of the column
+    """
+    kinds, blank, text = {}, set(), None
+    for columns, rows in _row_chunks(file_path, chunk_size):
+        if text is None:
+            text = set(columns)
+        chunk = _parse_rows(rows, columns)
+        for idx, name in enumerate(columns):
+            column = chunk[name]
+            if column.isna().all():
+                blank.add(name)
+                continue
+            kinds.setdefault(name, set()).add(column.dtype)
+            if name in text and not all(isinstance(row[idx], str) for row in rows):
+                text.discard(name)
+
+    dtypes = {}
+    for name, found in kinds.items():
+        if len(found) == 1 and name not in blank:
+            continue  # one type throughout: every chunk infers it the same way
+        if all(pd.api.types.is_numeric_dtype(k) for k in found):
+            dtypes[name] = "float64"  # ints / bools with blanks anywhere in the sheet are float
+        elif len(found) == 1:
+            dtypes[name] = found.pop()
+        else:
+            dtypes[name] = str if name in text else object
+    return dtypes
+
+
+def iter_excel_chunks(file_path: str, chunk_size: int = STREAM_CHUNK_ROWS):
+    """
+    Yield the first worksheet of an .xlsx file as DataFrames of up to chunk_size rows.
+    - The first row is the header; column names are stripped
+    - Values and column types are what pd.read_excel gives for the whole sheet
+      (with STREAM_WHOLE_SHEET_TYPES; otherwise for each chunk on its own)
+    - At least one (possibly empty) chunk is always yielded, so callers can
+      validate the columns before any data arrives
+    - The workbook is opened read-only and closed when iteration ends
+    """
+    dtypes = _sheet_dtypes(file_path, chunk_size) if STREAM_WHOLE_SHEET_TYPES else None
+    for columns, rows in _row_chunks(file_path, chunk_size):
+        yield _parse_rows(rows, columns, dtypes)
+
+
+def iter_frame_chunks(df: pd.DataFrame, chunk_size: int = STREAM_CHUNK_ROWS):
+    """
+    Yield a frame that was read whole as slices of up to chunk_size rows, so the
+    writers buffer one chunk at a time instead of the whole frame.
+    Like iter_excel_chunks, at least one (possibly empty) chunk is yielded.
+    """
+    for start in range(0, max(len(df), 1), chunk_size):
+        yield df.iloc[start:start + chunk_size]
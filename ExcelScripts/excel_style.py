@@ -0,0 +1,92 @@
+# excel_style.py
+# Shared worksheet styling for the FilterExcel scripts.
+# Dark blue header, all columns 28 wide, zebra-striped data rows and yellow
+# duplicate rows.
+# Striping and duplicate highlighting are conditional-formatting rules over
+# whole ranges rather than per-cell fills. Styling therefore costs the same
+# whether a sheet has 10 rows or 1M rows; only the header row is styled cell by cell.
+
+from openpyxl.formatting.rule import Rule
+from openpyxl.styles import Font, PatternFill
+from openpyxl.styles.differential import DifferentialStyle
+from openpyxl.utils import get_column_letter
+
+# -------- CONFIG: COLORS --------
+HEADER_FONT_COLOR = "FFFFFF"   # white text
+HEADER_FILL_COLOR = "156082"   # dark blue background
+STRIPE_EVEN_COLOR = "C0E6F5"   # even rows
+STRIPE_ODD_COLOR = "FFFFFF"    # odd rows
+DUPLICATE_COLOR = "FFFF00"     # duplicate rows
+COLUMN_WIDTH = 28
+
+
+def header_styles():
+    """(font, fill) for header cells."""
+    return Font(bold=True, color=HEADER_FONT_COLOR), PatternFill("solid", fgColor=HEADER_FILL_COLOR)
+
+
+def _solid_rule(color: str, formula: str, stop: bool = False) -> Rule:
+    fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+    return Rule(type="expression", formula=[formula], stopIfTrue=stop,
+                dxf=DifferentialStyle(fill=fill))
+
+
+def row_runs(rows):
+    """Collapse Excel row numbers into (first, last) runs of consecutive rows."""
+    runs = []
+    for r in sorted(set(rows)):
+        if runs and r == runs[-1][1] + 1:
+            runs[-1][1] = r
+        else:
+            runs.append([r, r])
+    return runs
+
+
+def set_column_layout(ws, n_cols: int, hidden_columns=()):
+    """Set all column widths to COLUMN_WIDTH and hide the given column letters."""
+    for col_idx in range(1, n_cols + 1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = COLUMN_WIDTH
+    for col in hidden_columns:
+        ws.column_dimensions[col].hidden = True
+
+
+def add_row_formatting(ws, n_rows: int, n_cols: int, duplicate_rows=()):
+    """
+    Add zebra striping and duplicate highlighting as conditional formatting.
+    - n_rows counts the header, so data rows are 2..n_rows
+    - duplicate_rows: Excel row numbers to highlight; consecutive rows share one range
+    - The duplicate rule is added first (highest priority) and stops evaluation,
+      so duplicate rows stay yellow instead of taking their stripe color
+    """
+    if n_rows < 2 or n_cols < 1:
+        return
+    last_col = get_column_letter(n_cols)
+
+    if duplicate_rows:
+        ranges = " ".join(f"A{first}:{last_col}{last}" for first, last in row_runs(duplicate_rows))
+        ws.conditional_formatting.add(ranges, _solid_rule(DUPLICATE_COLOR, "TRUE", stop=True))
+
+    data_range = f"A2:{last_col}{n_rows}"
+    ws.conditional_formatting.add(data_range, _solid_rule(STRIPE_EVEN_COLOR, "MOD(ROW(),2)=0"))
+    ws.conditional_formatting.add(data_range, _solid_rule(STRIPE_ODD_COLOR, "MOD(ROW(),2)=1"))
+
+
+def style_worksheet(ws, duplicate_rows=(), hidden_columns=()):
+    """
+    Style a regular (in-memory) openpyxl worksheet written by pandas.
+    - Header row: white bold text on dark blue
+    - All columns 28 wide, optional hidden columns (e.g. ["A", "B", "C"])
+    - Zebra striping and duplicate highlighting via conditional formatting
+    """
+    header_font, header_fill = header_styles()
+    n_rows, n_cols = ws.max_row, ws.max_column
+
+    set_column_layout(ws, n_cols, hidden_columns)
+
+    # Header formatting
+    if n_rows >= 1:
+        for cell in ws[1]:
+            cell.font = header_font
+            cell.fill = header_fill
+
+    add_row_formatting(ws, n_rows, n_cols, duplicate_rows)
@@ -0,0 +1,603 @@
+# excel_writers.py
+# Pluggable output writers for the FilterExcel scripts.
+# Every writer has the same small interface:
+#   add_sheet(name, columns, hidden_columns=())  -> create sheet + styled header
+#   append(name, df, highlight=None)             -> add a chunk of rows
+#   append_rows(name, rows, positions=None,      -> add the rows at positions of a
+#               highlight=None)                     row_buffer() shared by several sheets
+#   save()                                       -> apply row formatting and write the file
+# The xlsxwriter engine can also re-use the leading rows of a sheet from a
+# previous output (reuse_rows) instead of serializing them again; see incremental.py.
+# Engines:
+#   "openpyxl"    - regular in-memory openpyxl workbook (original behaviour)
+#   "write_only"  - openpyxl write-only workbook, rows flushed as they are appended
+#   "xlsxwriter"  - xlsxwriter with constant_memory=True, rows flushed as they are appended
+#   "auto"        - xlsxwriter if installed, otherwise write_only
+#   "parquet"     - no workbook: a folder with one <sheet>.parquet per sheet
+#   "csv"         - no workbook: a folder with one <sheet>.csv per sheet
+# The parquet/csv engines are for outputs only read by other systems: they skip
+# styling and xlsx serialization entirely and take each chunk as a DataFrame
+# (buffer()) rather than as row lists. Duplicate rows are marked in an extra
+# DUPLICATE_FLAG_COLUMN instead of being highlighted.
+# All engines give the same look: dark blue header, 28-wide columns, zebra
+# striping and yellow duplicate rows (see excel_style.py). Sheet names are
+# expected to be sanitized already (sanitize_sheet_name in the scripts).
+
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+# -------- CONFIG --------
+OUTPUT_ENGINE = os.environ.get("FILTEREXCEL_OUTPUT_ENGINE") or "auto"
+DUPLICATE_FLAG_COLUMN = "Duplicate"  # parquet/csv engines only
+CSV_OUTPUT_ENCODING = "utf-8"
+
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm", ".xls")
+FOLDER_ENGINES = ("parquet", "csv")
+
+
+def make_writer(path: str, engine: str = None):
+    """Create the output writer for engine (defaults to OUTPUT_ENGINE)."""
+    engine = engine or OUTPUT_ENGINE
+    if engine == "auto":
+        try:
+            import xlsxwriter  # noqa: F401
+            engine = "xlsxwriter"
+        except ImportError:
+            engine = "write_only"
+
+    writers = {
+        "openpyxl": OpenpyxlWorkbookWriter,
+        "write_only": WriteOnlyWorkbookWriter,
+        "xlsxwriter": XlsxWriterWorkbookWriter,
+        "parquet": ParquetFolderWriter,
+        "csv": CsvFolderWriter,
+    }
+    if engine not in writers:
+        raise ValueError(f"Unknown output engine: {engine!r} (expected one of {', '.join(writers)}, auto)")
+    return writers[engine](path)
+
+
+def output_extension(input_ext: str, engine: str = None) -> str:
+    """
+    Extension for an output path: "" (a folder) for the parquet/csv engines,
+    otherwise the input's own Excel extension, or .xlsx for CSV/Parquet inputs.
+    """
+    engine = engine or OUTPUT_ENGINE
+    if engine in FOLDER_ENGINES:
+        return ""
+    return input_ext if input_ext.lower() in EXCEL_EXTENSIONS else ".xlsx"
+
+
+def row_buffer(df: pd.DataFrame) -> list:
+    """
+    Rows of df as lists of plain values, with missing values as None (written as empty cells).
+    Built once per chunk and shared by every sheet the chunk is routed to: sheets
+    take their rows by position, so no per-sheet copy of the chunk is made.
+    """
+    values = df.to_numpy(dtype=object, copy=True)
+    values[pd.isna(values)] = None
+    return values.tolist()
+
+
+class _WorkbookWriter:
+    """
+    Shared bookkeeping for all engines: rows written per sheet, column counts and
+    duplicate row numbers (applied as conditional formatting on save).
+    Subclasses implement _create_sheet, _write_rows and save.
+    """
+
+    supports_reuse = False
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows_written = {}
+        self.n_cols = {}
+        self.duplicate_rows = {}
+        self.reused_rows = {}
+        self.reuse_source = None
+        self._to_skip = {}
+
+    def add_sheet(self, name: str, columns, hidden_columns=()):
+        """Create a sheet with a styled header row; hidden_columns are letters like "A"."""
+        columns = [str(c) for c in columns]
+        self._create_sheet(name, columns, hidden_columns)
+        self.rows_written[name] = 1
+        self.n_cols[name] = len(columns)
+        self.duplicate_rows[name] = []
+
+    def append(self, name: str, df: pd.DataFrame, highlight=None):
+        """
+        Append a chunk to a sheet.
+        highlight: optional boolean sequence (one per row) marking duplicate rows.
+        """
+        if df.empty:
+            return
+        self.append_rows(name, row_buffer(df), highlight=highlight)
+
+    def buffer(self, df: pd.DataFrame):
+        """The chunk in the form append_rows() takes: a row_buffer() for workbook engines."""
+        return row_buffer(df)
+
+    def append_rows(self, name: str, rows: list, positions=None, highlight=None):
+        """
+        Append rows of a row_buffer() to a sheet.
+        positions: ascending row positions to take from rows; None takes them all.
+        highlight: optional boolean sequence (one per row taken) marking duplicate rows.
+        """
+        if positions is not None:
+            positions = np.asarray(positions).tolist()
+            n_rows = len(positions)
+        else:
+            n_rows = len(rows)
+        if n_rows == 0:
+            return
+        first_row = self.rows_written[name] + 1
+
+        # Rows re-used from the previous output are only counted, not written
+        skip = min(self._to_skip.get(name, 0), n_rows)
+        if skip:
+            self._to_skip[name] -= skip
+        if skip < n_rows:
+            if positions is None:
+                selected = islice(rows, skip, None)
+            else:
+                selected = map(rows.__getitem__, positions[skip:])
+            self._write_rows(name, selected, first_row + skip)
+
+        if highlight is not None:
+            self.duplicate_rows[name].extend((first_row + np.flatnonzero(highlight)).tolist())
+        self.rows_written[name] += n_rows
+
+    def reuse_rows(self, name: str, source_path: str, n_rows: int):
+        """
+        Take the first n_rows data rows of sheet name from source_path, a previous
+        output of this engine whose rows are known to be identical (incremental.py).
+        The next n_rows appended to the sheet are counted and highlighted but not written.
+        """
+        if not self.supports_reuse:
+            raise NotImplementedError(f"{type(self).__name__} cannot re-use rows of a previous output")
+        if self.reuse_source is None:
+            self.reuse_source = source_path
+        elif self.reuse_source != source_path:
+            raise ValueError("all re-used rows must come from the same previous output")
+        self.reused_rows[name] = n_rows
+        self._to_skip[name] = n_rows
+
+    def rows_needed(self, name: str, n_rows: int) -> bool:
+        """False if appending n_rows to the sheet would only skip re-used rows."""
+        return n_rows > self._to_skip.get(name, 0)
+
+    @property
+    def engine_version(self) -> str:
+        """Writer (and library version) an output was produced with; outputs only share rows when it matches."""
+        return type(self).__name__
+
+    @property
+    def sheet_names(self):
+        return list(self.rows_written)
+
+
+class OpenpyxlWorkbookWriter(_WorkbookWriter):
+    """Regular openpyxl workbook, built in memory and styled on save."""
+
+    def __init__(self, path: str):
+        from openpyxl import Workbook
+
+        super().__init__(path)
+        self.wb = Workbook()
+        self.wb.remove(self.wb.active)
+        self.hidden_columns = {}
+
+    def _create_sheet(self, name, columns, hidden_columns):
+        ws = self.wb.create_sheet(title=name)
+        ws.append(columns)
+        self.hidden_columns[name] = hidden_columns
+
+    def _write_rows(self, name, rows, first_row):
+        ws = self.wb[name]
+        for row in rows:
+            ws.append(row)
+
+    def save(self):
+        from excel_style import style_worksheet
+
+        for name in self.sheet_names:
+            style_worksheet(self.wb[name], duplicate_rows=self.duplicate_rows[name],
+                            hidden_columns=self.hidden_columns[name])
+        self.wb.save(self.path)
+
+
+class WriteOnlyWorkbookWriter(_WorkbookWriter):
+    """
+    openpyxl write-only workbook: each appended row is serialized straight to a
+    temp file, so memory does not grow with the number of rows.
+    """
+
+    def __init__(self, path: str):
+        from openpyxl import Workbook
+
+        super().__init__(path)
+        self.wb = Workbook(write_only=True)
+        self.sheets = {}
+
+    def _create_sheet(self, name, columns, hidden_columns):
+        from openpyxl.cell import WriteOnlyCell
+        from excel_style import header_styles, set_column_layout
+
+        ws = self.wb.create_sheet(title=name)
+        set_column_layout(ws, len(columns), hidden_columns)
+
+        header_font, header_fill = header_styles()
+        header = []
+        for value in columns:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.font = header_font
+            cell.fill = header_fill
+            header.append(cell)
+        ws.append(header)
+        self.sheets[name] = ws
+
+    def _write_rows(self, name, rows, first_row):
+        ws = self.sheets[name]
+        for row in rows:
+            ws.append(row)
+
+    def save(self):
+        from excel_style import add_row_formatting
+
+        for name, ws in self.sheets.items():
+            add_row_formatting(ws, self.rows_written[name], self.n_cols[name], self.duplicate_rows[name])
+        self.wb.save(self.path)
+
+
+class XlsxWriterWorkbookWriter(_WorkbookWriter):
+    """
+    xlsxwriter in constant_memory mode: each worksheet flushes a row to its temp
+    file as soon as the next row starts, so memory stays flat. Rows within a
+    sheet must arrive in order, which append() guarantees.
+    Strings are written inline (no shared strings table), so a sheet's row XML
+    is self-contained and can be re-used by a later run (reuse_rows).
+    Re-used rows also keep their cell style ids (s="N"), so every cell format is
+    registered up front, in a fixed order: the ids are the same in every run,
+    whether or not the new rows use a format.
+    """
+
+    supports_reuse = True
+
+    def __init__(self, path: str):
+        import xlsxwriter
+
+        super().__init__(path)
+        self.wb = xlsxwriter.Workbook(path, {
+            "constant_memory": True,
+            "default_date_format": "yyyy-mm-dd hh:mm:ss",
+            "remove_timezone": True,
+            "nan_inf_to_errors": True,
+        })
+        self.sheets = {}
+
+        from excel_style import HEADER_FILL_COLOR, HEADER_FONT_COLOR
+        self.header_format = self._format(bold=True, font_color=f"#{HEADER_FONT_COLOR}",
+                                          bg_color=f"#{HEADER_FILL_COLOR}", pattern=1)
+        # xlsxwriter otherwise numbers formats by first use (see the class docstring)
+        for cell_format in (self.header_format, self.wb.default_date_format):
+            cell_format._get_xf_index()
+
+    @property
+    def engine_version(self) -> str:
+        import xlsxwriter
+        return f"xlsxwriter {xlsxwriter.__version__}"
+
+    def _format(self, **props):
+        return self.wb.add_format(props)
+
+    def _create_sheet(self, name, columns, hidden_columns):
+        from openpyxl.utils import column_index_from_string
+        from excel_style import COLUMN_WIDTH
+
+        ws = self.wb.add_worksheet(name)
+        if columns:
+            ws.set_column(0, len(columns) - 1, COLUMN_WIDTH)
+        for col in hidden_columns:
+            idx = column_index_from_string(col) - 1
+            ws.set_column(idx, idx, COLUMN_WIDTH, None, {"hidden": True})
+
+        ws.write_row(0, 0, columns, self.header_format)
+        self.sheets[name] = ws
+
+    def _write_rows(self, name, rows, first_row):
+        ws = self.sheets[name]
+        # xlsxwriter rows are 0-based
+        for r, row in enumerate(rows, start=first_row - 1):
+            ws.write_row(r, 0, row)
+
+    def save(self):
+        from openpyxl.utils import get_column_letter
+        from excel_style import DUPLICATE_COLOR, STRIPE_EVEN_COLOR, STRIPE_ODD_COLOR, row_runs
+
+        dup_format = self._format(bg_color=f"#{DUPLICATE_COLOR}")
+        even_format = self._format(bg_color=f"#{STRIPE_EVEN_COLOR}")
+        odd_format = self._format(bg_color=f"#{STRIPE_ODD_COLOR}")
+
+        for name, ws in self.sheets.items():
+            n_rows, n_cols = self.rows_written[name], self.n_cols[name]
+            if n_rows < 2 or n_cols < 1:
+                continue
+            last_col = get_column_letter(n_cols)
+
+            # Duplicate rule first so it wins over the stripes (see excel_style.add_row_formatting)
+            runs = row_runs(self.duplicate_rows[name])
+            if runs:
+                ranges = " ".join(f"A{first}:{last_col}{last}" for first, last in runs)
+                ws.conditional_format(ranges.split(" ")[0], {
+                    "type": "formula", "criteria": "=TRUE", "format": dup_format,
+                    "stop_if_true": True, "multi_range": ranges,
+                })
+
+            data_range = f"A2:{last_col}{n_rows}"
+            ws.conditional_format(data_range, {"type": "formula", "criteria": "=MOD(ROW(),2)=0",
+                                               "format": even_format})
+            ws.conditional_format(data_range, {"type": "formula", "criteria": "=MOD(ROW(),2)=1",
+                                               "format": odd_format})
+        if not self.reused_rows:
+            self.wb.close()
+            return
+
+        # The previous output may sit at our own path (re-run within the same minute)
+        source = self.reuse_source
+        same_file = os.path.abspath(source) == os.path.abspath(self.path)
+        if same_file:
+            fd, source = tempfile.mkstemp(suffix=".xlsx")
+            os.close(fd)
+            shutil.copyfile(self.reuse_source, source)
+        try:
+            self.wb.close()
+            _splice_reused_rows(self.path, source, {
+                name: (n, f"A1:{get_column_letter(max(self.n_cols[name], 1))}{self.rows_written[name]}")
+                for name, n in self.reused_rows.items() if n
+            })
+        finally:
+            if same_file:
+                os.remove(source)
+
+
+class _FolderWriter(_WorkbookWriter):
+    """
+    One file per sheet in a folder at path, written chunk by chunk. Chunks come
+    in as DataFrames (buffer() returns the chunk itself) and rows are taken by
+    position, so nothing is converted to Python objects. No styling.
+    Subclasses set extension and implement _write_frame / _close_sheet.
+    """
+
+    extension = ""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        os.makedirs(path, exist_ok=True)
+        self.columns = {}
+        self.flagged = {}
+
+    def sheet_path(self, name: str) -> str:
+        # Sheet names are Excel-safe already; also drop what Windows forbids in file names
+        return os.path.join(self.path, re.sub(r'[<>:"/\\|?*]', "_", name) + self.extension)
+
+    def _create_sheet(self, name, columns, hidden_columns):
+        self.columns[name] = columns
+
+    def buffer(self, df: pd.DataFrame):
+        return df
+
+    def append(self, name: str, df: pd.DataFrame, highlight=None):
+        if df.empty:
+            return
+        self.append_rows(name, df, highlight=highlight)
+
+    def append_rows(self, name: str, rows: pd.DataFrame, positions=None, highlight=None):
+        """rows: a buffer() chunk; see _WorkbookWriter.append_rows."""
+        part = rows if positions is None else rows.take(np.asarray(positions))
+        if len(part) == 0:
+            return
+        part = part.set_axis(self.columns[name], axis=1)
+        # The flag column is added if the sheet's first rows came with highlight
+        flagged = self.flagged.setdefault(name, highlight is not None)
+        if flagged:
+            flags = np.zeros(len(part), dtype=bool) if highlight is None else np.asarray(highlight, dtype=bool)
+            part = part.assign(**{DUPLICATE_FLAG_COLUMN: flags})
+        self._write_frame(name, part.reset_index(drop=True))
+        self.rows_written[name] += len(part)
+
+    def save(self):
+        for name in self.rows_written:
+            self._close_sheet(name)
+
+
+class ParquetFolderWriter(_FolderWriter):
+    """One Parquet file per sheet (needs pyarrow)."""
+
+    extension = ".parquet"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._writers = {}
+
+    def _write_frame(self, name, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(_arrow_ready(df), preserve_index=False)
+        writer = self._writers.get(name)
+        if writer is None:
+            # Columns empty in the first chunk are typed as text, the likeliest type later
+            schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                for field in table.schema], metadata=table.schema.metadata)
+            writer = self._writers[name] = pq.ParquetWriter(self.sheet_path(name), schema)
+        try:
+            table = table.cast(writer.schema)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"Sheet {name!r}: a column changed type between chunks ({e}); "
+                             f"write CSV or xlsx, or turn streaming off") from e
+        writer.write_table(table)
+
+    def _close_sheet(self, name):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = self._writers.pop(name, None)
+        if writer is not None:
+            writer.close()
+            return
+        # No rows: header-only file with text columns
+        schema = pa.schema([(column, pa.string()) for column in self.columns[name]])
+        pq.write_table(schema.empty_table(), self.sheet_path(name))
+
+
+class CsvFolderWriter(_FolderWriter):
+    """One CSV file per sheet (UTF-8, comma separated, header row)."""
+
+    extension = ".csv"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._files = {}
+
+    def _write_frame(self, name, df):
+        f = self._files.get(name)
+        header = f is None
+        if header:
+            f = self._files[name] = open(self.sheet_path(name), "w", newline="", encoding=CSV_OUTPUT_ENCODING)
+        df.to_csv(f, header=header, index=False)
+
+    def _close_sheet(self, name):
+        f = self._files.pop(name, None)
+        if f is None:
+            pd.DataFrame(columns=self.columns[name]).to_csv(self.sheet_path(name), index=False,
+                                                            encoding=CSV_OUTPUT_ENCODING)
+        else:
+            f.close()
+
+
+def _arrow_ready(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Make object columns storable in Parquet: columns mixing types (numbers and
+    text in one column, as Excel exports often do) are written as text.
+    """
+    fixed = {}
+    for i, dtype in enumerate(df.dtypes):
+        if dtype == object:
+            column = df.iloc[:, i]
+            if pd.api.types.infer_dtype(column, skipna=True) in ("mixed", "mixed-integer"):
+                fixed[i] = column.map(str, na_action="ignore")
+    if not fixed:
+        return df
+    df = df.copy(deep=False)
+    for i, column in fixed.items():
+        df.isetitem(i, column)
+    return df
+
+
+# -------- ROW RE-USE (xlsxwriter outputs) --------
+_COPY_BLOCK = 1 << 20
+
+
+def _sheet_parts(zf: zipfile.ZipFile) -> dict:
+    """{sheet name: worksheet part path} from an xlsx package."""
+    from xml.sax.saxutils import unescape
+
+    workbook = zf.read("xl/workbook.xml").decode("utf-8")
+    rels = zf.read("xl/_rels/workbook.xml.rels").decode("utf-8")
+    targets = {}
+    for rel in re.findall(r"<Relationship [^>]*>", rels):
+        rel_id = re.search(r'Id="([^"]+)"', rel).group(1)
+        target = re.search(r'Target="([^"]+)"', rel).group(1)
+        targets[rel_id] = target.lstrip("/") if target.startswith("/") else "xl/" + target
+    parts = {}
+    for sheet in re.findall(r"<sheet [^>]*>", workbook):
+        name = unescape(re.search(r'name="([^"]*)"', sheet).group(1), {"&quot;": '"', "&apos;": "'"})
+        parts[name] = targets[re.search(r'r:id="([^"]+)"', sheet).group(1)]
+    return parts
+
+
+def _copy_rows(src, dst, n_rows: int):
+    """Stream data rows 2..n_rows+1 of a worksheet part from src to dst."""
+    buf = b""
+    # Skip everything up to the end of the header row
+    while True:
+        block = src.read(_COPY_BLOCK)
+        if not block:
+            raise ValueError("worksheet has no header row")
+        buf += block
+        start = buf.find(b"<sheetData>")
+        end = buf.find(b"</row>", start) if start != -1 else -1
+        if end != -1:
+            buf = buf[end + len(b"</row>"):]
+            break
+
+    # Copy until the first row we are not re-using (or the end of the data)
+    stop_marks = (f'<row r="{n_rows + 2}"'.encode(), b"</sheetData>")
+    keep = max(len(mark) for mark in stop_marks) - 1
+    while True:
+        stops = [pos for pos in (buf.find(mark) for mark in stop_marks) if pos != -1]
+        if stops:
+            dst.write(buf[:min(stops)])
+            return
+        block = src.read(_COPY_BLOCK)
+        if not block:
+            raise ValueError("worksheet data is truncated")
+        if len(buf) > keep:
+            dst.write(buf[:-keep])
+            buf = buf[-keep:]
+        buf += block
+
+
+def _cell_xfs(zf: zipfile.ZipFile) -> list:
+    """The cell formats (<xf> elements of cellXfs) in the package's styles.xml, in index order."""
+    styles = zf.read("xl/styles.xml").decode("utf-8")
+    match = re.search(r"<cellXfs[^>]*>(.*?)</cellXfs>", styles, re.S)
+    return re.findall(r"<xf\b[^>]*/>|<xf\b.*?</xf>", match.group(1), re.S) if match else []
+
+
+def _splice_reused_rows(path: str, source_path: str, sheets: dict):
+    """
+    Insert re-used rows from source_path into the freshly written workbook at path.
+    sheets: {sheet name: (rows re-used, dimension ref)}. The new worksheet parts
+    hold the header and the rows after the re-used ones; the re-used rows are
+    streamed from the old part in between. All other parts come from the new file.
+    Raises ValueError if the new styles.xml would not resolve the re-used rows'
+    style ids to the same formats.
+    """
+    with zipfile.ZipFile(path) as new_zip, zipfile.ZipFile(source_path) as old_zip:
+        old_xfs = _cell_xfs(old_zip)
+        if _cell_xfs(new_zip)[:len(old_xfs)] != old_xfs:
+            raise ValueError(f"cell formats of {source_path} differ from this run's; cannot re-use its rows")
+
+    tmp = f"{path}.{os.getpid()}.splice.tmp"
+    with zipfile.ZipFile(path) as new_zip, zipfile.ZipFile(source_path) as old_zip, \
+            zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as out:
+        new_parts, old_parts = _sheet_parts(new_zip), _sheet_parts(old_zip)
+        spliced = {new_parts[name]: (old_parts[name], n, ref) for name, (n, ref) in sheets.items()}
+
+        for info in new_zip.infolist():
+            target = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+            target.compress_type = zipfile.ZIP_DEFLATED
+            with out.open(target, "w", force_zip64=True) as dst:
+                if info.filename not in spliced:
+                    with new_zip.open(info) as src:
+                        shutil.copyfileobj(src, dst, _COPY_BLOCK)
+                    continue
+
+                old_part, n_rows, ref = spliced[info.filename]
+                xml = new_zip.read(info)
+                xml = re.sub(rb'<dimension ref="[^"]*"/>', f'<dimension ref="{ref}"/>'.encode(), xml, count=1)
+                header_end = xml.index(b"</row>", xml.index(b"<sheetData>")) + len(b"</row>")
+                dst.write(xml[:header_end])
+                with old_zip.open(old_part) as src:
+                    _copy_rows(src, dst, n_rows)
+                dst.write(xml[header_end:])
+    os.replace(tmp, path)
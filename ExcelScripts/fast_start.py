@@ -0,0 +1,110 @@
+# fast_start.py
+# Startup-optimized entry point for the packaged FilterExcel executables.
+# The scripts import pandas, numpy and openpyxl at the top, so launching one
+# directly shows nothing until all of them are loaded. This entry point only
+# imports tkinter, shows the file dialog right away, and loads the chosen
+# script (and its heavy imports) in a background thread while the user is
+# still picking a file. The script then runs as usual with that file.
+# Measured import times and time-to-dialog go into the run report ("startup").
+#
+#   python fast_start.py                        # FilterExcel_multiBU
+#   python fast_start.py FilterExcel_multi
+#   python fast_start.py FilterExcel --import-times
+#
+# Packaged, the script is picked from the executable name (see build_exe.py).
+# Keep this module's own imports to the standard library.
+
+import importlib
+import os
+import sys
+import threading
+import time
+
+from run_report import note_startup, seconds_since_launch
+
+SCRIPTS = ["FilterExcel_multiBU", "FilterExcel_multi", "FilterExcel"]
+DEFAULT_SCRIPT = "FilterExcel_multiBU"
+
+# Loaded in this order in the background; the script module itself comes last
+WARM_IMPORTS = ["numpy", "pandas", "openpyxl", "xlsxwriter", "pyarrow"]
+
+
+class _Preloader(threading.Thread):
+    """Imports modules in the background and times each of them."""
+
+    def __init__(self, modules):
+        super().__init__(daemon=True)
+        self.modules = modules
+        self.times = {}
+        self.error = None
+
+    def run(self):
+        for name in self.modules:
+            started = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                if name == self.modules[-1]:
+                    self.error = e  # the script itself; optional extras may be missing
+                continue
+            self.times[name] = round(time.perf_counter() - started, 3)
+
+
+def pick_script(argv):
+    """Script named on the command line, else the one the executable is named after."""
+    for arg in argv:
+        if arg in SCRIPTS:
+            return arg
+    exe_name = os.path.splitext(os.path.basename(sys.executable if getattr(sys, "frozen", False) else ""))[0]
+    return exe_name if exe_name in SCRIPTS else DEFAULT_SCRIPT
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    started = time.perf_counter()
+    script = pick_script(argv)
+
+    preloader = _Preloader(WARM_IMPORTS + [script])
+    preloader.start()
+
+    import tkinter as tk
+    from tkinter import filedialog, messagebox
+
+    root = tk.Tk()
+    root.withdraw()
+    to_dialog = round(time.perf_counter() - started, 3)
+    since_launch = seconds_since_launch()
+    file_path = filedialog.askopenfilename(
+        title="Select Excel file",
+        filetypes=[("Excel files", "*.xlsx *.xls"), ("CSV / Parquet", "*.csv *.parquet")]
+    )
+    root.destroy()
+    if not file_path:
+        print("No file selected. Exiting.")
+        return
+
+    waited = time.perf_counter()
+    preloader.join()
+    startup = {
+        "frozen": bool(getattr(sys, "frozen", False)),
+        "launch_to_dialog_s": since_launch,
+        "entry_to_dialog_s": to_dialog,
+        "waited_for_imports_s": round(time.perf_counter() - waited, 3),
+        "import_s": preloader.times,
+    }
+    note_startup(**startup)
+    if "--import-times" in argv:
+        for name, seconds in startup["import_s"].items():
+            print(f"{name:24s} {seconds:7.3f}s")
+
+    if preloader.error is not None:
+        root = tk.Tk()
+        root.withdraw()
+        messagebox.showerror("Startup Error", f"Failed to load {script}:\n{preloader.error}")
+        root.destroy()
+        return
+    sys.modules[script].main(file_path)
+
+
+if __name__ == "__main__":
+    main()
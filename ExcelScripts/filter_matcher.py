@@ -0,0 +1,337 @@
+# filter_matcher.py
+# Compiles filter definitions (sheet label -> list of email/office pairs) into a
+# single multi-pattern matcher.
+# Each column's distinct values are lowercased once, then searched for the
+# literal email/office patterns:
+# - up to VECTOR_SCAN_MAX_PATTERNS patterns (the usual rule sets): one vectorized
+#   str.contains(regex=False) per pattern, which runs in C
+# - more patterns: one pass of an Aho-Corasick automaton, which reports all
+#   matching patterns at once (pyahocorasick's C automaton when it is installed,
+#   pip install pyahocorasick; else the pure-Python one below)
+# Pairs can also declare exact keys (office_exact, email_domain, email_local).
+# Those are looked up in a hash table per distinct value instead of scanned, so
+# "105" no longer matches "1050" or "2105". Regex rules (email_regex,
+# office_regex) are also run once per distinct value.
+# The result is a row-by-sheet boolean membership matrix that drives every
+# filtered sheet plus the remainder sheet. partition_rows() turns it into the
+# row positions of each sheet, so sheets never need their own DataFrame copy.
+
+import re
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from compact_dtypes import lowercase_codes
+
+# -------- CONFIG --------
+VECTOR_SCAN_MAX_PATTERNS = 32  # per column; above this the automaton is faster
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over a fixed list of literal patterns.
+    find(text) returns the set of pattern ids that occur anywhere in text
+    (overlapping matches included, e.g. "apa" and "apav" both match "apav-x").
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [set()]
+
+        # Build the trie
+        for pid, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(set())
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._out[state].add(pid)
+
+        # Breadth-first pass to compute failure links and merge outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> set:
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        found = set()
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+
+def _build_automaton(patterns):
+    """Object with find(text) -> set of pattern ids: pyahocorasick if installed, else AhoCorasick."""
+    try:
+        import ahocorasick
+    except ImportError:
+        return AhoCorasick(patterns)
+
+    class _CAutomaton:
+        def __init__(self):
+            self._automaton = ahocorasick.Automaton()
+            for pid, pattern in enumerate(patterns):
+                self._automaton.add_word(pattern, pid)
+            self._automaton.make_automaton()
+
+        def find(self, text: str) -> set:
+            return {pid for _, pid in self._automaton.iter(text)}
+
+    return _CAutomaton()
+
+
+class SubstringPatterns:
+    """
+    The literal patterns of one column and the sheets each one selects.
+    mark() sets unique_matrix[value, sheet] for every lowercased distinct value
+    (a str Series, see lowercase_codes) containing a pattern.
+    The automaton (large pattern sets only) is built on first use and not pickled.
+    """
+
+    def __init__(self, pattern_to_sheets):
+        self.patterns = list(pattern_to_sheets)
+        self.sheets = [sorted(pattern_to_sheets[p]) for p in self.patterns]
+        self._automaton = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_automaton"] = None
+        return state
+
+    def mark(self, uniques: pd.Series, unique_matrix: np.ndarray):
+        if uniques.empty:
+            return
+        if len(self.patterns) <= VECTOR_SCAN_MAX_PATTERNS:
+            for pattern, sheets in zip(self.patterns, self.sheets):
+                hits = np.flatnonzero(uniques.str.contains(pattern, regex=False).to_numpy(dtype=bool))
+                if len(hits):
+                    unique_matrix[np.ix_(hits, sheets)] = True
+            return
+        if self._automaton is None:
+            self._automaton = _build_automaton(self.patterns)
+        find = self._automaton.find
+        rows, pids = [], []
+        for u_idx, value in enumerate(uniques.tolist()):
+            for pid in find(value):
+                rows.append(u_idx)
+                pids.append(pid)
+        if rows:
+            pattern_sheets = np.zeros((len(self.patterns), unique_matrix.shape[1]), dtype=bool)
+            for pid, sheets in enumerate(self.sheets):
+                pattern_sheets[pid, sheets] = True
+            # .at, as one value can match several patterns
+            np.logical_or.at(unique_matrix, np.asarray(rows), pattern_sheets[pids])
+
+
+def _office_key(value: str) -> str:
+    """Exact BU code key; numeric codes read as floats ("105.0") match "105"."""
+    value = value.strip()
+    return value[:-2] if re.fullmatch(r"\d+\.0", value) else value
+
+
+def _email_domain(value: str) -> str:
+    value = value.strip()
+    return value.rpartition("@")[2] if "@" in value else ""
+
+
+def _email_local(value: str) -> str:
+    value = value.strip()
+    return value.partition("@")[0] if "@" in value else ""
+
+
+# Exact-key rule name -> (column it applies to, key taken from each lowercased value)
+EXACT_RULES = {
+    "office_exact": ("office", _office_key),
+    "email_domain": ("email", _email_domain),
+    "email_local": ("email", _email_local),
+}
+
+
+# Regex rule name -> (column it applies to, text searched in each lowercased value).
+# Office regexes see the same BU code as office_exact ("105", not "105.0").
+REGEX_RULES = {
+    "email_regex": ("email", str.strip),
+    "office_regex": ("office", _office_key),
+}
+
+
+class CompiledFilters:
+    """
+    Compiled form of a FILTER_DEFINITIONS-style mapping.
+    - labels: sheet labels in definition order
+    - email / office: SubstringPatterns per column, or None
+    - exact: {exact rule name: {key: list of sheet indexes}} for the rules in use
+    - regex: {regex rule name: [(compiled pattern, list of sheet indexes)]} for the rules in use
+    Plain data only, so it can be pickled (see filter_rules.py).
+    """
+
+    def __init__(self, labels, email_patterns, office_patterns, exact_keys=None, regex_patterns=None):
+        self.labels = labels
+        self.email = _compile_column(email_patterns)
+        self.office = _compile_column(office_patterns)
+        self.exact = {rule: {key: sorted(sheets) for key, sheets in keys.items()}
+                      for rule, keys in (exact_keys or {}).items() if keys}
+        self.regex = {}
+        for rule, patterns in (regex_patterns or {}).items():
+            for pattern, sheets in patterns.items():
+                self.regex.setdefault(rule, []).append(
+                    (re.compile(pattern, re.IGNORECASE), sorted(sheets)))
+
+
+def _compile_column(pattern_to_sheets):
+    """SubstringPatterns for one column, or None if no patterns."""
+    return SubstringPatterns(pattern_to_sheets) if pattern_to_sheets else None
+
+
+def _exact_values(value):
+    """An exact-key / regex rule value: one string or a list of them."""
+    if value is None:
+        return []
+    return [value] if isinstance(value, (str, int, float)) else list(value)
+
+
+def _pattern_text(value) -> str:
+    """A substring rule value as a lowercase pattern; numbers (YAML "office: 105") become text."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip().lower()
+
+
+def compile_filters(filter_definitions) -> CompiledFilters:
+    """
+    Compile {sheet label: [{"email": ..., "office": ...}, ...]} into a CompiledFilters.
+    - "email" / "office" are substring patterns (case-insensitive)
+    - "office_exact", "email_domain", "email_local" are exact keys (one value or a
+      list), e.g. {"office_exact": "105"} or {"email_domain": ["mccoy.com", "mccoy.net"]}
+    - "email_regex" / "office_regex" are regular expressions (one or a list),
+      searched case-insensitively, e.g. {"email_regex": r"@mccoy\\.(com|net)$"}
+    - Every key in a pair is OR-ed, like email / office
+    - Patterns are lowercased and stripped; empty patterns are skipped
+    - Numeric values (e.g. office: 105 in YAML) are matched as their text ("105")
+    - A pattern shared by several sheets is scanned once and fans out to all of them
+    - Non-list values are treated as an empty list (sheet with headers only)
+    """
+    labels = list(filter_definitions.keys())
+    email_patterns = {}
+    office_patterns = {}
+    exact_keys = {rule: {} for rule in EXACT_RULES}
+    regex_patterns = {rule: {} for rule in REGEX_RULES}
+
+    for sheet_idx, label in enumerate(labels):
+        pairs = filter_definitions[label]
+        if not isinstance(pairs, (list, tuple)):
+            pairs = []
+        for pair in pairs:
+            email_match = _pattern_text(pair.get("email"))
+            office_match = _pattern_text(pair.get("office"))
+            if email_match:
+                email_patterns.setdefault(email_match, set()).add(sheet_idx)
+            if office_match:
+                office_patterns.setdefault(office_match, set()).add(sheet_idx)
+            for rule in EXACT_RULES:
+                for value in _exact_values(pair.get(rule)):
+                    # Configured keys are the bare value ("mccoy.com", "jsmith"); "@" is tolerated
+                    key = _office_key(str(value).lower()).strip("@ ")
+                    if key:
+                        exact_keys[rule].setdefault(key, set()).add(sheet_idx)
+            for rule in REGEX_RULES:
+                for pattern in _exact_values(pair.get(rule)):
+                    if str(pattern):
+                        regex_patterns[rule].setdefault(str(pattern), set()).add(sheet_idx)
+
+    return CompiledFilters(labels, email_patterns, office_patterns, exact_keys, regex_patterns)
+
+
+def _column_membership(series: pd.Series, n_sheets: int, substring=None, exact=(), regex=()) -> np.ndarray:
+    """
+    Match one column against its substring patterns and exact-key tables.
+    The column is factorized once (a hash index over its distinct values; free for
+    a categorical) and only its distinct values are lowercased (lowercase_codes).
+    Each distinct value is scanned / looked up once, and per-row results are
+    gathered back through the codes.
+    - substring: SubstringPatterns or None
+    - exact: [(key function, {key: sheet indexes}), ...]
+    - regex: [(key function, compiled pattern, sheet indexes), ...]
+    Missing values never match (same as str.contains(..., na=False)).
+    """
+    codes, lowered = lowercase_codes(series)
+
+    # One extra all-False row at the end: factorize codes missing values as -1
+    unique_matrix = np.zeros((len(lowered) + 1, n_sheets), dtype=bool)
+    if substring is not None:
+        substring.mark(lowered, unique_matrix)
+    uniques = lowered.tolist() if exact or regex else []
+    for key_func, table in exact:
+        for u_idx, value in enumerate(uniques):
+            sheets = table.get(key_func(value))
+            if sheets:
+                unique_matrix[u_idx, sheets] = True
+    for key_func, pattern, sheets in regex:
+        for u_idx, value in enumerate(uniques):
+            if pattern.search(key_func(value)):
+                unique_matrix[u_idx, sheets] = True
+
+    return unique_matrix[codes]
+
+
+def membership_matrix(df: pd.DataFrame, compiled: CompiledFilters,
+                      email_col: str, office_col: str) -> np.ndarray:
+    """
+    Return a (rows x sheets) boolean matrix: True where the row belongs to the sheet.
+    A row belongs to a sheet if its email contains ANY of the sheet's email
+    patterns OR its office contains ANY of the sheet's office patterns
+    (case-insensitive substring match, patterns treated as literals), OR one of
+    the sheet's exact keys equals the row's BU code / email domain / local part,
+    OR one of its regexes matches.
+    Rows with no True in their row belong to the remainder.
+    """
+    n_sheets = len(compiled.labels)
+    matrix = np.zeros((len(df), n_sheets), dtype=bool)
+    for column, col_name, substring in (("email", email_col, compiled.email),
+                                        ("office", office_col, compiled.office)):
+        exact = [(key_func, compiled.exact[rule]) for rule, (rule_column, key_func) in EXACT_RULES.items()
+                 if rule_column == column and rule in compiled.exact]
+        regex = [(key_func, pattern, sheets)
+                 for rule, (rule_column, key_func) in REGEX_RULES.items() if rule_column == column
+                 for pattern, sheets in compiled.regex.get(rule, [])]
+        if substring is not None or exact or regex:
+            matrix |= _column_membership(df[col_name], n_sheets, substring, exact, regex)
+    return matrix
+
+
+def partition_rows(membership: np.ndarray):
+    """
+    Split rows into sheets in one pass over the membership matrix.
+    Returns (positions, remainder): positions[i] holds the ascending row positions
+    routed to sheet i; remainder holds the rows that matched no sheet.
+    """
+    n_sheets = membership.shape[1]
+    remainder = np.flatnonzero(~membership.any(axis=1))
+    if n_sheets == 0:
+        return [], remainder
+    # nonzero() on the transpose comes back ordered by sheet, then by row
+    sheet_idx, row_idx = np.nonzero(membership.T)
+    bounds = np.cumsum(np.bincount(sheet_idx, minlength=n_sheets))[:-1]
+    return np.split(row_idx, bounds), remainder
@@ -0,0 +1,151 @@
+# filter_rules.py
+# Filter rule sets kept outside the code, in a JSON or YAML file with the same
+# shape as FILTER_DEFINITIONS in FilterExcel_multiBU.py:
+#   {"GBI": [{"email": "gil-bar", "office": "105"}],
+#    "McCoy": [{"email_domain": "mccoy.com"}, {"office_exact": ["662", "818"]}]}
+# See filter_rules.example.json and compile_filters() for every rule key.
+# - A file is validated once; every problem is reported together (RuleFileError)
+# - The compiled matcher is cached on disk (next to the input cache) keyed by the
+#   SHA-256 of the file, so large rule sets load instantly until the file changes
+# - YAML needs PyYAML (pip install pyyaml); JSON works out of the box
+
+import hashlib
+import json
+import os
+import pickle
+import re
+import sys
+import uuid
+
+import input_cache
+from filter_matcher import CompiledFilters, EXACT_RULES, REGEX_RULES, compile_filters
+
+RULES_FILE_NAMES = ["filter_rules.json", "filter_rules.yaml", "filter_rules.yml"]
+RULE_KEYS = ["email", "office", *EXACT_RULES, *REGEX_RULES]
+
+# Bump when CompiledFilters / compile_filters change shape, so old cache entries are ignored
+_COMPILED_FORMAT = b"filter-rules-v2"
+
+
+class RuleFileError(ValueError):
+    """The rule file could not be read, or it failed validation."""
+
+
+def app_dir() -> str:
+    """Folder of the scripts, or of the .exe when packaged with PyInstaller."""
+    if getattr(sys, "frozen", False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def find_rules_file(directory: str = None):
+    """First of RULES_FILE_NAMES present in directory (default: app_dir()), else None."""
+    directory = directory or app_dir()
+    for name in RULES_FILE_NAMES:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _parse(raw: bytes, path: str):
+    ext = os.path.splitext(path)[1].lower()
+    text = raw.decode("utf-8-sig")
+    if ext == ".json":
+        try:
+            return json.loads(text)
+        except ValueError as e:
+            raise RuleFileError(f"{path}: invalid JSON: {e}")
+    if ext in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise RuleFileError(f"{path}: YAML rule files need PyYAML (pip install pyyaml), or use JSON")
+        try:
+            return yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise RuleFileError(f"{path}: invalid YAML: {e}")
+    raise RuleFileError(f"{path}: unsupported rule file type (expected .json, .yaml or .yml)")
+
+
+def validate_rules(data, source: str = "rules") -> dict:
+    """
+    Check a parsed rule set and return it as {sheet label: [rule dict, ...]}.
+    Raises RuleFileError listing every problem found.
+    """
+    if not isinstance(data, dict) or not data:
+        raise RuleFileError(f"{source}: expected a mapping of sheet name -> list of rules")
+
+    problems = []
+    for label, rules in data.items():
+        if not str(label).strip():
+            problems.append("empty sheet name")
+        if not isinstance(rules, list):
+            problems.append(f"{label}: expected a list of rules, got {type(rules).__name__}")
+            continue
+        for n, rule in enumerate(rules, start=1):
+            where = f"{label}, rule {n}"
+            if not isinstance(rule, dict):
+                problems.append(f"{where}: expected an object like {{\"email\": ..., \"office\": ...}}")
+                continue
+            unknown = [key for key in rule if key not in RULE_KEYS]
+            if unknown:
+                problems.append(f"{where}: unknown key(s) {', '.join(map(str, unknown))} "
+                                f"(allowed: {', '.join(RULE_KEYS)})")
+
+            has_value = False
+            for key in RULE_KEYS:
+                value = rule.get(key)
+                if value is None:
+                    continue
+                values = value if isinstance(value, list) and key not in ("email", "office") else [value]
+                for item in values:
+                    if not isinstance(item, (str, int, float)) or isinstance(item, bool):
+                        problems.append(f"{where}: {key} must be text" +
+                                        ("" if key in ("email", "office") else " or a list of text"))
+                        continue
+                    if str(item).strip():
+                        has_value = True
+                    if key in REGEX_RULES:
+                        try:
+                            re.compile(str(item))
+                        except re.error as e:
+                            problems.append(f"{where}: bad {key} {item!r}: {e}")
+            if not has_value:
+                problems.append(f"{where}: matches nothing (all values empty)")
+
+    if problems:
+        raise RuleFileError(f"{source}:\n" + "\n".join(f"- {p}" for p in problems))
+    return {str(label): rules for label, rules in data.items()}
+
+
+def load_rules(path: str) -> CompiledFilters:
+    """
+    Compiled matcher for the rule file at path.
+    Served from the on-disk cache when this exact file content was compiled before;
+    otherwise parsed, validated and compiled, then cached.
+    """
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except OSError as e:
+        raise RuleFileError(f"{path}: {e}")
+
+    key = hashlib.sha256(_COMPILED_FORMAT + raw).hexdigest()
+    cache_path = os.path.join(input_cache.CACHE_DIR, f"rules-{key}.pkl")
+    if input_cache.CACHE_ENABLED and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            pass  # unreadable entry: recompile and overwrite it
+
+    compiled = compile_filters(validate_rules(_parse(raw, path), path))
+
+    if input_cache.CACHE_ENABLED:
+        os.makedirs(input_cache.CACHE_DIR, exist_ok=True)
+        tmp = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_path)
+    return compiled
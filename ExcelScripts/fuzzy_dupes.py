@@ -0,0 +1,118 @@
+# fuzzy_dupes.py
+# Near-duplicate clustering for normalized names ("jon smith" vs "john smith").
+# Comparing every pair of names is out of the question at our row counts, so
+# candidates come from two blocking indexes:
+# - Single edits: names one deleted character apart (from either side, so one
+#   insertion, deletion or substitution) share a deletion variant
+#   ("jon smith" / "john smith" both give "jon smith"). This finds the common
+#   typos however many names share their q-grams, so recall does not drop as
+#   the data grows.
+# - Q-grams, for names further apart: two names are compared if they share at
+#   least FUZZY_MIN_SHARED informative q-grams (a gram shared by more than
+#   FUZZY_MAX_BLOCK names, e.g. "th ", tells us nothing and is skipped).
+# Candidates go through a cheap length (and q-gram) filter, and the survivors are
+# verified with difflib. Matches are merged into clusters with union-find.
+
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+# -------- CONFIG --------
+FUZZY_THRESHOLD = 0.88    # difflib ratio needed to call two names the same person
+FUZZY_QGRAM = 3           # q-gram length used for blocking
+FUZZY_MAX_BLOCK = 200     # skip q-grams shared by more names than this (single edits are found anyway)
+FUZZY_MIN_SHARED = 2      # informative q-grams two names must share to be compared
+FUZZY_MIN_QGRAM_DICE = 0.5  # cheap pre-filter before the difflib comparison
+
+
+def _qgrams(key: str, q: int) -> set:
+    padded = f" {key} "
+    return {padded[i:i + q] for i in range(max(len(padded) - q + 1, 1))}
+
+
+def cluster_keys(key_counts, threshold: float = FUZZY_THRESHOLD, q: int = FUZZY_QGRAM,
+                 max_block: int = FUZZY_MAX_BLOCK) -> dict:
+    """
+    Group near-identical keys.
+    key_counts: {normalized key: row count}; blank keys are ignored.
+    Returns {key: canonical key} for every key that belongs to a cluster of two
+    or more distinct keys. The canonical key is the cluster's most frequent key
+    (ties broken alphabetically). Keys not in the result are their own cluster.
+    """
+    keys = sorted(k for k in key_counts if k)
+    grams = [_qgrams(k, q) for k in keys]
+
+    # ----- Blocking index: q-gram -> key positions -----
+    index = defaultdict(list)
+    for pos, key_grams in enumerate(grams):
+        for gram in key_grams:
+            index[gram].append(pos)
+
+    parent = list(range(len(keys)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def merge_if_similar(i, j):
+        key, other = keys[i], keys[j]
+        # Length filter: ratio can never exceed 2*min/(a+b)
+        if 2 * min(len(key), len(other)) / (len(key) + len(other)) < threshold:
+            return
+        if find(i) == find(j):
+            return
+        matcher = SequenceMatcher(None, key, other)
+        if matcher.quick_ratio() >= threshold and matcher.ratio() >= threshold:
+            parent[find(j)] = find(i)
+
+    # ----- Candidate pairs one edit apart (shared deletion variant) -----
+    first_with = {}   # deletion variant -> position of the first key giving it
+    blocks = {}       # variants given by several keys -> those key positions
+    for pos, key in enumerate(keys):
+        for cut in range(len(key) + 1):
+            variant = key[:cut] + key[cut + 1:]  # cut == len(key): the key itself
+            other = first_with.setdefault(variant, pos)
+            if other != pos:
+                blocks.setdefault(variant, [other]).append(pos)
+    del first_with
+    for variant, block in blocks.items():
+        for a, i in enumerate(block):
+            for j in block[a + 1:]:
+                # Both keys are the variant plus at most one character, so difflib
+                # cannot match more than the variant: most pairs fail without running it
+                if i != j and 2 * len(variant) / (len(keys[i]) + len(keys[j])) >= threshold:
+                    merge_if_similar(i, j)
+    del blocks
+
+    # ----- Candidate pairs from shared informative q-grams -----
+    for i, key in enumerate(keys):
+        shared_counts = Counter()
+        for gram in grams[i]:
+            block = index[gram]
+            if len(block) <= max_block:
+                shared_counts.update(block)
+
+        # A pair with q-gram dice >= FUZZY_MIN_QGRAM_DICE shares at least
+        # dice * |grams_i| / 2 grams, so anything below that is dropped unseen
+        need = max(FUZZY_MIN_SHARED, int(FUZZY_MIN_QGRAM_DICE * len(grams[i]) / 2))
+        candidates = [j for j, n_shared in shared_counts.items() if n_shared >= need and j > i]
+
+        for j in candidates:
+            shared = len(grams[i] & grams[j])
+            if 2 * shared / (len(grams[i]) + len(grams[j])) >= FUZZY_MIN_QGRAM_DICE:
+                merge_if_similar(i, j)
+
+    # ----- Clusters -> canonical key -----
+    members = defaultdict(list)
+    for i in range(len(keys)):
+        members[find(i)].append(keys[i])
+
+    canonical = {}
+    for group in members.values():
+        if len(group) < 2:
+            continue
+        head = min(group, key=lambda k: (-key_counts[k], k))
+        for k in group:
+            canonical[k] = head
+    return canonical
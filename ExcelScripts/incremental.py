@@ -0,0 +1,169 @@
+# incremental.py
+# Incremental re-runs for FilterExcel_multiBU.py (see INCREMENTAL there).
+# Our exports are cumulative: this week's file is last week's plus some new or
+# changed rows, so most rows of most sheets come out exactly as last time.
+# - Every run stores a manifest next to its output (<output>.manifest.npz): the
+#   64-bit content hash of every row, per output sheet and in sheet order
+# - The next run hashes its rows the same way and picks the previous output in
+#   the same folder that shares the longest run of leading rows with it
+# - Per sheet, the leading rows whose hashes match are re-used from the previous
+#   workbook as-is (excel_writers.reuse_rows); only the rows after the first
+#   difference are serialized again. Duplicate flags and styling are always
+#   recomputed for the whole sheet, so they are correct for the new data.
+# - Added / removed / changed row counts go into the summary and run report
+# Needs the xlsxwriter output engine; with other engines every run is a full run.
+# The input still has to be parsed, so the saving is in the output writing.
+
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_SUFFIX = ".manifest.npz"
+MAX_CANDIDATES = 5  # newest manifests in the folder considered as the previous run
+
+# Bump when the manifest layout or the row hashing changes
+_MANIFEST_FORMAT = 1
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """64-bit content hash of each row (values as read), stable across runs."""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def key_hashes(series: pd.Series) -> np.ndarray:
+    """Hash of each row's identity key (e.g. an ID column)."""
+    return pd.util.hash_pandas_object(series.astype(str), index=False).to_numpy()
+
+
+def fingerprint(columns, engine_version: str) -> str:
+    """Outputs can only share rows if the columns and the writer that produced them match."""
+    payload = json.dumps([_MANIFEST_FORMAT, engine_version, [str(c) for c in columns]])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def common_prefix(a: np.ndarray, b: np.ndarray) -> int:
+    """Number of leading positions where a and b hold the same hashes."""
+    n = min(len(a), len(b))
+    differ = np.flatnonzero(a[:n] != b[:n])
+    return int(differ[0]) if differ.size else n
+
+
+class Manifest:
+    """
+    Row hashes of one run's output sheets.
+    sheets: {sheet name: row hashes in sheet order}; keys: optional identity key
+    hash per "Original Data" row, used to tell changed rows from added/removed ones.
+    """
+
+    def __init__(self, output_path: str, fingerprint: str, sheets: dict, keys=None, meta=None):
+        self.output_path = output_path
+        self.fingerprint = fingerprint
+        self.sheets = sheets
+        self.keys = keys
+        self.meta = meta or {}
+
+    @property
+    def path(self):
+        return self.output_path + MANIFEST_SUFFIX
+
+    def save(self):
+        st = os.stat(self.output_path)
+        meta = {"format": _MANIFEST_FORMAT, "fingerprint": self.fingerprint,
+                "output_size": st.st_size, "output_mtime_ns": st.st_mtime_ns,
+                "sheets": list(self.sheets)}
+        arrays = {f"sheet_{i}": hashes for i, hashes in enumerate(self.sheets.values())}
+        if self.keys is not None:
+            arrays["keys"] = self.keys
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp, self.path)
+        return self.path
+
+    @classmethod
+    def load(cls, manifest_path: str):
+        """Manifest stored at manifest_path, or None if it is unreadable or from another format."""
+        try:
+            with np.load(manifest_path) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta.get("format") != _MANIFEST_FORMAT:
+                    return None
+                sheets = {name: data[f"sheet_{i}"] for i, name in enumerate(meta["sheets"])}
+                keys = data["keys"] if "keys" in data.files else None
+        except (OSError, ValueError, KeyError):
+            return None
+        output_path = manifest_path[:-len(MANIFEST_SUFFIX)]
+        return cls(output_path, meta["fingerprint"], sheets, keys, meta)
+
+    def output_unchanged(self) -> bool:
+        """The output still exists exactly as written (not re-saved from Excel, for example)."""
+        try:
+            st = os.stat(self.output_path)
+        except OSError:
+            return False
+        return (st.st_size == self.meta.get("output_size")
+                and st.st_mtime_ns == self.meta.get("output_mtime_ns"))
+
+
+def find_previous(output_dir: str, fingerprint: str, original_rows: np.ndarray):
+    """
+    Previous run to re-use rows from: among the newest MAX_CANDIDATES manifests in
+    output_dir with a matching fingerprint and an untouched output, the one sharing
+    the most leading "Original Data" rows with original_rows. None if nothing is shared.
+    """
+    manifests = sorted(glob.glob(os.path.join(glob.escape(output_dir or "."), "*" + MANIFEST_SUFFIX)),
+                       key=os.path.getmtime, reverse=True)
+    best, best_shared = None, 0
+    for manifest_path in manifests[:MAX_CANDIDATES]:
+        manifest = Manifest.load(manifest_path)
+        if manifest is None or manifest.fingerprint != fingerprint or not manifest.output_unchanged():
+            continue
+        shared = common_prefix(manifest.sheets.get("Original Data", np.empty(0, np.uint64)), original_rows)
+        if shared > best_shared:
+            best, best_shared = manifest, shared
+    return best
+
+
+def plan_reuse(previous: Manifest, sheets: dict) -> dict:
+    """{sheet name: leading rows identical to the previous run}, for sheets sharing any."""
+    plan = {}
+    for name, hashes in sheets.items():
+        old = previous.sheets.get(name)
+        if old is not None:
+            shared = common_prefix(old, hashes)
+            if shared:
+                plan[name] = shared
+    return plan
+
+
+def _multiset_overlap(old: np.ndarray, new: np.ndarray) -> int:
+    old_values, old_counts = np.unique(old, return_counts=True)
+    new_values, new_counts = np.unique(new, return_counts=True)
+    _, old_idx, new_idx = np.intersect1d(old_values, new_values, assume_unique=True, return_indices=True)
+    return int(np.minimum(old_counts[old_idx], new_counts[new_idx]).sum())
+
+
+def diff_rows(old_rows: np.ndarray, new_rows: np.ndarray, old_keys=None, new_keys=None) -> dict:
+    """
+    Added / removed / changed row counts between two runs.
+    With unique identity keys on both sides a row whose key is kept but whose
+    content differs counts as changed; otherwise it counts as removed + added.
+    """
+    keyed = (old_keys is not None and new_keys is not None
+             and len(np.unique(old_keys)) == len(old_keys) and len(np.unique(new_keys)) == len(new_keys))
+    if not keyed:
+        kept = _multiset_overlap(old_rows, new_rows)
+        return {"added": len(new_rows) - kept, "removed": len(old_rows) - kept, "changed": 0}
+
+    old = pd.Series(old_rows, index=old_keys)
+    new = pd.Series(new_rows, index=new_keys)
+    both = old.index.intersection(new.index)
+    return {
+        "added": int(len(new) - len(both)),
+        "removed": int(len(old) - len(both)),
+        "changed": int((old[both] != new[both]).sum()),
+    }
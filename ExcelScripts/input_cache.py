@@ -0,0 +1,234 @@
+# input_cache.py
+# Transparent cache of parsed input workbooks for the FilterExcel scripts.
+# Parsing xlsx is by far the slowest step. After the first read, the cleaned
+# DataFrame (stripped column names) is stored as a Parquet file in CACHE_DIR.
+# Entries are keyed by the SHA-256 of the file content. Re-running on the same
+# export (e.g. after tweaking FILTER_DEFINITIONS) then loads the columnar copy
+# instead of re-parsing.
+# - A small index maps path + size + mtime to the content hash, so unchanged files are not re-hashed
+# - Frames Parquet cannot store (e.g. mixed-type object columns, or no pyarrow) fall back to pickle
+# - Streaming reads are cached too: chunks are written through to Parquet as they
+#   are read, and later runs stream them back in batches. They are stored under
+#   their own key (<hash>-stream), as streamed and whole-file reads can type the
+#   same column differently
+# - Entries older than CACHE_MAX_AGE_DAYS are evicted, then the least recently
+#   used ones until the cache fits in CACHE_MAX_MB (batch workers evict
+#   concurrently, so an entry can disappear at any time: that is just a miss)
+# - CSV and Parquet inputs are read directly (table_readers.py), never cached
+
+import hashlib
+import json
+import os
+import time
+import uuid
+
+import pandas as pd
+
+from excel_stream import iter_excel_chunks, STREAM_CHUNK_ROWS
+from table_readers import is_table_file, iter_table_chunks, read_table
+
+# -------- CONFIG --------
+CACHE_ENABLED = True
+CACHE_DIR = os.environ.get("FILTEREXCEL_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".filterexcel_cache")
+CACHE_MAX_AGE_DAYS = 30
+CACHE_MAX_MB = 2048
+
+_INDEX_FILE = "index.json"
+_DATA_EXTENSIONS = (".parquet", ".pkl")
+_STREAM_SUFFIX = "-stream"  # key suffix of entries written by iter_chunks_cached
+
+
+def _file_hash(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_index() -> dict:
+    try:
+        with open(os.path.join(CACHE_DIR, _INDEX_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(index: dict):
+    # Write-then-rename so parallel batch workers never see a half-written index
+    path = os.path.join(CACHE_DIR, _INDEX_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp, path)
+
+
+def cache_key(file_path: str) -> str:
+    """Content hash of file_path, re-hashing only when its size or mtime changed."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    st = os.stat(file_path)
+    abs_path = os.path.abspath(file_path)
+    index = _load_index()
+    known = index.get(abs_path)
+    if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+        return known["hash"]
+
+    key = _file_hash(file_path)
+    index[abs_path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": key}
+    _save_index(index)
+    return key
+
+
+def _entry_path(key: str):
+    """Existing data file for key (parquet preferred), or None."""
+    for ext in _DATA_EXTENSIONS:
+        path = os.path.join(CACHE_DIR, key + ext)
+        try:
+            os.utime(path)  # mark as recently used for eviction
+        except FileNotFoundError:
+            continue
+        return path
+    return None
+
+
+def evict(max_age_days: float = None, max_mb: float = None):
+    """Drop entries older than max_age_days, then least recently used ones until under max_mb."""
+    max_age_days = CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    max_mb = CACHE_MAX_MB if max_mb is None else max_mb
+    if not os.path.isdir(CACHE_DIR):
+        return
+
+    entries = []
+    now = time.time()
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(_DATA_EXTENSIONS):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:  # evicted by another worker meanwhile
+            continue
+        if now - st.st_mtime > max_age_days * 86400:
+            _remove(path)
+        else:
+            entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_mb * 1024 * 1024:
+            break
+        _remove(path)
+        total -= size
+
+
+def _remove(path: str):
+    """Delete a cache file; already gone, or open in another process on Windows, is fine."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _store(key: str, df: pd.DataFrame):
+    """Write df as Parquet, or as pickle if Parquet cannot hold it."""
+    path = os.path.join(CACHE_DIR, key + ".parquet")
+    try:
+        df.to_parquet(path, index=False)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        df.to_pickle(os.path.join(CACHE_DIR, key + ".pkl"))
+    evict()
+
+
+def read_excel_cached(file_path: str) -> pd.DataFrame:
+    """
+    pd.read_excel(file_path) with stripped column names, served from the cache
+    when this exact file content was parsed before.
+    CSV and Parquet files are read with table_readers.read_table instead.
+    """
+    if is_table_file(file_path):
+        return read_table(file_path)
+    if not CACHE_ENABLED:
+        df = pd.read_excel(file_path)
+        df.columns = df.columns.str.strip()
+        return df
+
+    key = cache_key(file_path)
+    path = _entry_path(key)
+    if path:
+        try:
+            return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_pickle(path)
+        except FileNotFoundError:
+            pass  # evicted since _entry_path: parse again
+
+    df = pd.read_excel(file_path)
+    df.columns = df.columns.str.strip()
+    _store(key, df)
+    return df
+
+
+def iter_chunks_cached(file_path: str, chunk_size: int = STREAM_CHUNK_ROWS):
+    """
+    iter_excel_chunks(file_path, chunk_size) backed by the cache.
+    - Hit (Parquet): batches are streamed back from the Parquet file
+    - Miss: chunks are written through to Parquet as they are read; the entry is
+      only committed if the whole file was read and every chunk fit one schema
+    Pickle entries are not used here because they cannot be read in chunks.
+    CSV and Parquet files are streamed with table_readers.iter_table_chunks instead.
+    """
+    if is_table_file(file_path):
+        yield from iter_table_chunks(file_path, chunk_size)
+        return
+    if not CACHE_ENABLED:
+        yield from iter_excel_chunks(file_path, chunk_size)
+        return
+
+    key = cache_key(file_path) + _STREAM_SUFFIX
+    path = _entry_path(key)
+    parquet_file = None
+    if path and path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        try:
+            parquet_file = pq.ParquetFile(path)
+        except FileNotFoundError:
+            pass  # evicted since _entry_path: read the workbook again
+    if parquet_file is not None:
+        yielded = False
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yielded = True
+            yield batch.to_pandas()
+        if not yielded:
+            yield parquet_file.schema_arrow.empty_table().to_pandas()
+        return
+
+    final_path = os.path.join(CACHE_DIR, key + ".parquet")
+    tmp_path = f"{final_path}.{uuid.uuid4().hex}.tmp"
+    writer = None
+    caching = True
+    completed = False
+    try:
+        for chunk in iter_excel_chunks(file_path, chunk_size):
+            if caching:
+                try:
+                    import pyarrow as pa
+                    import pyarrow.parquet as pq
+
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp_path, table.schema)
+                    writer.write_table(table)
+                except Exception:
+                    # e.g. no pyarrow, mixed-type column, or a schema change between chunks
+                    caching = False
+            yield chunk
+        completed = True
+    finally:
+        if writer is not None:
+            writer.close()
+            if caching and completed:
+                os.replace(tmp_path, final_path)
+                evict()
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,234 @@
+# run_report.py
+# Per-stage timing and memory instrumentation with a JSON run report.
+# Shared by the FilterExcel scripts and ReceiptConverter\receipts_to_word.py.
+#
+#   report = start_run("FilterExcel_multiBU", input=file_path)
+#   with stage("read"):
+#       ...
+#   with stage("write", sheet="GBI"):     # repeated stages are accumulated
+#       ...
+#   finish_run(output_path)               # writes <output>.report.json
+#
+# Each stage records wall time, CPU time, call count, how much the process
+# memory (RSS) grew or shrank over the stage, and the process high-water mark
+# when the stage raised it. With REPORT_TRACE_MEMORY it also records the peak
+# Python allocation inside the stage (tracemalloc; nested stages count towards
+# the enclosing one too) and dumps the top allocation sites. With REPORT_PROFILE a cProfile dump of the whole run is
+# written next to the report.
+# stage() is a no-op when no run is active, so library code can always call it.
+
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# -------- CONFIG --------
+REPORT_ENABLED = True
+REPORT_PROFILE = os.environ.get("RUN_REPORT_PROFILE") == "1"            # write <output>.prof
+REPORT_TRACE_MEMORY = os.environ.get("RUN_REPORT_TRACE_MEMORY") == "1"  # tracemalloc per stage (slower)
+
+_current = None
+_startup = {}
+
+
+def rss_mb():
+    """Current process memory (resident set) in MB, or None if it cannot be measured here."""
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().rss / 2**20, 1)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:  # Linux: pages
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_mb():
+    """Process memory high-water mark in MB, or None if it cannot be measured here."""
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        peak = getattr(info, "peak_wset", None)  # Windows
+        if peak is not None:
+            return round(peak / 2**20, 1)
+    except ImportError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KB on Linux, bytes on macOS
+        return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+    except ImportError:
+        return None
+
+
+class RunReport:
+    """Collects stage measurements for one run; see the module header for usage."""
+
+    def __init__(self, name, **info):
+        self.name = name
+        self.info = dict(info)
+        self.stages = {}
+        self.started = time.perf_counter()
+        self.started_cpu = time.process_time()
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.profiler = None
+        self._py_peaks = []  # tracemalloc peak of each open stage from before its nested stage reset it
+
+        if REPORT_TRACE_MEMORY:
+            import tracemalloc
+            tracemalloc.start()
+        if REPORT_PROFILE:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    @contextmanager
+    def stage(self, name, **details):
+        tracing = REPORT_TRACE_MEMORY
+        if tracing:
+            import tracemalloc
+            if self._py_peaks:
+                # reset_peak() below would lose the enclosing stage's peak so far
+                self._py_peaks[-1] = max(self._py_peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._py_peaks.append(0)
+        rss_before, peak_before = rss_mb(), peak_rss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0})
+            entry["calls"] += 1
+            entry["wall_s"] += time.perf_counter() - wall
+            entry["cpu_s"] += time.process_time() - cpu
+            rss_after, peak_after = rss_mb(), peak_rss_mb()
+            if rss_before is not None and rss_after is not None:
+                entry["rss_delta_mb"] = round(entry.get("rss_delta_mb", 0.0) + rss_after - rss_before, 1)
+            if peak_after is not None and peak_before is not None and peak_after > peak_before:
+                # The process high-water mark was reached inside this stage
+                entry["peak_rss_mb"] = max(entry.get("peak_rss_mb", 0.0), peak_after)
+            if tracing:
+                py_peak = max(self._py_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._py_peaks:
+                    self._py_peaks[-1] = max(self._py_peaks[-1], py_peak)
+                entry["py_peak_mb"] = round(max(entry.get("py_peak_mb", 0.0), py_peak / 2**20), 1)
+            for key, value in details.items():
+                entry[key] = value
+
+    def to_dict(self):
+        stages = {}
+        for name, entry in self.stages.items():
+            entry = dict(entry)
+            entry["wall_s"] = round(entry["wall_s"], 4)
+            entry["cpu_s"] = round(entry["cpu_s"], 4)
+            stages[name] = entry
+        return {
+            "run": self.name,
+            "started_at": self.started_at,
+            "wall_s": round(time.perf_counter() - self.started, 4),
+            "cpu_s": round(time.process_time() - self.started_cpu, 4),
+            "peak_rss_mb": peak_rss_mb(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "info": self.info,
+            "stages": stages,
+        }
+
+    def write(self, output_path):
+        """Write <output_path>.report.json (plus .prof / .tracemalloc.txt when enabled); returns the JSON path."""
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(f"{output_path}.prof")
+        if REPORT_TRACE_MEMORY:
+            import tracemalloc
+            top = tracemalloc.take_snapshot().statistics("lineno")[:25]
+            with open(f"{output_path}.tracemalloc.txt", "w", encoding="utf-8") as f:
+                f.write("\n".join(str(stat) for stat in top))
+            tracemalloc.stop()
+
+        report_path = f"{output_path}.report.json"
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        return report_path
+
+
+def start_run(name, **info):
+    """Start collecting for a new run (replaces any previous one); returns the report."""
+    global _current
+    _current = RunReport(name, **info) if REPORT_ENABLED else None
+    if _current is not None and _startup:
+        _current.info["startup"] = dict(_startup)
+    return _current
+
+
+def seconds_since_launch():
+    """
+    Seconds since the program was launched, or None if it cannot be measured here
+    (needs psutil). For a one-file PyInstaller exe this includes the bootloader
+    unpacking the bundle, which runs in a parent process.
+    """
+    try:
+        import psutil
+    except ImportError:
+        return None
+    process = psutil.Process()
+    if getattr(sys, "frozen", False) and os.path.basename(getattr(sys, "_MEIPASS", "")).startswith("_MEI"):
+        parent = process.parent()
+        if parent is not None and parent.exe() == process.exe():
+            process = parent
+    return round(time.time() - process.create_time(), 3)
+
+
+def note_startup(**info):
+    """Record process startup measurements (import times, ...); added to every report started afterwards."""
+    _startup.update(info)
+
+
+def current_run():
+    return _current
+
+
+def stage(name, **details):
+    """Time a stage of the current run; does nothing when no run is active."""
+    if _current is None:
+        return _nullstage()
+    return _current.stage(name, **details)
+
+
+@contextmanager
+def _nullstage():
+    yield
+
+
+def record(**info):
+    """Add facts about the current run (row counts, settings, ...) to its report."""
+    if _current is not None:
+        _current.info.update(info)
+
+
+def timed_iter(iterable, name):
+    """Yield from iterable, charging the time spent producing each item to stage name."""
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def finish_run(output_path, **info):
+    """Write the current run's report next to output_path; returns the report path (or None)."""
+    global _current
+    report, _current = _current, None
+    if report is None:
+        return None
+    report.info.update(info)
+    return report.write(output_path)
@@ -0,0 +1,190 @@
+# table_readers.py
+# CSV and Parquet inputs for the FilterExcel scripts, next to .xlsx/.xls.
+# Both feed the same filter/dedup/remainder pipeline as a workbook would: one
+# DataFrame (read_table) or fixed-size chunks (iter_table_chunks), with column
+# names cleaned the way pd.read_excel + strip does (see excel_stream._header_names).
+# - CSV is parsed with pyarrow's multi-threaded reader when available, else
+#   pandas' C parser. Every column is read as text, then a column becomes int or
+#   float only if all its values convert, like pandas does (dates stay text).
+#   Streamed reads decide the column types over the whole file first (one extra
+#   pass), so every chunk gets the same types as a whole-file read.
+# - Parquet is read as stored; streaming goes batch by batch
+# These formats parse fast already, so they bypass the input cache.
+
+import csv
+import os
+
+import pandas as pd
+
+from excel_stream import _header_names, STREAM_CHUNK_ROWS
+
+# -------- CONFIG --------
+CSV_ENCODING = "utf-8"
+CSV_DELIMITER = ","
+
+TABLE_EXTENSIONS = (".csv", ".parquet")
+
+
+def is_table_file(file_path: str) -> bool:
+    return os.path.splitext(file_path)[1].lower() in TABLE_EXTENSIONS
+
+
+def _csv_header(file_path: str) -> list:
+    """Column names of a CSV file, cleaned like the Excel readers do."""
+    encoding = "utf-8-sig" if CSV_ENCODING.lower().replace("_", "-") in ("utf-8", "utf8") else CSV_ENCODING
+    with open(file_path, newline="", encoding=encoding) as f:
+        raw_header = next(csv.reader(f, delimiter=CSV_DELIMITER), [])
+    return _header_names([name if name.strip() else None for name in raw_header])
+
+
+def _arrow_csv_options(columns):
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    read_options = pa_csv.ReadOptions(column_names=columns, skip_rows=1, encoding=CSV_ENCODING)
+    parse_options = pa_csv.ParseOptions(delimiter=CSV_DELIMITER)
+    convert_options = pa_csv.ConvertOptions(column_types={name: pa.string() for name in columns},
+                                            strings_can_be_null=True)
+    return read_options, parse_options, convert_options
+
+
+def _convertible_types(column, targets):
+    """The targets every value of a text column converts to."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    kept = []
+    for target in targets:
+        try:
+            pc.cast(column, target)
+            kept.append(target)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            continue
+    return kept
+
+
+def _numeric_columns(table, types=None):
+    """
+    Text columns that convert cleanly become int64, then float64; others stay text.
+    types: per column, the type to use (None = text) instead of deciding from this table.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if types is None:
+        types = [(_convertible_types(column, [pa.int64(), pa.float64()]) or [None])[0] for column in table.columns]
+    columns = [pc.cast(column, target) if target is not None else column
+               for column, target in zip(table.columns, types)]
+    return pa.Table.from_arrays(columns, names=table.column_names)
+
+
+def _arrow_csv_types(file_path, columns):
+    """Per column, the type _numeric_columns would pick for the whole file; read batch by batch."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    candidates = [[pa.int64(), pa.float64()] for _ in columns]
+    for batch in pa_csv.open_csv(file_path, *_arrow_csv_options(columns)):
+        candidates = [_convertible_types(column, targets) if targets else targets
+                      for column, targets in zip(batch.columns, candidates)]
+    return [targets[0] if targets else None for targets in candidates]
+
+
+def _pandas_csv_dtypes(file_path, columns, chunk_size):
+    """{column: dtype} pandas infers per chunk, merged over the whole file (int + float -> float, else text)."""
+    seen = {name: set() for name in columns}
+    for chunk in pd.read_csv(file_path, names=columns, header=0, sep=CSV_DELIMITER,
+                             encoding=CSV_ENCODING, chunksize=chunk_size):
+        for name in columns:
+            seen[name].add(chunk[name].dtype)
+    dtypes = {}
+    for name, kinds in seen.items():
+        if len(kinds) <= 1:
+            continue  # one type throughout (or no rows): pandas infers it the same way per chunk
+        numeric = all(pd.api.types.is_numeric_dtype(k) and not pd.api.types.is_bool_dtype(k) for k in kinds)
+        dtypes[name] = "float64" if numeric else str
+    return dtypes
+
+
+def _have_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def read_table(file_path: str) -> pd.DataFrame:
+    """Whole CSV/Parquet file as one DataFrame with cleaned column names."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".parquet":
+        df = pd.read_parquet(file_path)
+        df.columns = _header_names(list(df.columns))
+        return df
+
+    columns = _csv_header(file_path)
+    if not _have_pyarrow():
+        return pd.read_csv(file_path, names=columns, header=0, sep=CSV_DELIMITER, encoding=CSV_ENCODING)
+
+    import pyarrow.csv as pa_csv
+
+    table = pa_csv.read_csv(file_path, *_arrow_csv_options(columns))
+    return _numeric_columns(table).to_pandas()
+
+
+def iter_table_chunks(file_path: str, chunk_size: int = STREAM_CHUNK_ROWS):
+    """
+    Yield a CSV/Parquet file as DataFrames of up to chunk_size rows.
+    Like excel_stream.iter_excel_chunks, at least one (possibly empty) chunk is yielded.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(file_path)
+        columns = _header_names(parquet_file.schema_arrow.names)
+        yielded = False
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            chunk = batch.to_pandas()
+            chunk.columns = columns
+            yielded = True
+            yield chunk
+        if not yielded:
+            chunk = parquet_file.schema_arrow.empty_table().to_pandas()
+            chunk.columns = columns
+            yield chunk
+        return
+
+    columns = _csv_header(file_path)
+    if not _have_pyarrow():
+        dtypes = _pandas_csv_dtypes(file_path, columns, chunk_size)
+        yielded = False
+        for chunk in pd.read_csv(file_path, names=columns, header=0, sep=CSV_DELIMITER,
+                                 encoding=CSV_ENCODING, chunksize=chunk_size, dtype=dtypes):
+            yielded = True
+            yield chunk
+        if not yielded:
+            yield pd.DataFrame(columns=columns)
+        return
+
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    types = _arrow_csv_types(file_path, columns)
+    read_options, parse_options, convert_options = _arrow_csv_options(columns)
+    reader = pa_csv.open_csv(file_path, read_options, parse_options, convert_options)
+    pending, n_pending = [], 0
+    yielded = False
+    # Arrow hands out blocks of whatever size; regroup them into chunk_size rows
+    for batch in reader:
+        pending.append(batch)
+        n_pending += batch.num_rows
+        while n_pending >= chunk_size:
+            table = pa.Table.from_batches(pending)
+            yield _numeric_columns(table.slice(0, chunk_size), types).to_pandas()
+            yielded = True
+            rest = table.slice(chunk_size)
+            pending, n_pending = rest.to_batches(), rest.num_rows
+    if n_pending or not yielded:
+        table = pa.Table.from_batches(pending, schema=reader.schema)
+        yield _numeric_columns(table, types).to_pandas()
@@ -0,0 +1,44 @@
+# test_batch_filter.py
+# batch_filter.run_batch: one output per input, and one failed file never fails the batch.
+
+import os
+
+import pandas as pd
+
+import batch_filter
+
+
+def _export(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pd.DataFrame({"Email": ["a@mccoy.com", "b@example.com"], "BU Code": ["662", "105"]}).to_csv(path, index=False)
+    return str(path)
+
+
+def _die(*args, **kwargs):
+    os._exit(1)  # a worker killed mid-file, e.g. by running out of memory
+
+
+def test_same_named_inputs_keep_their_subfolders(tmp_path):
+    first = _export(tmp_path / "exports" / "a" / "export.csv")
+    second = _export(tmp_path / "exports" / "b" / "export.csv")
+    out = tmp_path / "out"
+    inputs = batch_filter.collect_inputs([str(tmp_path / "exports")], recursive=True)
+    assert batch_filter.output_dirs_for(inputs, str(out)) == {first: str(out / "a"), second: str(out / "b")}
+
+    results = batch_filter.run_batch(inputs, workers=1, output_dir=str(out))
+    assert [r["ok"] for r in results] == [True, True]
+    assert [os.path.dirname(r["output"]) for r in results] == [str(out / "a"), str(out / "b")]
+
+
+def test_one_folder_writes_straight_into_output_dir(tmp_path):
+    inputs = [_export(tmp_path / "x.csv"), _export(tmp_path / "y.csv")]
+    assert set(batch_filter.output_dirs_for(inputs, "out").values()) == {"out"}
+
+
+def test_dead_worker_fails_its_files_only(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_filter, "run_one", _die)
+    inputs = [_export(tmp_path / "x.csv"), _export(tmp_path / "y.csv")]
+    results = batch_filter.run_batch(inputs, workers=1)
+    assert [r["input"] for r in results] == inputs
+    assert not any(r["ok"] for r in results)
+    assert all(r["error"].startswith("BrokenProcessPool") for r in results)
@@ -0,0 +1,44 @@
+# test_duplicates.py
+# Duplicate highlighting in FilterExcel_multiBU.
+
+import json
+
+import pandas as pd
+import pytest
+
+import excel_writers
+import input_cache
+import FilterExcel_multiBU as bu
+
+
+def test_cross_sheet_row_on_two_sheets_is_not_its_own_duplicate(tmp_path, monkeypatch):
+    monkeypatch.setattr(input_cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(excel_writers, "OUTPUT_ENGINE", "xlsxwriter")
+    monkeypatch.setattr(bu, "CROSS_SHEET_DUPLICATES", True)
+    rules = tmp_path / "filter_rules.json"
+    rules.write_text(json.dumps({"ByEmail": [{"email": "mccoy"}], "ByOffice": [{"office": "105"}]}))
+    export = tmp_path / "export.xlsx"
+    pd.DataFrame({
+        "Name": ["Ann Lee", "Bob Ray", "Bob Ray"],
+        "Email": ["ann@mccoy.com", "bob@mccoy.com", "bob@example.com"],
+        "BU Code": [105, 1, 105],
+    }).to_excel(export, index=False)
+
+    result = bu.process_file(str(export), str(tmp_path), rules_file=str(rules))
+    # Ann is on both sheets from one input row; Bob has two input rows
+    assert result["duplicates"] == {"ByEmail": 1, "ByOffice": 1}
+
+
+NAMES = ["  José  Núñez ", "JOSÉ NÚÑEZ", "jose  nunez.", "Ἀθηνᾶ", "ΟΔΟΣ", "İstanbul", "a\u00a0b", "x\x1cy",
+         "ﬁ ligature", "Ö'Brien-Smith", "a \u0301 b", "Ǻ", "\u3000z\u3000", "ᄀ'ᅡ", "e'\u0301", "nan", "",
+         "  ", "...", "ǅ", "Søren", "Łukasz", "O\u2028Neil"]
+
+
+@pytest.mark.parametrize("strip_diacritics", [True, False])
+@pytest.mark.parametrize("ignore_punctuation", [True, False])
+def test_normalize_names_matches_normalize_name(monkeypatch, strip_diacritics, ignore_punctuation):
+    monkeypatch.setattr(bu, "STRIP_DIACRITICS", strip_diacritics)
+    monkeypatch.setattr(bu, "IGNORE_PUNCTUATION", ignore_punctuation)
+    monkeypatch.setattr(bu, "_normalized_name_cache", {})
+    names = pd.Series(NAMES * 2, dtype="str")
+    assert bu.normalize_names(names).tolist() == [bu.normalize_name(name) for name in NAMES * 2]
@@ -0,0 +1,35 @@
+# test_excel_stream.py
+# Streamed .xlsx reads must match pd.read_excel on the whole sheet, whatever the chunk size.
+
+import pandas as pd
+import pytest
+
+import excel_stream
+from excel_stream import iter_excel_chunks
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = tmp_path / "export.xlsx"
+    pd.DataFrame({
+        "Email": ["a@mccoy.com", "b@x.com", "c@x.com", "d@x.com", "e@x.com", None],
+        "BU Code": [None, None, 662, 105, None, 818],           # first chunk all blank
+        "Office": ["502", "17", "9", "A12", "N/A", "4"],        # numeric text, then text
+        "Amount": [10, 20, 2.5, 40, 50, 60],
+        "Mixed": [662, "abc", "502", None, 1, 2],
+    }, dtype=object).to_excel(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 4, 100])
+def test_streamed_xlsx_matches_read_excel(export, chunk_size):
+    whole = pd.read_excel(export)
+    chunks = list(iter_excel_chunks(export, chunk_size))
+    assert [c.dtypes.tolist() for c in chunks] == [whole.dtypes.tolist()] * len(chunks)
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), whole)
+
+
+def test_per_chunk_types_without_whole_sheet_pass(export, monkeypatch):
+    monkeypatch.setattr(excel_stream, "STREAM_WHOLE_SHEET_TYPES", False)
+    first, *_ = iter_excel_chunks(export, 2)
+    pd.testing.assert_frame_equal(first, pd.read_excel(export, nrows=2))
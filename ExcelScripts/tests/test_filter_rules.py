@@ -0,0 +1,28 @@
+# test_filter_rules.py
+# Rule files (filter_rules.py) compiled into the matcher (filter_matcher.py).
+
+import pandas as pd
+import pytest
+
+import input_cache
+from filter_matcher import membership_matrix
+from filter_rules import load_rules
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(input_cache, "CACHE_ENABLED", False)
+
+
+def test_numeric_rule_values_match_as_text(tmp_path):
+    pytest.importorskip("yaml")
+    path = tmp_path / "filter_rules.yaml"
+    path.write_text("GBI:\n  - office: 105\nNumbers:\n  - email: 42\n", encoding="utf-8")
+    compiled = load_rules(str(path))
+
+    df = pd.DataFrame({
+        "Email": ["a@gil-bar.com", "user42@example.com", "b@example.com"],
+        "BU Code": [105.0, 662.0, 1050.0],
+    })
+    matrix = membership_matrix(df, compiled, "Email", "BU Code")
+    assert matrix.tolist() == [[True, False], [False, True], [True, False]]
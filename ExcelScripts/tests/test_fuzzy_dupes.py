@@ -0,0 +1,29 @@
+# test_fuzzy_dupes.py
+# Near-duplicate clustering must keep finding typos as the name list grows.
+
+import random
+
+from fuzzy_dupes import FUZZY_MAX_BLOCK, FUZZY_MIN_SHARED, _qgrams, cluster_keys
+
+
+def _word(rnd):
+    return "".join(rnd.choice("bcdfghjklmnpqrstvwxz") + rnd.choice("aeiou") for _ in range(rnd.randint(3, 4)))
+
+
+def test_typo_found_among_common_names():
+    # 250 first names x 250 surnames: nearly every q-gram of "john smith" is shared
+    # by more than FUZZY_MAX_BLOCK keys, as in a large export full of common names
+    rnd = random.Random(7)
+    firsts = sorted({_word(rnd) for _ in range(400)})[:249] + ["john"]
+    lasts = sorted({_word(rnd) for _ in range(400)})[:249] + ["smith"]
+    counts = {f"{first} {last}": 1 for first in firsts for last in lasts}
+    counts["john smith"] = 5
+    counts["jon smith"] = 1
+    all_grams = [_qgrams(key, 3) for key in counts]
+    shared = _qgrams("john smith", 3) & _qgrams("jon smith", 3)
+    informative = [gram for gram in shared if sum(gram in grams for grams in all_grams) <= FUZZY_MAX_BLOCK]
+    assert len(informative) < FUZZY_MIN_SHARED  # q-gram blocking alone cannot pair them
+
+    canonical = cluster_keys(counts)
+    assert canonical["jon smith"] == "john smith"
+    assert canonical["john smith"] == "john smith"
@@ -0,0 +1,42 @@
+# test_incremental.py
+# Incremental re-runs (FilterExcel_multiBU.INCREMENTAL) must produce valid workbooks.
+
+import datetime
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import excel_writers
+import input_cache
+import FilterExcel_multiBU as bu
+
+
+@pytest.fixture
+def export(tmp_path, monkeypatch):
+    monkeypatch.setattr(input_cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(excel_writers, "OUTPUT_ENGINE", "xlsxwriter")
+    n = 300
+    df = pd.DataFrame({
+        "ID": range(1, n + 1),
+        "Email": [f"user{i}@{'mccoy.com' if i % 3 else 'example.com'}" for i in range(n)],
+        "BU Code": [105 if i % 2 else 662 for i in range(n)],
+        "Date": [datetime.datetime(2025, 1, 1) + datetime.timedelta(days=i) for i in range(n)],
+        "Amount": [i * 1.5 for i in range(n)],
+    })
+    path = tmp_path / "export.xlsx"
+    df.to_excel(path, index=False)
+    return path
+
+
+def _values(path):
+    wb = openpyxl.load_workbook(path)
+    return {ws.title: [tuple(c.value for c in row) for row in ws.iter_rows()] for ws in wb}
+
+
+def test_rerun_on_unchanged_export_opens(export, tmp_path):
+    first = bu.process_file(str(export), str(tmp_path), incremental=True)
+    second = bu.process_file(str(export), str(tmp_path), incremental=True)
+    assert second["changes"]["reused_rows"]  # every row came from the first output
+    # Re-used date cells keep their style index: the workbook must still load
+    assert _values(second["output"]) == _values(first["output"])
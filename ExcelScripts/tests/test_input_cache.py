@@ -0,0 +1,55 @@
+# test_input_cache.py
+# Cached reads (input_cache.py) must return what the uncached reads return.
+
+import os
+
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+import input_cache
+from excel_stream import iter_excel_chunks
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(input_cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(input_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = tmp_path / "export.xlsx"
+    pd.DataFrame({"Email": ["a@mccoy.com", "b@x.com", "c@x.com"], "BU Code": [None, None, 662]}).to_excel(
+        path, index=False)
+    return str(path)
+
+
+def _uncached_read(path):
+    df = pd.read_excel(path)
+    df.columns = df.columns.str.strip()
+    return df
+
+
+@pytest.mark.parametrize("first", ["stream", "whole"])
+def test_streamed_and_whole_file_entries_do_not_mix(cache, export, first):
+    def stream():
+        return pd.concat(list(input_cache.iter_chunks_cached(export, 2)), ignore_index=True)
+
+    expected_stream = pd.concat(list(iter_excel_chunks(export, 2)), ignore_index=True)
+    reads = [stream, lambda: input_cache.read_excel_cached(export)]
+    for _ in range(2):  # miss, then hit
+        for read in reads if first == "stream" else reversed(reads):
+            expected = expected_stream if read is stream else _uncached_read(export)
+            tm.assert_frame_equal(read(), expected)
+
+
+def test_evict_skips_entries_removed_meanwhile(cache, monkeypatch):
+    os.makedirs(cache)
+    (cache / "kept.parquet").write_bytes(b"x" * 10)
+    listdir = os.listdir
+    monkeypatch.setattr(input_cache.os, "listdir", lambda path: listdir(path) + ["gone.parquet"])
+    input_cache.evict(max_mb=0)
+    assert not (cache / "kept.parquet").exists()
+    assert input_cache._entry_path("gone") is None
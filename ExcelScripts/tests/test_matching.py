@@ -0,0 +1,55 @@
+# test_matching.py
+# email / office filters are literal substrings in every script.
+
+import pandas as pd
+import pytest
+
+from filter_matcher import compile_filters, membership_matrix
+from FilterExcel import build_mask, resolve_columns
+
+DF = pd.DataFrame({
+    "Email": ["a.b@x.com", "axb@x.com", "c@(us).com", None],
+    "BU Code": ["1+05", "105", "662", "818"],
+})
+
+
+def test_build_mask_is_literal():
+    assert build_mask(DF, "Email", "BU Code", "a.b", "1+05").tolist() == [True, False, False, False]
+    assert build_mask(DF, "Email", "BU Code", "(us)", "zzz").tolist() == [False, False, True, False]
+
+
+def test_resolve_columns_raises_instead_of_exiting():
+    assert resolve_columns(["primary EMAIL", "Office"]) == ("primary EMAIL", "Office")
+    with pytest.raises(ValueError, match="office"):
+        resolve_columns(["Primary Email"])
+
+
+def test_membership_matrix_is_literal():
+    compiled = compile_filters({"Dots": [{"email": "a.b", "office": "1+05"}], "Parens": [{"email": "(us)"}]})
+    matrix = membership_matrix(DF, compiled, "Email", "BU Code")
+    assert matrix.tolist() == [[True, False], [False, False], [False, True], [False, False]]
+
+
+def test_automaton_matches_vector_scan(monkeypatch):
+    import filter_matcher
+
+    rules = {"A": [{"email": "x.com"}, {"office": "05"}], "B": [{"email": "a"}, {"email": "b@"}],
+             "C": [{"email": "(us)", "office": "8"}]}
+    expected = membership_matrix(DF, compile_filters(rules), "Email", "BU Code")
+    monkeypatch.setattr(filter_matcher, "VECTOR_SCAN_MAX_PATTERNS", 0)
+    matrix = membership_matrix(DF, compile_filters(rules), "Email", "BU Code")
+    assert matrix.tolist() == expected.tolist()
+    assert expected.tolist() == [[True, True, False], [True, True, False], [False, False, True], [False, False, True]]
+
+
+def test_compacted_frame_matches_the_same_rows():
+    from compact_dtypes import compact_frame
+    from excel_stream import iter_frame_chunks
+
+    df = pd.concat([DF] * 500, ignore_index=True)
+    compacted = compact_frame(df)
+    assert isinstance(compacted["BU Code"].dtype, pd.CategoricalDtype)
+    compiled = compile_filters({"A": [{"email": "x.com", "office": "05"}], "B": [{"office": "8"}]})
+    for chunk, compact_chunk in zip(iter_frame_chunks(df, 300), iter_frame_chunks(compacted, 300)):
+        assert (membership_matrix(compact_chunk, compiled, "Email", "BU Code").tolist()
+                == membership_matrix(chunk, compiled, "Email", "BU Code").tolist())
@@ -0,0 +1,22 @@
+# test_run_report.py
+# Per-stage measurements in run_report.py.
+
+import run_report
+
+
+def test_nested_stage_keeps_outer_python_peak(monkeypatch):
+    monkeypatch.setattr(run_report, "REPORT_TRACE_MEMORY", True)
+    report = run_report.RunReport("test")
+    try:
+        with report.stage("outer"):
+            block = bytearray(20 * 2**20)
+            del block
+            with report.stage("inner"):
+                small = bytearray(2**20)
+                del small
+    finally:
+        import tracemalloc
+        tracemalloc.stop()
+    assert report.stages["outer"]["py_peak_mb"] >= 20
+    assert report.stages["inner"]["py_peak_mb"] < 20
+    assert "rss_delta_mb" in report.stages["outer"]
@@ -0,0 +1,26 @@
+# test_table_readers.py
+# Streamed CSV reads must match whole-file reads, whatever the chunk size.
+
+import pandas as pd
+import pytest
+
+import table_readers
+from table_readers import iter_table_chunks, read_table
+
+
+@pytest.fixture(params=[True, False], ids=["pyarrow", "pandas"])
+def reader(request, monkeypatch):
+    if request.param:
+        pytest.importorskip("pyarrow")
+    else:
+        monkeypatch.setattr(table_readers, "_have_pyarrow", lambda: False)
+
+
+def test_streamed_csv_types_match_whole_file(tmp_path, reader):
+    path = tmp_path / "export.csv"
+    # "Amount" is whole numbers in the first chunk only; "Code" turns to text in the last one
+    path.write_text("ID,Amount,Code\n1,10,105\n2,20,662\n3,2.5,818\n4,40,A12\n", encoding="utf-8")
+    whole = read_table(str(path))
+    chunks = list(iter_table_chunks(str(path), chunk_size=2))
+    assert [c.dtypes.tolist() for c in chunks] == [whole.dtypes.tolist()] * 2
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), whole)
@@ -1,75 +1,335 @@
 import sys, os
-from docx import Document
-from docx.shared import Inches
-from pdf2image import convert_from_path
+import threading
+import time
+from io import BytesIO
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import Tk, filedialog, messagebox
+# run_report.py is shared with the FilterExcel scripts (..\ExcelScripts); PyInstaller
+# builds need --paths ..\ExcelScripts to find it
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "ExcelScripts"))
+from run_report import start_run, stage, finish_run, note_startup, seconds_since_launch
+from render_cache import RenderCache, CACHE_DIR_NAME, file_hash
 
-def main():
-    if getattr(sys, '_MEIPASS', False):
-        base_path = sys._MEIPASS
+# python-docx, pdf2image and Pillow take seconds to import (longer from a packaged
+# .exe), so they are loaded in the background while the folder dialog is open.
+HEAVY_IMPORTS = ["docx", "docx.shared", "pdf2image", "PIL.Image"]
+
+def _preload(import_times):
+    import importlib
+    for name in HEAVY_IMPORTS:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue  # reported by the real import in main()
+        import_times[name] = round(time.perf_counter() - started, 3)
+
+# --- Rasterization ---
+# PDFs are rendered by Poppler (pdftoppm) subprocesses, so a thread pool keeps
+# every core busy: each PDF is split into PAGES_PER_TASK page ranges and the
+# ranges of all files are rendered in parallel. Results are still added to the
+# document in sorted-filename / page order.
+# Memory: with STREAM_PAGES each worker holds one full-resolution bitmap at a
+# time and encodes it right away, so what waits for the document is at most
+# MAX_PENDING_TASKS * PAGES_PER_TASK compressed pages, however long the PDFs are.
+# DPI is only used with OPTIMIZE_IMAGES = False; otherwise pages are rendered
+# straight at the frame size (see render_options).
+DPI = 200
+WORKERS = os.cpu_count() or 4
+PAGES_PER_TASK = 4
+MAX_PENDING_TASKS = 2 * WORKERS  # rendered-but-not-yet-added ranges held in memory
+STREAM_PAGES = True  # one pdftoppm call per page; False renders a whole range in one call (faster, more memory)
+
+# --- Image optimization ---
+# Every page and photo is shown in the same 5.5" x 7" frame, so it only needs
+# FRAME_INCHES * TARGET_DPI pixels; anything larger is resampled down before it is
+# stored (the frame stretches both sides, so each side is sized separately).
+# PDF pages are rendered by pdftoppm at exactly that size, never larger first.
+# Images go to the document as in-memory JPEGs (no temp files in the user's
+# folder); PAGE_FORMAT / PAGE_SAVE_OPTIONS are the only encode settings.
+# Photos that already fit are stored as they are, without recompressing.
+OPTIMIZE_IMAGES = True
+FRAME_INCHES = (5.5, 7)
+TARGET_DPI = 150
+PAGE_FORMAT = "JPEG"
+PAGE_SAVE_OPTIONS = {"quality": 75, "optimize": True}
+
+# Identical files (by content hash) are rendered once and their pages re-used.
+# Encoding is deterministic and python-docx keeps one image part per SHA1, so
+# identical images are stored in the .docx only once.
+DEDUP_FILES = True
+
+# --- Incremental re-runs ---
+# Encoded pages are kept in Output\.render_cache (see render_cache.py), so a
+# re-run renders only new or changed files and takes the rest from the cache.
+# Set RECEIPTS_INCREMENTAL=0 (or INCREMENTAL = False) to render everything.
+INCREMENTAL = os.environ.get("RECEIPTS_INCREMENTAL", "1") != "0"
+
+# --- Poppler ---
+# None runs Poppler installed system-wide (on PATH, e.g. C:\poppler-25.07.0\Library\bin).
+# Set POPPLER_PATH = BUNDLED_POPPLER_PATH to use the Poppler bundled next to the
+# script / inside the .exe (pyinstaller --add-data "...\poppler;poppler").
+BASE_PATH = getattr(sys, '_MEIPASS', None) or os.path.dirname(os.path.abspath(__file__))
+BUNDLED_POPPLER_PATH = os.path.join(BASE_PATH, "poppler", "Library", "bin")
+POPPLER_PATH = None
+
+def render_settings():
+    """Everything that changes the encoded pages (part of the cache key)."""
+    return (sorted(render_options().items()), OPTIMIZE_IMAGES, FRAME_INCHES, TARGET_DPI, PAGE_FORMAT,
+            sorted(PAGE_SAVE_OPTIONS.items()))
+
+def render_options():
+    """convert_from_path arguments: the frame size in pixels (OPTIMIZE_IMAGES), else DPI."""
+    if OPTIMIZE_IMAGES:
+        return {"size": frame_pixels(None)}
+    return {"dpi": DPI}
+
+def page_count(file_path):
+    from pdf2image import pdfinfo_from_path
+    return int(pdfinfo_from_path(file_path, poppler_path=POPPLER_PATH)["Pages"])
+
+def page_ranges(n_pages):
+    return [(first, min(first + PAGES_PER_TASK - 1, n_pages)) for first in range(1, n_pages + 1, PAGES_PER_TASK)]
+
+def frame_pixels(img):
+    """(width, height) in pixels the frame needs; swapped for photos rotated by EXIF."""
+    width, height = (round(inches * TARGET_DPI) for inches in FRAME_INCHES)
+    if img is not None and img.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+def encode_page(img, exif=None):
+    """The image, resampled to the frame (OPTIMIZE_IMAGES), as an in-memory file for doc.add_picture."""
+    from PIL import Image
+    if OPTIMIZE_IMAGES:
+        max_w, max_h = frame_pixels(img)
+        size = (min(img.width, max_w), min(img.height, max_h))
+        if size != img.size:
+            img = img.resize(size, Image.LANCZOS)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buf = BytesIO()
+    img.save(buf, PAGE_FORMAT, **PAGE_SAVE_OPTIONS, **({"exif": exif} if exif else {}))
+    buf.seek(0)
+    return buf
+
+def scan_file(file_path, cache=None):
+    """
+    (content hash, page count, cached) for a file. The page count is None for
+    images and for files whose pages are in the cache.
+    """
+    if cache is not None:
+        digest = cache.content_hash(file_path)
+        if cache.has(digest):
+            return digest, None, True
     else:
-        base_path = os.path.dirname(__file__)
+        digest = file_hash(file_path) if DEDUP_FILES else file_path
+    return digest, page_count(file_path) if file_path.lower().endswith(".pdf") else None, False
 
-    poppler_path = os.path.join(base_path, "poppler", "Library", "bin")
+def render_pages(file_path, first_page, last_page):
+    """Encoded pages first_page..last_page of a PDF (rendered and encoded in the worker)."""
+    from pdf2image import convert_from_path
+    step = 1 if STREAM_PAGES else last_page - first_page + 1
+    pages = []
+    for first in range(first_page, last_page + 1, step):
+        last = min(first + step - 1, last_page)
+        images = convert_from_path(file_path, first_page=first, last_page=last, poppler_path=POPPLER_PATH,
+                                   **render_options())
+        pages.extend(encode_page(img) for img in images)
+        del images  # release the bitmaps before rendering the next page
+    return pages
 
-    # Hide tkinter root window
-    Tk().withdraw()
+def load_image(file_path):
+    """A JPG as a one-page list: resampled to the frame, or the file itself if it already fits."""
+    from PIL import Image
+    with open(file_path, "rb") as f:
+        data = f.read()
+    if OPTIMIZE_IMAGES:
+        with Image.open(file_path) as img:
+            target = frame_pixels(img)
+            if img.width > target[0] or img.height > target[1]:
+                img.draft("RGB", target)  # let the JPEG decoder scale down first (much faster)
+                return [encode_page(img, exif=img.info.get("exif"))]
+    return [BytesIO(data)]
 
-    # Ask user for folder
-    folder_path = filedialog.askdirectory(title="Select Folder Containing PDFs and JPGs")
-    if not folder_path:
-        messagebox.showinfo("Cancelled", "No folder selected. Exiting.")
-        return
+def _try(func, *args):
+    """func(*args), or the exception it raised (for pool.map)."""
+    try:
+        return func(*args)
+    except Exception as e:
+        return e
+
+def ordered_results(pool, jobs, max_pending):
+    """
+    Submit func(*args) for every (func, args) job, at most max_pending ahead of
+    the consumer; yields the futures in job order.
+    """
+    pending = deque()
+    for func, args in jobs:
+        pending.append(pool.submit(func, *args))
+        if len(pending) >= max_pending:
+            yield pending.popleft()
+    while pending:
+        yield pending.popleft()
+
+SUPPORTED_EXTENSIONS = (".pdf", ".jpg", ".jpeg")
+OUTPUT_DIR_NAME = "Output"
+OUTPUT_NAME = "Combined_PDFs_and_Images.docx"
+
+def open_cache(folder_path):
+    return RenderCache(os.path.join(folder_path, OUTPUT_DIR_NAME, CACHE_DIR_NAME), render_settings())
+
+def combine_folder(folder_path, filenames, cache=None):
+    """
+    Build Output\\Combined_PDFs_and_Images.docx from filenames (relative to
+    folder_path, in document order). Returns the output path, or None if no
+    file could be added.
+    """
+    from docx import Document
+    from docx.shared import Inches
 
+    start_run("receipts_to_word", folder=folder_path)
     doc = Document()
     processed_files = 0
 
-    for filename in sorted(os.listdir(folder_path)):
-        lower = filename.lower()
-        file_path = os.path.join(folder_path, filename)
+    paths = [os.path.join(folder_path, f) for f in filenames]
+    duplicate_files = 0
+    if cache is None and INCREMENTAL:
+        cache = open_cache(folder_path)
+    hits_before = cache.hits if cache else 0
 
-        # --- Handle PDF files ---
-        if lower.endswith(".pdf"):
-            print(f"Processing PDF: {filename}")
-            doc.add_heading(filename, level=2)
-            try:
-                # Use the line below to use Poppler bundled in the same folder as script for .exe
-                #images = convert_from_path(file_path, dpi=200, poppler_path=poppler_path)
-                # Use this line to use Poppler installed system-wide C:\poppler-25.07.0\Library\bin\pdftoppm.exe
-                images = convert_from_path(file_path, dpi=200)
-                for page_num, img in enumerate(images, start=1):
-                    img_path = os.path.join(folder_path, f"temp_page_{page_num}.jpg")
-                    img.save(img_path, "JPEG")
-                    doc.add_picture(img_path, width=Inches(5.5), height=Inches(7))
-                    os.remove(img_path)
-            except Exception as e:
-                doc.add_paragraph(f"[Error processing {filename}: {e}]")
-            doc.add_page_break()
-            processed_files += 1
-
-        # --- Handle JPG/JPEG files ---
-        elif lower.endswith(".jpg") or lower.endswith(".jpeg"):
-            print(f"Adding Image: {filename}")
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        with stage("scan files"):
+            scanned = dict(zip(paths, pool.map(_try, [scan_file] * len(paths), paths, [cache] * len(paths))))
+
+        # Per file: its render jobs, or the earlier file with the same content
+        jobs, same_as, first_with = {}, {}, {}
+        for path in paths:
+            if isinstance(scanned[path], Exception):
+                jobs[path] = []
+                continue
+            digest, n_pages, cached = scanned[path]
+            if digest in first_with:
+                same_as[path] = first_with[digest]
+                jobs[path] = []
+                continue
+            first_with[digest] = path
+            if cached:
+                jobs[path] = [(cache.get, (digest,))]
+            elif n_pages is None:
+                jobs[path] = [(load_image, (path,))]
+            else:
+                jobs[path] = [(render_pages, (path, first, last)) for first, last in page_ranges(n_pages)]
+        needed_again = set(same_as.values())
+        to_cache = {path for path in jobs if cache is not None and jobs[path] and not scanned[path][2]}
+        kept = {}
+        rendered = ordered_results(pool, (job for path in paths for job in jobs[path]), MAX_PENDING_TASKS)
+
+        for filename, file_path in zip(filenames, paths):
+            is_pdf = filename.lower().endswith(".pdf")
+            from_cache = not isinstance(scanned[file_path], Exception) and scanned[file_path][2]
+            keep = file_path in needed_again or file_path in to_cache
+            print(f"Processing PDF: {filename}" if is_pdf else f"Adding Image: {filename}")
             doc.add_heading(filename, level=2)
-            try:
-                doc.add_picture(file_path, width=Inches(5.5), height=Inches(7))
+            error = scanned[file_path] if isinstance(scanned[file_path], Exception) else None
+            if file_path in same_as:
+                duplicate_files += 1
+                pages, error = kept[same_as[file_path]]
+                with stage("duplicate: add pages"):
+                    for page in pages:
+                        doc.add_picture(BytesIO(page), width=Inches(5.5), height=Inches(7))
+            # Take every job of this file off the queue, even after an error
+            added = []
+            for _ in jobs[file_path]:
+                future = next(rendered)
+                if error is not None:
+                    future.cancel()
+                    continue
+                try:
+                    with stage("cache: load" if from_cache else "pdf: wait for render" if is_pdf else "image: wait for load"):
+                        pages = future.result()
+                    future = None  # the future holds its result: drop both once added
+                    while pages:
+                        page = pages.pop(0)
+                        if keep:
+                            added.append(page.getvalue())
+                        with stage("pdf: add page" if is_pdf else "image: add"):
+                            doc.add_picture(page, width=Inches(5.5), height=Inches(7))
+                except Exception as e:
+                    error = e
+            if file_path in needed_again:
+                kept[file_path] = (added, error)
+            if file_path in to_cache and error is None:
+                with stage("cache: store"):
+                    cache.put(scanned[file_path][0], added)
+
+            # --- Handle PDF files ---
+            if is_pdf:
+                if error is not None:
+                    doc.add_paragraph(f"[Error processing {filename}: {error}]")
+                doc.add_page_break()
+                processed_files += 1
+
+            # --- Handle JPG/JPEG files ---
+            elif error is not None:
+                doc.add_paragraph(f"[Error adding {filename}: {error}]")
+            else:
                 doc.add_page_break()
                 processed_files += 1
-            except Exception as e:
-                doc.add_paragraph(f"[Error adding {filename}: {e}]")
+
+    if cache is not None:
+        cache.save_index(keep_paths=paths)
+        cache.evict()
 
     # --- Save output ---
     if processed_files == 0:
-        messagebox.showwarning("No Files Found", "No PDFs or JPGs found in the selected folder.")
-        return
+        return None
 
-    output_folder = os.path.join(folder_path, "Output")
+    output_folder = os.path.join(folder_path, OUTPUT_DIR_NAME)
     os.makedirs(output_folder, exist_ok=True)
 
-    output_path = os.path.join(output_folder, "Combined_PDFs_and_Images.docx")
-    doc.save(output_path)
+    output_path = os.path.join(output_folder, OUTPUT_NAME)
+    # Save next to it and swap in, so the document is never seen half-written
+    tmp_path = os.path.join(output_folder, f"~{OUTPUT_NAME}.{os.getpid()}.tmp")
+    with stage("save"):
+        doc.save(tmp_path)
+        os.replace(tmp_path, output_path)
+    finish_run(output_path, files=processed_files, duplicate_files=duplicate_files,
+               cached_files=cache.hits - hits_before if cache else 0)
+    return output_path
+
+def main():
+    import_times = {}
+    preloader = threading.Thread(target=_preload, args=(import_times,), daemon=True)
+    preloader.start()
+
+    # Hide tkinter root window
+    Tk().withdraw()
+
+    # Ask user for folder
+    launch_to_dialog = seconds_since_launch()
+    folder_path = filedialog.askdirectory(title="Select Folder Containing PDFs and JPGs")
+    if not folder_path:
+        messagebox.showinfo("Cancelled", "No folder selected. Exiting.")
+        return
+
+    waited = time.perf_counter()
+    preloader.join()
+    note_startup(frozen=bool(getattr(sys, "frozen", False)), launch_to_dialog_s=launch_to_dialog,
+                 import_s=import_times, waited_for_imports_s=round(time.perf_counter() - waited, 3))
+    import pdf2image  # noqa: F401  (fail here rather than once per PDF)
+
+    filenames = [f for f in sorted(os.listdir(folder_path)) if f.lower().endswith(SUPPORTED_EXTENSIONS)]
+    output_path = combine_folder(folder_path, filenames)
+    if output_path is None:
+        messagebox.showwarning("No Files Found", "No PDFs or JPGs found in the selected folder.")
+        return
 
     messagebox.showinfo("Success ✅", f"Word document created:\n{output_path}")
 
 if __name__ == "__main__":
+    if "--watch" in sys.argv[1:]:
+        from watch_folders import main as watch_main
+        sys.exit(watch_main(sys.argv[1:]))
     main()
@@ -0,0 +1,130 @@
+# render_cache.py
+# Persistent cache of rendered pages for receipts_to_word.py.
+# Rendering PDFs is by far the slowest step, and users re-run the script on the
+# same folder every time a few receipts are added. Each file's encoded pages are
+# stored in <folder>\Output\.render_cache as one zip (pages in order), keyed by
+# the file's content hash plus the render settings (DPI, target size, JPEG
+# settings), so a re-run only renders new or changed files.
+# - A small index maps file path + size + mtime to the content hash, so unchanged files are not re-hashed
+# - Entries are written to a temp file and renamed, so an interrupted run never leaves a broken entry
+# - The least recently used entries are evicted until the cache fits in CACHE_MAX_MB
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+import zipfile
+from io import BytesIO
+
+# -------- CONFIG --------
+CACHE_DIR_NAME = ".render_cache"  # inside the Output folder
+CACHE_MAX_MB = 1024
+
+_INDEX_FILE = "index.json"
+_ENTRY_EXTENSION = ".zip"
+
+
+def file_hash(file_path):
+    """SHA1 of the file's bytes."""
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Encoded pages per file content, for one folder's Output directory."""
+
+    def __init__(self, cache_dir, settings):
+        self.cache_dir = cache_dir
+        # Pages rendered with other settings are different pages
+        self.tag = hashlib.sha1(repr(settings).encode()).hexdigest()[:8]
+        self.index = self._load_index()
+        self.hits = 0
+        self.stored = 0
+        self._lock = threading.Lock()  # watch mode renders and rebuilds from different threads
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, _INDEX_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_index(self, keep_paths=None):
+        """Write the index; with keep_paths, entries for other (deleted) files are dropped."""
+        with self._lock:
+            if keep_paths is not None:
+                keep = {os.path.abspath(p) for p in keep_paths}
+                self.index = {name: entry for name, entry in self.index.items() if name in keep}
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = os.path.join(self.cache_dir, _INDEX_FILE)
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.index, f)
+            os.replace(tmp, path)
+
+    def content_hash(self, file_path):
+        """Content hash of file_path, re-hashing only when its size or mtime changed."""
+        st = os.stat(file_path)
+        name = os.path.abspath(file_path)
+        with self._lock:
+            known = self.index.get(name)
+        if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+            return known["hash"]
+        digest = file_hash(file_path)
+        with self._lock:  # save_index may be replacing or writing the index meanwhile
+            self.index[name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest}
+        return digest
+
+    def _entry_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}-{self.tag}{_ENTRY_EXTENSION}")
+
+    def has(self, digest):
+        return os.path.exists(self._entry_path(digest))
+
+    def get(self, digest):
+        """The cached pages as in-memory files, in page order."""
+        path = self._entry_path(digest)
+        try:
+            with zipfile.ZipFile(path) as z:
+                pages = [BytesIO(z.read(name)) for name in sorted(z.namelist())]
+        except zipfile.BadZipFile:
+            os.remove(path)  # rendered again on the next run
+            raise
+        os.utime(path)  # mark as recently used for eviction
+        with self._lock:
+            self.hits += 1
+        return pages
+
+    def put(self, digest, pages):
+        """Store a file's encoded pages (a list of bytes)."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._entry_path(digest)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        # Pages are JPEGs already: store them without compressing again
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_STORED) as z:
+            for n, page in enumerate(pages, start=1):
+                z.writestr(f"{n:05d}", page)
+        os.replace(tmp, path)
+        with self._lock:
+            self.stored += 1
+
+    def evict(self, max_mb=None):
+        """Drop the least recently used entries until the cache is under max_mb."""
+        max_mb = CACHE_MAX_MB if max_mb is None else max_mb
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(_ENTRY_EXTENSION):
+                st = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((st.st_mtime, st.st_size, os.path.join(self.cache_dir, name)))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_mb * 1024 * 1024:
+                break
+            os.remove(path)
+            total -= size
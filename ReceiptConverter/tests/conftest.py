@@ -0,0 +1,8 @@
+# conftest.py
+# The scripts import each other by module name (they run from this folder),
+# so put ReceiptConverter on the path for the tests.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
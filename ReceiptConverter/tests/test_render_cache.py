@@ -0,0 +1,74 @@
+# test_render_cache.py
+# RenderCache: pages come back as stored, per content and render settings, and the cache stays bounded.
+
+import os
+import zipfile
+
+import pytest
+
+import render_cache
+from render_cache import RenderCache, file_hash
+
+PAGES = [b"page one", b"page two", b"page three"]
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / ".render_cache")
+
+
+def test_pages_come_back_in_order(cache_dir):
+    cache = RenderCache(cache_dir, ("dpi", 200))
+    assert not cache.has("abc")
+    cache.put("abc", PAGES)
+    assert cache.has("abc")
+    assert [page.getvalue() for page in cache.get("abc")] == PAGES
+    assert (cache.stored, cache.hits) == (1, 1)
+
+
+def test_other_settings_do_not_share_entries(cache_dir):
+    RenderCache(cache_dir, ("dpi", 200)).put("abc", PAGES)
+    assert not RenderCache(cache_dir, ("dpi", 150)).has("abc")
+    assert RenderCache(cache_dir, ("dpi", 200)).has("abc")
+
+
+def test_unchanged_files_are_not_hashed_again(cache_dir, tmp_path, monkeypatch):
+    receipt = str(tmp_path / "receipt.pdf")
+    with open(receipt, "wb") as f:
+        f.write(b"first")
+    cache = RenderCache(cache_dir, ())
+    first = cache.content_hash(receipt)
+    assert first == file_hash(receipt)
+    cache.save_index()
+
+    reopened = RenderCache(cache_dir, ())
+    monkeypatch.setattr(render_cache, "file_hash", lambda path: pytest.fail("hashed again"))
+    assert reopened.content_hash(receipt) == first
+    monkeypatch.undo()
+    with open(receipt, "ab") as f:
+        f.write(b" and second")
+    assert reopened.content_hash(receipt) == file_hash(receipt) != first
+
+    reopened.save_index(keep_paths=[])  # the receipt was deleted
+    assert RenderCache(cache_dir, ()).index == {}
+
+
+def test_broken_entry_is_dropped(cache_dir):
+    cache = RenderCache(cache_dir, ())
+    cache.put("abc", PAGES)
+    path = cache._entry_path("abc")
+    with open(path, "wb") as f:
+        f.write(b"not a zip")
+    with pytest.raises(zipfile.BadZipFile):
+        cache.get("abc")
+    assert not cache.has("abc")
+
+
+def test_evict_drops_least_recently_used(cache_dir):
+    cache = RenderCache(cache_dir, ())
+    for n, digest in enumerate(["old", "used", "new"]):
+        cache.put(digest, [b"x" * 400_000])
+        os.utime(cache._entry_path(digest), (n, n))
+    cache.get("old")  # used now: the most recent
+    cache.evict(max_mb=1)
+    assert [cache.has(d) for d in ["old", "used", "new"]] == [True, False, True]
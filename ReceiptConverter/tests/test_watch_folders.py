@@ -0,0 +1,58 @@
+# test_watch_folders.py
+# WatchedFolder.batch_due: when watch mode rebuilds the document.
+
+import time
+
+import pytest
+
+from watch_folders import WATCH_BATCH_FILES, WATCH_BATCH_SECONDS, WatchedFolder
+
+
+@pytest.fixture
+def folder(tmp_path):
+    return WatchedFolder(str(tmp_path))
+
+
+def _changed(folder, seconds_ago, ready=1, pending=0):
+    folder.built = True
+    folder.dirty_since = time.monotonic() - seconds_ago
+    folder.ready, folder.pending = ready, pending
+
+
+def test_first_build_waits_for_files_in_the_folder(folder):
+    folder.changing["a.pdf"] = ((1, 1), time.monotonic())
+    assert not folder.batch_due()
+    folder.changing.clear()
+    folder.pending = 1
+    assert not folder.batch_due()
+    folder.pending = 0
+    assert folder.batch_due()
+
+
+def test_nothing_changed_since_the_last_build(folder):
+    folder.built = True
+    assert not folder.batch_due()
+
+
+def test_batch_after_enough_files_or_enough_time(folder):
+    _changed(folder, 0, ready=WATCH_BATCH_FILES - 1)
+    assert not folder.batch_due()
+    _changed(folder, 0, ready=WATCH_BATCH_FILES)
+    assert folder.batch_due()
+    _changed(folder, WATCH_BATCH_SECONDS + 1)
+    assert folder.batch_due()
+
+
+def test_files_still_rendering_delay_the_batch_up_to_twice(folder):
+    _changed(folder, WATCH_BATCH_SECONDS + 1, ready=WATCH_BATCH_FILES, pending=1)
+    assert not folder.batch_due()
+    _changed(folder, 2 * WATCH_BATCH_SECONDS + 1, pending=1)
+    assert folder.batch_due()
+
+
+def test_rendered_marks_the_folder_dirty(folder):
+    folder.built, folder.pending = True, 1
+    folder.rendered()
+    assert (folder.ready, folder.pending) == (1, 0)
+    assert folder.dirty_since is not None
+    assert not folder.batch_due()  # within WATCH_BATCH_SECONDS of the change
@@ -0,0 +1,207 @@
+# watch_folders.py
+# Watch mode for receipts_to_word.py: keeps one or more folders (and their
+# subfolders) combined into <folder>\Output\Combined_PDFs_and_Images.docx
+# while receipts keep arriving, instead of re-running the whole conversion by hand.
+#
+#   python receipts_to_word.py --watch C:\Receipts\Inbox
+#   python receipts_to_word.py --watch C:\Receipts\TeamA C:\Receipts\TeamB
+#   (or: python watch_folders.py --watch C:\Receipts\Inbox)
+# Stop with Ctrl+C.
+#
+# - Folders are polled every WATCH_POLL_SECONDS (works on network shares, no extra packages)
+# - A new or changed PDF/JPG is picked up once its size and mtime have not changed
+#   for WATCH_SETTLE_SECONDS, so files still being copied are left alone
+# - Picked-up files are rendered into the folder's render cache by a background
+#   thread. At most WATCH_QUEUE_MAX files wait for it; the rest wait for a later poll
+# - The combined document is rebuilt from the cache in batches: once
+#   WATCH_BATCH_FILES files are ready, or WATCH_BATCH_SECONDS after the first change
+#   (waiting up to twice that for files still being rendered)
+# - Each rebuild writes its own run report next to the output
+
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import receipts_to_word as rtw
+
+# -------- CONFIG --------
+WATCH_POLL_SECONDS = 2
+WATCH_SETTLE_SECONDS = 5
+WATCH_BATCH_SECONDS = 60
+WATCH_BATCH_FILES = 25
+WATCH_QUEUE_MAX = 200
+
+
+def log(message):
+    print(f"{time.strftime('%H:%M:%S')} {message}", flush=True)
+
+
+def list_files(folder_path):
+    """{relative path: (size, mtime_ns)} of every PDF/JPG under folder_path, except the Output folder."""
+    found = {}
+    for root, dirs, files in os.walk(folder_path):
+        if root == folder_path:
+            dirs[:] = [d for d in dirs if d != rtw.OUTPUT_DIR_NAME]
+        for name in files:
+            if name.lower().endswith(rtw.SUPPORTED_EXTENSIONS) and not name.startswith("~"):
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue  # removed while listing
+                found[os.path.relpath(path, folder_path)] = (st.st_size, st.st_mtime_ns)
+    return found
+
+
+def prerender(cache, pool, file_path):
+    """Render file_path into the cache (pages in parallel), unless it is cached already."""
+    digest, n_pages, cached = rtw.scan_file(file_path, cache)
+    if cached:
+        return
+    if n_pages is None:
+        pages = rtw.load_image(file_path)
+    else:
+        futures = [pool.submit(rtw.render_pages, file_path, first, last)
+                   for first, last in rtw.page_ranges(n_pages)]
+        pages = [page for future in futures for page in future.result()]
+    cache.put(digest, [page.getvalue() for page in pages])
+
+
+class WatchedFolder:
+    """Poll / debounce / batch state of one watched folder."""
+
+    def __init__(self, folder_path):
+        self.folder_path = os.path.abspath(folder_path)
+        self.cache = rtw.open_cache(self.folder_path)
+        self.settled = {}     # relative path -> (size, mtime_ns) as last picked up
+        self.changing = {}    # relative path -> ((size, mtime_ns), first seen with it)
+        self.dirty_since = None
+        self.ready = 0        # rendered since the last rebuild
+        self.pending = 0      # queued, not rendered yet
+        self.built = False
+        self._lock = threading.Lock()  # ready / pending are updated by the render thread too
+
+    def poll(self, render_queue):
+        """Pick up files that have settled; returns the number queued for rendering."""
+        now = time.monotonic()
+        found = list_files(self.folder_path)
+        queued = 0
+
+        removed = [name for name in self.settled if name not in found]
+        for name in removed:
+            del self.settled[name]
+        if removed:
+            self._mark_dirty(now)
+
+        for name, stamp in found.items():
+            if self.settled.get(name) == stamp:
+                self.changing.pop(name, None)
+                continue
+            seen = self.changing.get(name)
+            if seen is None or seen[0] != stamp:
+                self.changing[name] = (stamp, now)  # new, or still being written
+                continue
+            if now - seen[1] < WATCH_SETTLE_SECONDS:
+                continue
+            try:
+                render_queue.put_nowait((self, name))
+            except queue.Full:
+                break  # picked up on a later poll
+            del self.changing[name]
+            self.settled[name] = stamp
+            with self._lock:
+                self.pending += 1
+            queued += 1
+        self.changing = {name: seen for name, seen in self.changing.items() if name in found}
+        return queued
+
+    def _mark_dirty(self, now):
+        if self.dirty_since is None:
+            self.dirty_since = now
+
+    def rendered(self):
+        """Called once a picked-up file is in the cache."""
+        with self._lock:
+            self._mark_dirty(time.monotonic())
+            self.ready += 1
+            self.pending -= 1
+
+    def batch_due(self):
+        if not self.built:
+            # First build once the files already in the folder are rendered
+            return not self.changing and self.pending == 0
+        if self.dirty_since is None:
+            return False
+        waited = time.monotonic() - self.dirty_since
+        if self.pending and waited < 2 * WATCH_BATCH_SECONDS:
+            return False
+        return self.ready >= WATCH_BATCH_FILES or waited >= WATCH_BATCH_SECONDS
+
+    def rebuild(self):
+        names = sorted(self.settled)
+        with self._lock:
+            self.dirty_since, self.ready, self.built = None, 0, True
+        started = time.perf_counter()
+        output_path = rtw.combine_folder(self.folder_path, names, cache=self.cache)
+        if output_path is None:
+            log(f"{self.folder_path}: no PDFs or JPGs yet")
+        else:
+            log(f"{output_path}: {len(names)} files ({time.perf_counter() - started:.1f}s)")
+
+
+def render_worker(render_queue, pool):
+    while True:
+        folder, name = render_queue.get()
+        try:
+            prerender(folder.cache, pool, os.path.join(folder.folder_path, name))
+            log(f"rendered {os.path.join(folder.folder_path, name)}")
+        except Exception as e:
+            # The rebuild adds the error paragraph to the document, as in a normal run
+            log(f"error rendering {name}: {e}")
+        finally:
+            folder.rendered()
+            render_queue.task_done()
+
+
+def watch(folders):
+    render_queue = queue.Queue(maxsize=WATCH_QUEUE_MAX)
+    pool = ThreadPoolExecutor(max_workers=rtw.WORKERS)
+    threading.Thread(target=render_worker, args=(render_queue, pool), daemon=True).start()
+    watched = [WatchedFolder(f) for f in folders]
+    for folder in watched:
+        log(f"watching {folder.folder_path}")
+
+    while True:
+        for folder in watched:
+            folder.poll(render_queue)
+        for folder in watched:
+            if folder.batch_due():
+                try:
+                    folder.rebuild()
+                except Exception as e:
+                    # e.g. the document is open in Word: try again with the next batch
+                    folder.dirty_since = time.monotonic()
+                    log(f"{folder.folder_path}: could not update the document ({e})")
+        time.sleep(WATCH_POLL_SECONDS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep folders of receipts combined into a Word document.")
+    parser.add_argument("--watch", nargs="+", required=True, metavar="FOLDER", help="folder(s) to watch, with subfolders")
+    args = parser.parse_args(argv)
+    missing = [f for f in args.watch if not os.path.isdir(f)]
+    if missing:
+        parser.error(f"not a folder: {', '.join(missing)}")
+    try:
+        watch(args.watch)
+    except KeyboardInterrupt:
+        log("stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
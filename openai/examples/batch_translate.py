@@ -0,0 +1,249 @@
+# Batch translation with the async OpenAI client (openai 1.x or later, like example_with_input.py).
+# Reads many texts from a CSV or JSONL file, translates them concurrently and writes
+# them back in the same order with a "translation" column / field added.
+# - At most --concurrency requests are in flight at a time
+# - Requests and (estimated) tokens per minute are kept under REQUESTS_PER_MINUTE / TOKENS_PER_MINUTE
+# - Rate-limit, connection and server errors are retried with jittered exponential backoff
+#   (honouring Retry-After); rows that still fail get an "error" value and the run goes on
+#
+# Try it offline (no key, no cost) against the local stand-in server:
+#   python stand_in_server.py --port 8000 --fail-rate 0.1
+#   python batch_translate.py texts.csv --base-url http://127.0.0.1:8000/v1
+# Real API (OPENAI_API_KEY set):
+#   python batch_translate.py products.jsonl --field description --language Hindi -o products_hi.jsonl
+#   python batch_translate.py texts.csv --concurrency 32 --rpm 3000 --tpm 1000000
+#   python batch_translate.py texts.csv --cache    # re-use answers from earlier runs (response_cache.py)
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import sys
+import time
+
+import openai
+from openai import AsyncOpenAI
+
+from response_cache import ResponseCache, request_key
+
+MODEL = "gpt-5"
+LANGUAGE = "Russian"
+PROMPT = "Translate the text delimited by triple backticks into {language}```{text}```. "
+
+CONCURRENCY = 8
+REQUESTS_PER_MINUTE = 500
+TOKENS_PER_MINUTE = 200_000
+BURST_SECONDS = 6          # how much of the per-minute budget may be used at once
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0         # seconds; doubles per attempt, randomized ("full jitter")
+BACKOFF_MAX = 60.0
+PROGRESS_EVERY = 100
+
+RETRYABLE = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token); corrected with the real usage afterwards."""
+    return len(text) // 4 + 1
+
+
+class RateLimiter:
+    """Requests and tokens per minute, as two token buckets refilled continuously."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.rates = (requests_per_minute / 60, tokens_per_minute / 60)
+        self.capacity = tuple(max(rate * BURST_SECONDS, 1) for rate in self.rates)
+        self.levels = list(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed, self.updated = now - self.updated, now
+        for i, rate in enumerate(self.rates):
+            self.levels[i] = min(self.capacity[i], self.levels[i] + elapsed * rate)
+
+    async def acquire(self, tokens):
+        """Wait until one more request of about `tokens` tokens fits the budget."""
+        need = (1, min(tokens, self.capacity[1]))
+        async with self.lock:  # first come, first served
+            while True:
+                self._refill()
+                if all(level >= n for level, n in zip(self.levels, need)):
+                    self.levels[0] -= need[0]
+                    self.levels[1] -= need[1]
+                    return
+                await asyncio.sleep(max((n - level) / rate for level, n, rate in zip(self.levels, need, self.rates)))
+
+    def correct(self, estimated, actual):
+        """Charge (or refund) the difference once the real token usage is known."""
+        self._refill()
+        self.levels[1] -= actual - estimated
+
+
+def backoff_delay(attempt, error=None):
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(delay, float(retry_after)) if retry_after else delay
+    except ValueError:
+        return delay  # an HTTP date; the jittered delay will do
+
+
+async def translate(client, limiter, text, language, model, cache=None):
+    """(translation, attempts) for one text; attempts is 0 for an answer from the cache."""
+    prompt = PROMPT.format(language=language, text=text)
+    request = {"model": model, "input": prompt}
+    if cache is not None:
+        key = request_key(request)
+        cached = await asyncio.to_thread(cache.get, key)  # SQLite: keep it off the event loop
+        if cached is not None:
+            return cached, 0
+    # Budget for the prompt plus an answer of about the same length
+    estimated = estimate_tokens(prompt) + estimate_tokens(text)
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.acquire(estimated)
+        try:
+            response = await client.responses.create(**request)
+        except RETRYABLE as e:
+            if attempt == MAX_RETRIES:
+                raise
+            await asyncio.sleep(backoff_delay(attempt, e))
+            continue
+        if response.usage is not None:
+            limiter.correct(estimated, response.usage.total_tokens)
+        if cache is not None:
+            await asyncio.to_thread(cache.put, key, response.output_text, model=model)
+        return response.output_text, attempt + 1
+
+
+async def translate_all(texts, language=LANGUAGE, model=MODEL, concurrency=CONCURRENCY,
+                        requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE,
+                        client=None, cache=None):
+    """
+    Translate texts concurrently; returns (translations, errors), both in input order
+    (None where a text failed / succeeded). With a ResponseCache, texts answered
+    before are not sent again.
+    """
+    client = client or AsyncOpenAI(max_retries=0)  # retries are done here, with the rate limiter
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    translations = [None] * len(texts)
+    errors = [None] * len(texts)
+    todo = iter(enumerate(texts))
+    stats = {"done": 0, "retries": 0}
+    started = time.perf_counter()
+
+    async def worker():
+        for i, text in todo:  # shared iterator: each text is taken by one worker
+            if not text.strip():
+                translations[i] = ""
+            else:
+                try:
+                    translations[i], attempts = await translate(client, limiter, text, language, model, cache)
+                    stats["retries"] += max(attempts - 1, 0)
+                except (openai.AuthenticationError, openai.PermissionDeniedError, openai.NotFoundError):
+                    raise  # every other row would fail the same way
+                except Exception as e:
+                    errors[i] = f"{type(e).__name__}: {e}"
+            stats["done"] += 1
+            if stats["done"] % PROGRESS_EVERY == 0:
+                rate = stats["done"] / (time.perf_counter() - started)
+                print(f"{stats['done']}/{len(texts)} done ({rate:.1f}/s)", flush=True)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    summary = f"{len(texts)} texts in {time.perf_counter() - started:.1f}s, {stats['retries']} retried requests"
+    if cache is not None:
+        summary += f", {cache.hits} from the cache"
+    print(summary)
+    return translations, errors
+
+
+# -------- Files --------
+
+def read_texts(path, field):
+    """(rows, texts, kind): rows as read (dicts), the texts to translate, and "csv" or "jsonl"."""
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        rows = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    value = json.loads(line)
+                    rows.append(value if isinstance(value, dict) else {field: value})
+        kind = "jsonl"
+    else:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+        kind = "csv"
+    if rows and field not in rows[0]:
+        if len(rows[0]) != 1:
+            raise ValueError(f"{path} has no '{field}' column/field (use --field)")
+        field = next(iter(rows[0]))  # a single column: that is the text
+    return rows, [str(row.get(field) or "") for row in rows], kind
+
+
+def write_results(path, rows, kind, translations, errors):
+    for row, translation, error in zip(rows, translations, errors):
+        row["translation"] = translation if translation is not None else ""
+        if any(errors):
+            row["error"] = error or ""
+    if kind == "jsonl":
+        with open(path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        return
+    columns = list(rows[0]) if rows else ["translation"]
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Translate many texts from a CSV/JSONL file with the OpenAI API.")
+    parser.add_argument("input", help="CSV (with a header row) or JSONL file")
+    parser.add_argument("-o", "--output", default=None, help="default: <input>_translated.<ext>")
+    parser.add_argument("--field", default="text", help="CSV column / JSON field with the text (default: text)")
+    parser.add_argument("--language", default=LANGUAGE)
+    parser.add_argument("--model", default=MODEL)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="requests in flight at once")
+    parser.add_argument("--rpm", type=float, default=REQUESTS_PER_MINUTE, help="requests per minute")
+    parser.add_argument("--tpm", type=float, default=TOKENS_PER_MINUTE, help="tokens per minute")
+    parser.add_argument("--base-url", default=None,
+                        help="API base URL, e.g. http://127.0.0.1:8000/v1 for stand_in_server.py")
+    parser.add_argument("--cache", nargs="?", const="", default=None, metavar="FILE",
+                        help="re-use earlier answers from the response cache (default file: response_cache.CACHE_PATH)")
+    args = parser.parse_args(argv)
+
+    try:
+        rows, texts, kind = read_texts(args.input, args.field)
+    except (OSError, ValueError) as e:
+        print(f"Cannot read {args.input}: {e}")
+        return 1
+    stem, ext = os.path.splitext(args.input)
+    output = args.output or f"{stem}_translated{ext}"
+
+    api_key = os.getenv("OPENAI_API_KEY") or ("stand-in" if args.base_url else None)
+    client = AsyncOpenAI(base_url=args.base_url, api_key=api_key, max_retries=0)
+    print(f"Translating {len(texts)} texts into {args.language} ({args.concurrency} at a time)...")
+    cache = None
+    if args.cache is not None:
+        cache = ResponseCache(args.cache) if args.cache else ResponseCache()
+    translations, errors = asyncio.run(translate_all(
+        texts, args.language, args.model, args.concurrency, args.rpm, args.tpm, client=client, cache=cache))
+
+    write_results(output, rows, kind, translations, errors)
+    failed = sum(e is not None for e in errors)
+    print(f"Wrote {output}" + (f" ({failed} failed, see the error column)" if failed else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
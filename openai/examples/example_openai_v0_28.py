@@ -3,22 +3,25 @@
 # Note the openai version below needs openai version <1.0.0
 # python -m pip install "openai<1.0.0"  or pip install "openai<1.0.0" or pip install openai==0.28
 # this file uses openai version 0.28
+# Answers are cached on disk (response_cache.py), so a prompt asked before is answered without an API call.
 
 import openai
 from dotenv import load_dotenv
 import os
+from response_cache import cached_call
 
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
 def get_completion(prompt, model="gpt-4o"):
     messages = [{"role": "user", "content": prompt}]
-    response = openai.ChatCompletion.create(
+    return cached_call(
+        openai.ChatCompletion.create,
+        lambda response: response.choices[0].message["content"],
         model=model,
         messages=messages,
         temperature=0,  # this is the degree of randomness of the model's output
     )
-    return response.choices[0].message["content"]
 
 
 text = input("Enter a text for translation: ")
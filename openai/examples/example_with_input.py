@@ -1,16 +1,20 @@
 # Example of using the OpenAI API with input from the user
 # This example uses the OpenAI API to translate text into Hindi and Russian.
 # This uses openai-2.6.1
+# Answers are cached on disk (response_cache.py), so a text translated before is answered without an API call.
 
 from openai import OpenAI
+from response_cache import cached_call
 client = OpenAI()
 
 text = input("Enter a text for translation: ")
 prompt = (f"Translate the text delimited by triple backticks into Russian```{text}```. ")
 
-response = client.responses.create(
+response_text = cached_call(
+    client.responses.create,
+    lambda response: response.output_text,
     model="gpt-5",
     input= prompt
 )
 
-print(response.output_text)
\ No newline at end of file
+print(response_text)
\ No newline at end of file
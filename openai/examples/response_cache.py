@@ -0,0 +1,153 @@
+# Disk-backed (SQLite) cache of model responses, for prompts that are sent again and again.
+# Caching is opt-in: only calls made through cached_call (or a ResponseCache used
+# directly) are cached, so use it where the same answer to a repeated prompt is fine.
+# The request arguments are sent as given (nothing is added), and are the cache key.
+# Works with both client versions:
+#
+#   from response_cache import cached_call
+#   # openai 0.28 (example_openai_v0_28.py)
+#   text = cached_call(openai.ChatCompletion.create, lambda r: r.choices[0].message["content"],
+#                      model=model, messages=messages, temperature=0)
+#   # openai 1.x or later (example_with_input.py)
+#   text = cached_call(client.responses.create, lambda r: r.output_text, model="gpt-5", input=prompt)
+#
+# - Key: SHA-256 of model + messages/input + every other request argument (sorted)
+# - With NORMALIZE_WHITESPACE, whitespace in the prompt text is collapsed first, so prompts that only
+#   differ in spacing / line breaks share an entry (off by default: spacing can change the answer)
+# - Streamed requests are never cached (the response is not a finished answer)
+# - Entries expire after CACHE_TTL_DAYS; above CACHE_MAX_MB the least recently used ones are dropped
+# - Safe to use from several threads and processes (SQLite WAL)
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = os.getenv("OPENAI_CACHE_PATH") or os.path.join(os.path.expanduser("~"), ".openai_response_cache.sqlite")
+CACHE_TTL_DAYS = 30
+CACHE_MAX_MB = 200
+NORMALIZE_WHITESPACE = False
+EVICT_EVERY = 100   # check the size limit every this many new entries
+
+
+def _normalize(value):
+    """Request value with prompt text whitespace collapsed (strings inside messages/input)."""
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip()
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+
+def request_key(request):
+    """Cache key of a request (the keyword arguments of the create call)."""
+    request = dict(request)
+    if NORMALIZE_WHITESPACE:
+        for field in ("messages", "input", "prompt"):
+            if field in request:
+                request[field] = _normalize(request[field])
+    data = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(request):
+    """Whether cached_call may cache this request: anything but a streamed one."""
+    return not request.get("stream")
+
+
+class ResponseCache:
+    """key -> response text, in one SQLite file."""
+
+    def __init__(self, path=CACHE_PATH, ttl_days=CACHE_TTL_DAYS, max_mb=CACHE_MAX_MB):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL,"
+            " created REAL NOT NULL, last_used REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.evict()
+
+    def get(self, key):
+        """The cached response text, or None (missing or expired)."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response, model=None):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created, last_used, size)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, now, now, len(response.encode("utf-8")) + len(key)),
+            )
+            self._puts += 1
+        if self._puts % EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones until under the size limit."""
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            while total > self.max_bytes:
+                rows = self._db.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT 500").fetchall()
+                if not rows:
+                    break
+                self._db.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key, _ in rows])
+                total -= sum(size for _, size in rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """The shared cache at CACHE_PATH (opened on first use)."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ResponseCache()
+        return _default
+
+
+def cached_call(create, extract, cache=None, **request):
+    """
+    extract(create(**request)), served from the cache when this request was answered before.
+    extract turns the API response into the text to keep (a str).
+    Calling this is the opt-in: the request is cached whatever its temperature.
+    """
+    if not is_cacheable(request):
+        return extract(create(**request))
+    cache = cache or default_cache()
+    key = request_key(request)
+    text = cache.get(key)
+    if text is None:
+        text = extract(create(**request))
+        cache.put(key, text, model=request.get("model"))
+    return text
+
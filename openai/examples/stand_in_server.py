@@ -0,0 +1,124 @@
+# Local stand-in for the OpenAI API, for trying batch_translate.py offline (no key, no cost).
+# Answers POST /v1/responses and /v1/chat/completions with a fake "translation"
+# (the text between the triple backticks, tagged with the target language) and
+# can inject slow responses, rate-limit errors (429) and server errors (500)
+# so the retry and rate-limit handling can be exercised (randomly with --fail-rate,
+# or the first N requests with --fail-first, e.g. in tests).
+# Standard library only.
+#
+# python stand_in_server.py --port 8000 --latency 0.2 --fail-rate 0.1
+# python batch_translate.py texts.csv --base-url http://127.0.0.1:8000/v1
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY = 0.0     # seconds per request
+FAIL_RATE = 0.0   # share of requests answered with 429 (half of the failures) or 500
+FAIL_FIRST = 0    # the first this many requests are answered with 429
+RETRY_AFTER = "0.5"  # Retry-After header of the 429 answers
+
+_counts = {"requests": 0, "failed": 0}
+_lock = threading.Lock()
+
+
+def fake_translation(prompt):
+    match = re.search(r"into (\w+)\s*```(.*?)```", prompt, re.S)
+    if not match:
+        return prompt[::-1]
+    return f"[{match.group(1)}] {match.group(2)}"
+
+
+def prompt_of(body):
+    """The prompt text of a /responses or /chat/completions request body."""
+    if "messages" in body:
+        return "\n".join(m.get("content") or "" for m in body["messages"] if isinstance(m.get("content"), str))
+    value = body.get("input", "")
+    if isinstance(value, str):
+        return value
+    return "\n".join(m.get("content") or "" for m in value if isinstance(m.get("content"), str))
+
+
+def response_body(path, model, text, prompt):
+    usage_in, usage_out = len(prompt) // 4 + 1, len(text) // 4 + 1
+    created = int(time.time())
+    if path.endswith("/chat/completions"):
+        return {
+            "id": f"chatcmpl-{created}", "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": usage_in, "completion_tokens": usage_out,
+                      "total_tokens": usage_in + usage_out},
+        }
+    return {
+        "id": f"resp_{created}", "object": "response", "created_at": created, "model": model,
+        "status": "completed",
+        "output": [{"type": "message", "id": f"msg_{created}", "role": "assistant", "status": "completed",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}]}],
+        "usage": {"input_tokens": usage_in, "output_tokens": usage_out, "total_tokens": usage_in + usage_out},
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        with _lock:
+            _counts["requests"] += 1
+        if LATENCY:
+            time.sleep(LATENCY)
+        if not self.path.endswith(("/responses", "/chat/completions")):
+            self._send(404, {"error": {"message": f"unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        with _lock:
+            forced = _counts["requests"] <= FAIL_FIRST
+        if forced or random.random() < FAIL_RATE:
+            with _lock:
+                _counts["failed"] += 1
+            if forced or random.random() < 0.5:
+                self._send(429, {"error": {"message": "Rate limit reached (stand-in)", "type": "requests"}},
+                           {"Retry-After": RETRY_AFTER})
+            else:
+                self._send(500, {"error": {"message": "Server error (stand-in)", "type": "server_error"}})
+            return
+        prompt = prompt_of(body)
+        self._send(200, response_body(self.path, body.get("model", "stand-in"), fake_translation(prompt), prompt))
+
+    def log_message(self, format, *args):
+        pass  # one line per request is too noisy for batch runs
+
+
+def main(argv=None):
+    global LATENCY, FAIL_RATE, FAIL_FIRST
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI API.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds per request")
+    parser.add_argument("--fail-rate", type=float, default=FAIL_RATE, help="share of requests that fail (429/500)")
+    parser.add_argument("--fail-first", type=int, default=FAIL_FIRST, help="answer the first N requests with 429")
+    args = parser.parse_args(argv)
+    LATENCY, FAIL_RATE, FAIL_FIRST = args.latency, args.fail_rate, args.fail_first
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), Handler)
+    print(f"Stand-in OpenAI API on http://127.0.0.1:{args.port}/v1 (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"{_counts['requests']} requests, {_counts['failed']} failed on purpose")
+
+
+if __name__ == "__main__":
+    main()
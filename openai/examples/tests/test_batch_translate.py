@@ -0,0 +1,100 @@
+# test_batch_translate.py
+# batch_translate.translate_all against stand_in_server.py on a local port.
+
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("openai", minversion="1.0")  # the repo's openai/ folder is not the package
+
+import batch_translate  # noqa: E402
+import stand_in_server  # noqa: E402
+from openai import AsyncOpenAI  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+TEXTS = ["one", "two", "", "three"]
+EXPECTED = ["[Russian] one", "[Russian] two", "", "[Russian] three"]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(stand_in_server, "_counts", {"requests": 0, "failed": 0})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), stand_in_server.Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/v1"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _translate(base_url, **kwargs):
+    client = AsyncOpenAI(base_url=base_url, api_key="stand-in", max_retries=0)
+    return asyncio.run(batch_translate.translate_all(TEXTS, "Russian", concurrency=2, client=client, **kwargs))
+
+
+def test_rate_limited_requests_wait_for_retry_after(server, monkeypatch):
+    monkeypatch.setattr(stand_in_server, "FAIL_FIRST", 2)
+    monkeypatch.setattr(batch_translate, "BACKOFF_BASE", 0.001)  # jitter alone would retry at once
+    backoff_delay, delays = batch_translate.backoff_delay, []
+
+    def recording_backoff_delay(attempt, error=None):
+        delays.append(backoff_delay(attempt, error))
+        return delays[-1]
+
+    monkeypatch.setattr(batch_translate, "backoff_delay", recording_backoff_delay)
+
+    translations, errors = _translate(server)
+    assert translations == EXPECTED
+    assert errors == [None] * len(TEXTS)
+    assert stand_in_server._counts == {"requests": 5, "failed": 2}
+    assert len(delays) == 2 and all(delay >= float(stand_in_server.RETRY_AFTER) for delay in delays)
+
+
+def test_rows_still_failing_after_the_retries_get_an_error(server, monkeypatch):
+    monkeypatch.setattr(stand_in_server, "FAIL_FIRST", 1_000)
+    monkeypatch.setattr(stand_in_server, "RETRY_AFTER", "0")
+    monkeypatch.setattr(batch_translate, "MAX_RETRIES", 1)
+    monkeypatch.setattr(batch_translate, "BACKOFF_BASE", 0.001)
+    translations, errors = _translate(server)
+    assert translations == [None, None, "", None]
+    assert [error is not None and error.startswith("RateLimitError") for error in errors] == [True, True, False, True]
+
+
+def test_cached_texts_are_not_sent_again(server, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    try:
+        assert _translate(server, cache=cache) == (EXPECTED, [None] * len(TEXTS))
+        sent = stand_in_server._counts["requests"]
+        assert _translate(server, cache=cache) == (EXPECTED, [None] * len(TEXTS))
+        assert stand_in_server._counts["requests"] == sent
+        assert cache.hits == 3
+    finally:
+        cache.close()
+
+
+def _rate_limited(retry_after):
+    return SimpleNamespace(response=SimpleNamespace(headers={"retry-after": retry_after}))
+
+
+def test_backoff_delay_is_jittered_below_the_doubling_bound():
+    for attempt in range(5):
+        bound = min(batch_translate.BACKOFF_MAX, batch_translate.BACKOFF_BASE * 2 ** attempt)
+        delays = [batch_translate.backoff_delay(attempt) for _ in range(200)]
+        assert all(0 <= delay <= bound for delay in delays)
+        assert len(set(delays)) > 1
+
+
+def test_backoff_delay_is_capped():
+    assert max(batch_translate.backoff_delay(50) for _ in range(200)) <= batch_translate.BACKOFF_MAX
+
+
+def test_backoff_delay_waits_at_least_retry_after():
+    assert batch_translate.backoff_delay(0, _rate_limited("7")) >= 7
+    assert batch_translate.backoff_delay(0, SimpleNamespace(response=None)) <= batch_translate.BACKOFF_BASE
+
+
+def test_backoff_delay_ignores_an_http_date_retry_after():
+    delay = batch_translate.backoff_delay(0, _rate_limited("Wed, 21 Oct 2026 07:28:00 GMT"))
+    assert 0 <= delay <= batch_translate.BACKOFF_BASE
@@ -0,0 +1,79 @@
+# test_response_cache.py
+# cached_call: repeated requests are answered from the cache, streamed ones never are.
+
+import pytest
+
+import response_cache
+from response_cache import ResponseCache, cached_call, is_cacheable
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    yield cache
+    cache.close()
+
+
+class FakeCreate:
+    """Stands in for client.responses.create; counts the calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, **request):
+        self.calls.append(request)
+        return {"text": f"answer {len(self.calls)}"}
+
+
+def _extract(response):
+    return response["text"]
+
+
+def test_is_cacheable():
+    assert is_cacheable({"model": "m", "input": "hi"})
+    assert is_cacheable({"model": "m", "input": "hi", "stream": False})
+    assert not is_cacheable({"model": "m", "input": "hi", "stream": True})
+
+
+def test_repeated_request_is_not_sent_again(cache):
+    create = FakeCreate()
+    assert cached_call(create, _extract, cache, model="m", input="hi", temperature=0.7) == "answer 1"
+    assert cached_call(create, _extract, cache, model="m", input="hi", temperature=0.7) == "answer 1"
+    assert len(create.calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_every_argument_is_part_of_the_key(cache):
+    create = FakeCreate()
+    cached_call(create, _extract, cache, model="m", input="hi", temperature=0)
+    assert cached_call(create, _extract, cache, model="m", input="hi", temperature=1) == "answer 2"
+    assert cached_call(create, _extract, cache, model="other", input="hi", temperature=0) == "answer 3"
+    assert cached_call(create, _extract, cache, model="m", input="hi  ", temperature=0) == "answer 4"
+    assert create.calls[0] == {"model": "m", "input": "hi", "temperature": 0}  # sent as given
+
+
+def test_streamed_requests_bypass_the_cache(cache):
+    create = FakeCreate()
+    for _ in range(2):
+        cached_call(create, _extract, cache, model="m", input="hi", stream=True)
+    assert len(create.calls) == 2
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_normalized_whitespace_shares_entries(cache, monkeypatch):
+    monkeypatch.setattr(response_cache, "NORMALIZE_WHITESPACE", True)
+    create = FakeCreate()
+    cached_call(create, _extract, cache, model="m", input="Translate\n  this")
+    assert cached_call(create, _extract, cache, model="m", input=" Translate this ") == "answer 1"
+    assert len(create.calls) == 1
+
+
+def test_expired_entries_are_asked_again(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl_days=-1)
+    try:
+        create = FakeCreate()
+        for _ in range(2):
+            cached_call(create, _extract, cache, model="m", input="hi")
+        assert len(create.calls) == 2
+    finally:
+        cache.close()